@@ -0,0 +1,170 @@
+"""Pre-built, versioned tokenizer/lexicon/lemma bundle for fast worker start-up.
+
+`build_bundle` turns the source files into one binary file:
+
+    MAGIC | uint32 header length | header JSON | blob | blob | ...
+
+The header records each blob's offset, size and sha256, the hashes of the
+source files, and the bundle version. The blobs are:
+
+    tokenizer   compact tokenizer JSON with BertProcessing, truncation and
+                padding already configured (no set-up in code at load)
+    lexicon     lowercased hate words, sorted, newline-separated
+    lemmas      optional JSON [[form, lemma, is_stop], ...] for LemmaCache
+
+`load_bundle` mmaps the file, verifies every blob against its hash, and
+returns a `Bundle`. A bundle that fails verification raises `ArtifactError`.
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import struct
+
+from tokenizers import Tokenizer
+from tokenizers.processors import BertProcessing
+
+MAGIC = b"HSART1\n"
+FORMAT = 1
+_LENGTH = struct.Struct("<I")
+
+
+class ArtifactError(ValueError):
+    """Raised when a bundle is missing, malformed or fails its hash check."""
+
+
+class Bundle:
+    def __init__(self, header, tokenizer, hate_words, lemmas):
+        self.header = header
+        self.version = header["version"]
+        self.tokenizer = tokenizer
+        self.hate_words = hate_words
+        self.lemmas = lemmas
+
+
+def _sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def configure_tokenizer(tokenizer, max_len):
+    """The post-processing/truncation/padding set-up the classifier expects."""
+    tokenizer.post_processor = BertProcessing(
+        ("[SEP]", tokenizer.token_to_id("[SEP]")),
+        ("[CLS]", tokenizer.token_to_id("[CLS]"))
+    )
+    tokenizer.enable_truncation(max_length=max_len)
+    tokenizer.enable_padding(
+        length=max_len,
+        pad_id=tokenizer.token_to_id("[PAD]"),
+        pad_token="[PAD]"
+    )
+    return tokenizer
+
+
+def build_lemma_table(nlp, forms):
+    """[[form, lemma, is_stop], ...] for single-word forms, lemmatised context-free."""
+    from spacy.tokens import Doc
+
+    forms = sorted(set(forms))
+    docs = nlp.pipe(Doc(nlp.vocab, words=[form]) for form in forms)
+    return [[form, doc[0].lemma_, doc[0].is_stop] for form, doc in zip(forms, docs)]
+
+
+def build_bundle(tokenizer_path, words_path, output_path, max_len, nlp=None):
+    """Builds the bundle at `output_path` and returns its header."""
+    with open(tokenizer_path, "rb") as f:
+        tokenizer_source = f.read()
+    with open(words_path, "rb") as f:
+        words_source = f.read()
+
+    tokenizer = configure_tokenizer(Tokenizer.from_str(tokenizer_source.decode("utf-8")), max_len)
+    hate_words = sorted({word.lower() for word in json.loads(words_source).get("hate_words", [])})
+
+    blobs = {
+        "tokenizer": tokenizer.to_str().encode("utf-8"),
+        "lexicon": "\n".join(hate_words).encode("utf-8"),
+    }
+    lemma_model = None
+    if nlp is not None:
+        from .lemma_cache import model_key
+
+        # Whole-word vocabulary entries plus the lexicon cover most traffic
+        forms = [t for t in tokenizer.get_vocab() if t.isalpha() and t.islower()] + hate_words
+        blobs["lemmas"] = json.dumps(build_lemma_table(nlp, forms)).encode("utf-8")
+        lemma_model = model_key(nlp)
+
+    sources = {
+        "tokenizer": _sha256(tokenizer_source),
+        "words": _sha256(words_source),
+    }
+    version = _sha256(json.dumps(
+        {"format": FORMAT, "max_len": max_len, "sources": sources, "lemma_model": lemma_model},
+        sort_keys=True,
+    ).encode("utf-8"))[:12]
+
+    entries, offset = {}, 0
+    for name, blob in blobs.items():
+        entries[name] = {"offset": offset, "size": len(blob), "sha256": _sha256(blob)}
+        offset += len(blob)
+    header = {
+        "format": FORMAT,
+        "version": version,
+        "max_len": max_len,
+        "sources": sources,
+        "lemma_model": lemma_model,
+        "blobs": entries,
+    }
+    header_bytes = json.dumps(header, sort_keys=True).encode("utf-8")
+
+    tmp = f"{output_path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(MAGIC + _LENGTH.pack(len(header_bytes)) + header_bytes)
+        for blob in blobs.values():
+            f.write(blob)
+    os.replace(tmp, output_path)
+    return header
+
+
+def read_header(buf):
+    if bytes(buf[:len(MAGIC)]) != MAGIC:
+        raise ArtifactError("Not an artifact bundle (bad magic)")
+    start = len(MAGIC) + _LENGTH.size
+    (length,) = _LENGTH.unpack_from(buf, len(MAGIC))
+    header = json.loads(bytes(buf[start:start + length]))
+    if header.get("format") != FORMAT:
+        raise ArtifactError(f"Unsupported bundle format {header.get('format')!r}")
+    return header, start + length
+
+
+def load_bundle(path):
+    """Maps the bundle, verifies each blob's sha256 and builds the runtime objects."""
+    try:
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            header, data_start = read_header(buf)
+            blobs = {}
+            for name, entry in header["blobs"].items():
+                start = data_start + entry["offset"]
+                blob = buf[start:start + entry["size"]]
+                if len(blob) != entry["size"] or _sha256(blob) != entry["sha256"]:
+                    raise ArtifactError(f"Blob {name!r} in {path} failed its hash check")
+                blobs[name] = blob
+    except (OSError, ValueError, KeyError, struct.error) as exc:
+        if isinstance(exc, ArtifactError):
+            raise
+        raise ArtifactError(f"Cannot read artifact bundle {path}: {exc}") from exc
+
+    tokenizer = Tokenizer.from_str(blobs["tokenizer"].decode("utf-8"))
+    lexicon = blobs["lexicon"].decode("utf-8")
+    hate_words = frozenset(lexicon.split("\n")) if lexicon else frozenset()
+    lemmas = json.loads(blobs["lemmas"]) if "lemmas" in blobs else None
+    return Bundle(header, tokenizer, hate_words, lemmas)
+
+
+def source_hashes(tokenizer_path, words_path):
+    """sha256 of the source files, to compare with a bundle's `sources`."""
+    hashes = {}
+    for name, path in (("tokenizer", tokenizer_path), ("words", words_path)):
+        with open(path, "rb") as f:
+            hashes[name] = _sha256(f.read())
+    return hashes
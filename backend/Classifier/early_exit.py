@@ -0,0 +1,140 @@
+"""Early-exit inference for the TransformerEncoder.
+
+After each encoder block but the last, a small exit head reads the [CLS]
+state. Samples whose hate/non-hate margin
+
+    |P(hate) - P(non-hate)|,  P(hate) = sum of the first two class probabilities
+
+reaches the threshold take that head's probabilities and leave the batch.
+Only the remaining samples run the next block. The margin is the binary
+one because that is what TransformerClassifier reports.
+
+Without trained heads, every head is a copy of the final classifier. That
+reuses the final classifier on intermediate [CLS] states.
+`train_exit_heads` fine-tunes the heads by self-distillation: each head
+learns the final classifier's distribution on the same text. The encoder is
+frozen, so training needs no labels and runs on CPU.
+"""
+
+import copy
+import hashlib
+import os
+
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+
+
+class ExitHeads(nn.Module):
+    """One linear classifier per intermediate encoder block."""
+
+    def __init__(self, d_model, num_classes, num_layers):
+        super().__init__()
+        self.heads = nn.ModuleList([nn.Linear(d_model, num_classes) for _ in range(num_layers - 1)])
+
+    @classmethod
+    def from_classifier(cls, classifier, num_layers):
+        heads = cls(classifier.in_features, classifier.out_features, num_layers)
+        heads.heads = nn.ModuleList([copy.deepcopy(classifier) for _ in range(num_layers - 1)])
+        return heads
+
+
+def hate_margin(probs):
+    p_hate = probs[:, :2].sum(dim=1)
+    return (2 * p_hate - 1).abs()
+
+
+def early_exit_forward(model, heads, input_ids, threshold, mask=None):
+    """(probabilities [B, classes], 1-based exit block per sample [B])."""
+    encoder, classifier = model['encoder'], model['classifier']
+    x = encoder.input_layer(input_ids)
+    n = x.size(0)
+    # Probabilities in fp32 whatever the model's precision
+    probs = torch.empty(n, classifier.out_features, device=x.device)
+    last = len(encoder.layers) - 1
+    exit_layer = torch.full((n,), last + 1, dtype=torch.long, device=x.device)
+    active = torch.arange(n, device=x.device)
+    for i, layer in enumerate(encoder.layers):
+        x = layer(x, mask)
+        if i == last:
+            probs[active] = torch.softmax(classifier(x[:, 0]).float(), dim=1)
+            break
+        layer_probs = torch.softmax(heads.heads[i](x[:, 0]).float(), dim=1)
+        done = hate_margin(layer_probs) >= threshold
+        if done.any():
+            probs[active[done]] = layer_probs[done]
+            exit_layer[active[done]] = i + 1
+            keep = ~done
+            active, x = active[keep], x[keep]
+            if mask is not None:
+                mask = mask[keep]
+            if active.numel() == 0:
+                break
+    return probs, exit_layer
+
+
+def train_exit_heads(model, heads, batches, epochs=1, lr=1e-3, log=print):
+    """Fits `heads` to the final classifier's outputs.
+
+    `batches` is a callable returning an iterable of input_id tensors; it is
+    called once per epoch.
+    """
+    if not heads.heads:
+        raise ValueError("A single-layer encoder has no intermediate layer to exit from")
+    encoder, classifier = model['encoder'], model['classifier']
+    model.eval()
+    heads.train()
+    optimizer = torch.optim.Adam(heads.parameters(), lr=lr)
+    for epoch in range(epochs):
+        total, steps = 0.0, 0
+        for input_ids in batches():
+            with torch.no_grad():
+                x = encoder.input_layer(input_ids)
+                states = []
+                for layer in encoder.layers:
+                    x = layer(x)
+                    states.append(x[:, 0])
+                target = torch.softmax(classifier(states[-1]), dim=1)
+            loss = sum(
+                F.kl_div(F.log_softmax(head(state), dim=1), target, reduction='batchmean')
+                for head, state in zip(heads.heads, states[:-1])
+            )
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
+            total += loss.item()
+            steps += 1
+        if log is not None:
+            log(f"epoch {epoch + 1}/{epochs}: distillation loss {total / max(steps, 1):.4f}")
+    heads.eval()
+    return heads
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def save_exit_heads(heads, path, model_path):
+    """Saves the heads with the hash of the checkpoint they were trained against."""
+    tmp = f"{path}.tmp"
+    torch.save({
+        'state_dict': heads.state_dict(),
+        'num_layers': len(heads.heads) + 1,
+        'model_sha256': _file_sha256(model_path),
+    }, tmp)
+    os.replace(tmp, path)
+
+
+def load_exit_heads(path, model, model_path, map_location='cpu'):
+    """Heads for `model`; raises ValueError if they were trained for another checkpoint."""
+    saved = torch.load(path, map_location=map_location)
+    if saved.get('model_sha256') != _file_sha256(model_path):
+        raise ValueError(f"Exit heads {path} were trained for a different checkpoint")
+    classifier = model['classifier']
+    heads = ExitHeads(classifier.in_features, classifier.out_features, saved['num_layers'])
+    heads.load_state_dict(saved['state_dict'])
+    return heads
@@ -0,0 +1,145 @@
+"""Bounded memo table from token surface form to (lemma, is_stop).
+
+Moderation text is Zipf-distributed, so a few thousand word forms cover most
+tokens. With a cache, a text only goes through spaCy's tokenizer, and each
+form that has not been seen before is lemmatised once, on its own.
+
+That is context-free lemmatisation: spaCy's lemma can depend on the POS tag
+the tagger assigns in context ("saw" as a verb or a noun), so cached lemmas
+can differ from full-pipeline lemmas. Callers enable the cache explicitly.
+"""
+
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from spacy.tokens import Doc
+
+
+def model_key(nlp):
+    """Identifies the pipeline a cache was filled from, e.g. 'en_core_web_sm-3.7.1'."""
+    meta = getattr(nlp, "meta", {}) or {}
+    return f"{meta.get('lang', 'xx')}_{meta.get('name', 'blank')}-{meta.get('version', '0')}"
+
+
+class LemmaCache:
+    """Thread-safe LRU cache of form -> (lemma, is_stop)."""
+
+    def __init__(self, capacity=50000, key=""):
+        self.capacity = capacity
+        self.key = key
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, form):
+        with self._lock:
+            entry = self._entries.get(form)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(form)
+            self.hits += 1
+            return entry
+
+    def put(self, form, lemma, is_stop):
+        with self._lock:
+            self._entries[form] = (lemma, is_stop)
+            self._entries.move_to_end(form)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "key": self.key,
+                "size": len(self._entries),
+                "capacity": self.capacity,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+    def save(self, path):
+        """Writes the entries (least recently used first) atomically."""
+        with self._lock:
+            entries = [[form, lemma, is_stop] for form, (lemma, is_stop) in self._entries.items()]
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # Per-process name: every web worker saves the same file at exit
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"key": self.key, "entries": entries}, f)
+        os.replace(tmp, path)
+
+    def load(self, path):
+        """Warm-starts from a saved file; ignores files from another pipeline."""
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return 0
+        if data.get("key") != self.key:
+            return 0
+        return self.warm(data.get("entries", []))
+
+    def warm(self, entries):
+        """Adds [[form, lemma, is_stop], ...] entries (most recently used last)."""
+        for form, lemma, is_stop in entries[-self.capacity:]:
+            self.put(form, lemma, bool(is_stop))
+        return len(self)
+
+    def lookup(self, nlp, forms):
+        """(lemma, is_stop) for each form; misses go through `nlp` once each, in one pipe."""
+        results = [self.get(form) for form in forms]
+        missing = list(dict.fromkeys(form for form, result in zip(forms, results) if result is None))
+        if missing:
+            # One-word Docs, so spaCy cannot re-split a form
+            docs = nlp.pipe(Doc(nlp.vocab, words=[form]) for form in missing)
+            computed = {}
+            for form, doc in zip(missing, docs):
+                token = doc[0]
+                computed[form] = (token.lemma_, token.is_stop)
+                self.put(form, token.lemma_, token.is_stop)
+            results = [result if result is not None else computed[form] for form, result in zip(forms, results)]
+        return results
+
+
+_SHARED = {}
+_SHARED_LOCK = threading.Lock()
+
+
+def get_shared_cache(nlp, capacity=50000, directory=None):
+    """One cache per pipeline, shared by every preprocessor in the process.
+
+    With `directory`, the cache is warm-started from `<directory>/<key>.json`.
+    """
+    key = model_key(nlp)
+    with _SHARED_LOCK:
+        cache = _SHARED.get(key)
+        if cache is None:
+            cache = _SHARED[key] = LemmaCache(capacity, key)
+            if directory:
+                cache.load(os.path.join(directory, f"{key}.json"))
+        return cache
+
+
+def shared_cache_stats():
+    with _SHARED_LOCK:
+        caches = list(_SHARED.values())
+    return {cache.key: cache.stats() for cache in caches}
+
+
+def save_shared_caches(directory):
+    with _SHARED_LOCK:
+        caches = list(_SHARED.values())
+    for cache in caches:
+        cache.save(os.path.join(directory, f"{cache.key}.json"))
@@ -0,0 +1,100 @@
+"""Batch layouts for the TransformerEncoder.
+
+    fixed    every text padded to MAX_LEN, no mask (how the checkpoint was
+             trained; the pads are attended to)
+    dynamic  texts padded to the longest one in the batch, with a key-padding
+             mask over the pads
+    packed   texts concatenated into rows of at most MAX_LEN tokens
+             (first-fit decreasing), with a block-diagonal mask so each text
+             only attends to itself and positions restarting at 0 for each
+             text; a batch costs about the sum of its real tokens
+
+`dynamic` and `packed` hide padding the checkpoint saw during training, so
+their confidences can differ slightly from `fixed`.
+"""
+
+import torch
+
+FIXED = "fixed"
+DYNAMIC = "dynamic"
+PACKED = "packed"
+MODES = (FIXED, DYNAMIC, PACKED)
+
+
+class Layout:
+    """Model inputs plus where each text's [CLS] state ends up."""
+
+    def __init__(self, input_ids, positions, mask, cls_rows, cls_cols):
+        self.input_ids = input_ids
+        self.positions = positions
+        self.mask = mask
+        self.cls_rows = cls_rows
+        self.cls_cols = cls_cols
+
+    @property
+    def slots(self):
+        return self.input_ids.numel()
+
+    def to(self, device):
+        return Layout(*(t.to(device) for t in (self.input_ids, self.positions, self.mask, self.cls_rows, self.cls_cols)))
+
+
+def dynamic_layout(ids_list, pad_id):
+    n = len(ids_list)
+    width = max(len(ids) for ids in ids_list)
+    input_ids = torch.full((n, width), pad_id, dtype=torch.long)
+    keep = torch.zeros((n, width), dtype=torch.bool)
+    for row, ids in enumerate(ids_list):
+        input_ids[row, :len(ids)] = torch.tensor(ids, dtype=torch.long)
+        keep[row, :len(ids)] = True
+    positions = torch.arange(width).expand(n, width)
+    return Layout(input_ids, positions, keep[:, None, None, :], torch.arange(n), torch.zeros(n, dtype=torch.long))
+
+
+def pack_rows(lengths, max_len):
+    """Groups text indices into rows whose lengths sum to at most max_len (first-fit decreasing)."""
+    rows, room = [], []
+    for i in sorted(range(len(lengths)), key=lambda i: -lengths[i]):
+        for r, free in enumerate(room):
+            if lengths[i] <= free:
+                rows[r].append(i)
+                room[r] -= lengths[i]
+                break
+        else:
+            rows.append([i])
+            room.append(max_len - lengths[i])
+    return rows
+
+
+def packed_layout(ids_list, pad_id, max_len):
+    lengths = [len(ids) for ids in ids_list]
+    rows = pack_rows(lengths, max_len)
+    width = max(sum(lengths[i] for i in row) for row in rows)
+    input_ids = torch.full((len(rows), width), pad_id, dtype=torch.long)
+    positions = torch.zeros((len(rows), width), dtype=torch.long)
+    segments = torch.full((len(rows), width), -1, dtype=torch.long)
+    cls_rows = torch.zeros(len(ids_list), dtype=torch.long)
+    cls_cols = torch.zeros(len(ids_list), dtype=torch.long)
+    for r, row in enumerate(rows):
+        offset = 0
+        for segment, i in enumerate(row):
+            length = lengths[i]
+            input_ids[r, offset:offset + length] = torch.tensor(ids_list[i], dtype=torch.long)
+            positions[r, offset:offset + length] = torch.arange(length)
+            segments[r, offset:offset + length] = segment
+            cls_rows[i], cls_cols[i] = r, offset
+            offset += length
+    # Block-diagonal: query and key in the same text; pads attend to nothing
+    mask = (segments[:, :, None] == segments[:, None, :]) & (segments[:, None, :] >= 0)
+    return Layout(input_ids, positions, mask[:, None], cls_rows, cls_cols)
+
+
+def cls_states(model, layout):
+    """[CLS] encoder state per text, in input order."""
+    encoder = model['encoder']
+    input_layer = encoder.input_layer
+    x = input_layer.token_embedding(layout.input_ids) + input_layer.positional_encoding.pe[0, layout.positions]
+    x = input_layer.dropout(x)
+    for block in encoder.layers:
+        x = block(x, layout.mask)
+    return x[layout.cls_rows, layout.cls_cols]
@@ -0,0 +1,101 @@
+"""Reduced-precision (bf16) inference for TransformerClassifier.
+
+    fp32      full precision (default)
+    bf16      weights and activations in bfloat16; half the memory traffic
+              of fp32, which is what bounds a d_model=128 encoder on CPU
+    autocast  fp32 weights, with matmuls run in bfloat16 under torch.autocast
+              (layer norms and softmaxes stay fp32)
+
+Both bf16 modes only pay off where the hardware has native bf16 (AVX512-BF16
+or AMX on x86, bf16-capable GPUs); elsewhere `apply_precision` keeps fp32.
+Before switching, it also scores PROBE_TEXTS in fp32 and in the requested
+mode. It keeps fp32 if any logit drifts by more than the tolerance.
+"""
+
+import contextlib
+import copy
+
+import torch
+
+FP32 = "fp32"
+BF16 = "bf16"
+AUTOCAST = "autocast"
+MODES = (FP32, BF16, AUTOCAST)
+
+# Max absolute logit difference from fp32 on the probe set
+DEFAULT_TOLERANCE = 0.1
+
+# Short and long, hateful and benign, clean and noisy
+PROBE_TEXTS = (
+    "I love spending time with everyone.",
+    "Those people are disgusting animals.",
+    "ok",
+    "thanks for sharing, this was really helpful!!",
+    "go back to where you came from, nobody wants you here",
+    "@user you are an idiot and everyone knows it http://t.co/x",
+    "What time does the meeting start tomorrow?",
+    "they should all be locked up, every single one of them",
+    "lol that game last night was insane 😂😂",
+    "I disagree with the policy but I respect the people who support it.",
+    "shut up you stupid loser",
+    " ".join(["The committee reviewed the proposal in detail and asked for more data."] * 12),
+)
+
+_NATIVE_CPU_FLAGS = ("avx512_bf16", "amx_bf16")
+
+
+def bf16_supported(device):
+    """True if `device` runs bf16 natively rather than emulating it."""
+    if device.type == "cuda":
+        return torch.cuda.is_bf16_supported()
+    try:
+        with open("/proc/cpuinfo") as f:
+            for line in f:
+                if line.startswith("flags"):
+                    return any(flag in line.split() for flag in _NATIVE_CPU_FLAGS)
+    except OSError:
+        pass
+    # Not Linux: rely on oneDNN's check, which also accepts emulated bf16
+    return bool(torch.backends.mkldnn.is_available() and torch.ops.mkldnn._is_mkldnn_bf16_supported())
+
+
+def precision_context(mode, device):
+    if mode == AUTOCAST:
+        return torch.autocast(device.type, dtype=torch.bfloat16)
+    return contextlib.nullcontext()
+
+
+def probe_logits(classifier, model, mode, texts=PROBE_TEXTS):
+    """Full-model fp32 logits for `texts` (fixed layout, no early exit)."""
+    encodings = classifier.tokenizer.encode_batch(list(texts))
+    input_ids = torch.tensor([enc.ids for enc in encodings]).to(classifier.device)
+    with torch.no_grad(), precision_context(mode, classifier.device):
+        encoded = model['encoder'](input_ids)
+        return model['classifier'](encoded[:, 0]).float()
+
+
+def apply_precision(classifier, mode, tolerance=DEFAULT_TOLERANCE, texts=PROBE_TEXTS):
+    """Switches `classifier` to `mode` if the device supports it and the probe
+    set stays within `tolerance`; returns the self-check report."""
+    if mode not in MODES:
+        raise ValueError(f"Unknown precision {mode!r}; expected one of {', '.join(MODES)}")
+    report = {"requested": mode, "mode": FP32, "tolerance": tolerance}
+    if mode != FP32:
+        if not bf16_supported(classifier.device):
+            report["reason"] = f"no native bf16 on {classifier.device.type}"
+        else:
+            model = classifier.model
+            candidate = copy.deepcopy(model).to(torch.bfloat16) if mode == BF16 else model
+            reference = probe_logits(classifier, model, FP32, texts)
+            reduced = probe_logits(classifier, candidate, mode, texts)
+            drift = (reduced - reference).abs().max().item()
+            report["max_logit_drift"] = round(drift, 5)
+            # Hate/non-hate decisions that changed (reported, not gated on)
+            report["flips"] = int(((reference.argmax(dim=1) <= 1) != (reduced.argmax(dim=1) <= 1)).sum())
+            if drift > tolerance:
+                report["reason"] = f"logit drift {drift:.4f} exceeds tolerance {tolerance}"
+            else:
+                classifier.set_precision(mode, candidate)
+                report["mode"] = mode
+    classifier.precision_report = report
+    return report
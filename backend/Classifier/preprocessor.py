@@ -1,23 +1,37 @@
-import spacy
 import re
 import json
 
+# Only the tagger/attribute_ruler/lemmatizer are needed for lemmas and is_stop
+SPACY_DISABLED = ["parser", "ner", "senter"]
+
+
 class HateSpeechDetector:
+    NOISE_RE = re.compile(r"http\S+|www\S+|@\w+|#\w+")
+
     def __init__(self, json_path="hate_words.json",
                  replacement_word="worst",
                  model_path="transformer_classifier_checkpoint_best_best.pth",
-                 tokenizer_path="tokenizer.json", rating_threshold=2):
+                 tokenizer_path="tokenizer.json", rating_threshold=2,
+                 spacy_model="en_core_web_sm", nlp=None, bundle=None):
 
-        # Load hate words from JSON
-        with open(json_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        self.hate_words = set(word.lower() for word in data.get("hate_words", []))
+        # Load hate words from the artifact bundle (see artifacts.py) or JSON
+        if bundle is not None:
+            self.hate_words = bundle.hate_words
+        else:
+            with open(json_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.hate_words = set(word.lower() for word in data.get("hate_words", []))
 
         self.replacement_word = replacement_word
         self.rating_threshold = rating_threshold
+        # Optional LemmaCache (see lemma_cache.py); lemmatises context-free
+        self.lemma_cache = None
 
-        # Load spaCy
-        self.nlp = spacy.load("en_core_web_sm", disable=["ner", "parser"])
+        # Load spaCy (name or local path), unless the caller shares its pipeline
+        if nlp is None:
+            import spacy
+            nlp = spacy.load(spacy_model, disable=SPACY_DISABLED)
+        self.nlp = nlp
 
         # Initialize the transformer classifier
         from .utilities import TransformerClassifier
@@ -30,29 +44,61 @@ class HateSpeechDetector:
             base_dir = os.path.dirname(os.path.abspath(__file__))
             tokenizer_path = os.path.join(base_dir, tokenizer_path)
             
-        self.classifier = TransformerClassifier(model_path, tokenizer_path)
+        self.classifier = TransformerClassifier(
+            model_path, tokenizer_path, tokenizer=bundle.tokenizer if bundle is not None else None
+        )
 
-    def preprocess_text(self, text):
-        # Lowercase & remove URLs, mentions, hashtags
-        text = re.sub(r"http\S+|www\S+|@\w+|#\w+", "", text.lower())
+    def _prepare(self, text):
+        # Lowercase & remove URLs, mentions, hashtags (text from basic_clean
+        # usually has none left, so skip the regex when it cannot match)
+        text = text.lower()
+        if "http" in text or "www" in text or "@" in text or "#" in text:
+            text = self.NOISE_RE.sub("", text)
 
         # Replace hate words
         tokens = text.split()
         tokens = [self.replacement_word if t in self.hate_words else t for t in tokens]
-        text = " ".join(tokens)
+        return " ".join(tokens)
 
+    @staticmethod
+    def _lemmas(doc):
         # Lemmatization & stopword removal
-        doc = self.nlp(text)
-        tokens = [token.lemma_ for token in doc if not token.is_stop]
+        return " ".join(token.lemma_ for token in doc if not token.is_stop)
 
-        return " ".join(tokens)
+    def _cached_lemmas(self, text):
+        forms = [token.text for token in self.nlp.make_doc(text)]
+        return " ".join(lemma for lemma, is_stop in self.lemma_cache.lookup(self.nlp, forms) if not is_stop)
+
+    def preprocess_text(self, text):
+        if self.lemma_cache is not None:
+            return self._cached_lemmas(self._prepare(text))
+        return self._lemmas(self.nlp(self._prepare(text)))
+
+    def preprocess_texts(self, texts, batch_size=256, n_process=1):
+        """Same as preprocess_text for each text, with spaCy batching them via nlp.pipe.
+
+        n_process > 1 forks spaCy workers; only use it from a non-daemonic
+        process (offline jobs), not from web or pool workers.
+        """
+        if self.lemma_cache is not None:
+            return [self._cached_lemmas(self._prepare(text)) for text in texts]
+        docs = self.nlp.pipe((self._prepare(text) for text in texts), batch_size=batch_size, n_process=n_process)
+        return [self._lemmas(doc) for doc in docs]
 
     def predict(self, text):
         clean_text = self.preprocess_text(text)
-        label, confidence = self.classifier.predict(clean_text)
+        label, confidence, probs = self.classifier.predict_batch_with_probs([clean_text])[0]
         sentiment = "negative" if label == 1 else "neutral"
 
-        return label, confidence, sentiment
+        return label, confidence, sentiment, probs
+
+    def predict_batch(self, texts, batch_size=256, n_process=1):
+        # (label, confidence, sentiment, class probabilities) per text
+        clean_texts = self.preprocess_texts(texts, batch_size, n_process)
+        return [
+            (label, confidence, "negative" if label == 1 else "neutral", probs)
+            for label, confidence, probs in self.classifier.predict_batch_with_probs(clean_texts)
+        ]
     
 
 # example usage
@@ -60,7 +106,7 @@ class HateSpeechDetector:
 #                               replacement_word="disgusting")
 
 # text = "You are a filthy traitor and coward"
-# label, confidence, sentiment = detector.predict(text)
+# label, confidence, sentiment, probs = detector.predict(text)
 
 # print("Hate:", label)          # 1 for hate, 0 for non-hate
 # print("Confidence:", confidence)
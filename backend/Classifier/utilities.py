@@ -2,8 +2,14 @@ import torch
 import torch.nn as nn
 import math
 import os
+import threading
+import numpy as np
 from tokenizers import Tokenizer
-from tokenizers.processors import BertProcessing
+
+from .artifacts import configure_tokenizer
+from .early_exit import ExitHeads, early_exit_forward
+from .packing import FIXED, MODES, PACKED, cls_states, dynamic_layout, packed_layout
+from .precision import FP32, precision_context
 
 class PositionalEncoding(nn.Module):
     def __init__(self, d_model, max_len=512):
@@ -110,39 +116,34 @@ MODEL_CONFIG = {
     'VOCAB_SIZE': 30000
 }
 
+def build_model(vocab_size):
+    return nn.ModuleDict({
+        'encoder': TransformerEncoder(
+            vocab_size=vocab_size,
+            d_model=MODEL_CONFIG['D_MODEL'],
+            num_heads=MODEL_CONFIG['NUM_HEADS'],
+            d_ff=MODEL_CONFIG['D_FF'],
+            num_layers=MODEL_CONFIG['NUM_LAYERS'],
+            max_len=MODEL_CONFIG['MAX_LEN'],
+            dropout=MODEL_CONFIG['DROPOUT']
+        ),
+        'classifier': nn.Linear(MODEL_CONFIG['D_MODEL'], MODEL_CONFIG['NUM_CLASSES'])
+    })
+
 class TransformerClassifier:
-    def __init__(self, model_path, tokenizer_path):
+    def __init__(self, model_path, tokenizer_path, tokenizer=None):
         self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
         
-        # Load tokenizer
-        if not os.path.exists(tokenizer_path):
-            raise FileNotFoundError(f"Tokenizer file not found: {tokenizer_path}")
-        self.tokenizer = Tokenizer.from_file(tokenizer_path)
-        self.tokenizer.post_processor = BertProcessing(
-            ("[SEP]", self.tokenizer.token_to_id("[SEP]")),
-            ("[CLS]", self.tokenizer.token_to_id("[CLS]"))
-        )
-        self.tokenizer.enable_truncation(max_length=MODEL_CONFIG['MAX_LEN'])
-        self.tokenizer.enable_padding(
-            length=MODEL_CONFIG['MAX_LEN'],
-            pad_id=self.tokenizer.token_to_id("[PAD]"),
-            pad_token="[PAD]"
-        )
+        # Load tokenizer, unless a pre-configured one (artifact bundle) is given
+        if tokenizer is None:
+            if not os.path.exists(tokenizer_path):
+                raise FileNotFoundError(f"Tokenizer file not found: {tokenizer_path}")
+            tokenizer = configure_tokenizer(Tokenizer.from_file(tokenizer_path), MODEL_CONFIG['MAX_LEN'])
+        self.tokenizer = tokenizer
         
         # Initialize model
         vocab_size = self.tokenizer.get_vocab_size()
-        self.model = nn.ModuleDict({
-            'encoder': TransformerEncoder(
-                vocab_size=vocab_size,
-                d_model=MODEL_CONFIG['D_MODEL'],
-                num_heads=MODEL_CONFIG['NUM_HEADS'],
-                d_ff=MODEL_CONFIG['D_FF'],
-                num_layers=MODEL_CONFIG['NUM_LAYERS'],
-                max_len=MODEL_CONFIG['MAX_LEN'],
-                dropout=MODEL_CONFIG['DROPOUT']
-            ),
-            'classifier': nn.Linear(MODEL_CONFIG['D_MODEL'], MODEL_CONFIG['NUM_CLASSES'])
-        })
+        self.model = build_model(vocab_size)
         
         if not os.path.exists(model_path):
             raise FileNotFoundError(f"Model file not found: {model_path}")
@@ -151,24 +152,123 @@ class TransformerClassifier:
         self.model.to(self.device)
         self.model.eval()
 
-    def predict(self, text):
-        # Tokenize input
-        enc = self.tokenizer.encode(text)
-        input_ids = torch.tensor([enc.ids]).to(self.device)
-        
-        # Get prediction
+        # Early-exit inference (see early_exit.py); off until enable_early_exit
+        self.exit_heads = None
+        self.early_exit_threshold = 0.0
+
+        # Batch layout (see packing.py) and padding-efficiency counters
+        self.padding = FIXED
+        self._unpadded_tokenizer = None
+        self._padding_lock = threading.Lock()
+        self._padding_counts = {"batches": 0, "texts": 0, "real_tokens": 0, "slots": 0}
+
+        # Numeric precision (see precision.py); precision.apply_precision
+        # switches it after a self-check and records the report here
+        self.precision = FP32
+        self.precision_report = None
+
+    def set_precision(self, mode, model=None):
+        """Runs inference in `mode`, with `model` (e.g. a bf16 copy) replacing the weights.
+
+        No checks; use precision.apply_precision.
+        """
+        if model is not None:
+            self.model = model
+        self.precision = mode
+        if self.exit_heads is not None:
+            self.exit_heads.to(self.model['classifier'].weight.dtype)
+
+    def set_padding(self, mode):
+        """Switches between the fixed, dynamic and packed batch layouts."""
+        if mode not in MODES:
+            raise ValueError(f"Unknown padding mode {mode!r}; expected one of {', '.join(MODES)}")
+        if mode != FIXED and self._unpadded_tokenizer is None:
+            unpadded = Tokenizer.from_str(self.tokenizer.to_str())
+            unpadded.no_padding()
+            self._unpadded_tokenizer = unpadded
+        self.padding = mode
+
+    def padding_stats(self):
+        with self._padding_lock:
+            stats = dict(self._padding_counts)
+        stats["mode"] = self.padding
+        # Share of computed token positions that hold real tokens
+        stats["efficiency"] = round(stats["real_tokens"] / stats["slots"], 4) if stats["slots"] else 0.0
+        return stats
+
+    def _record_padding(self, texts, real_tokens, slots):
+        with self._padding_lock:
+            counts = self._padding_counts
+            counts["batches"] += 1
+            counts["texts"] += texts
+            counts["real_tokens"] += real_tokens
+            counts["slots"] += slots
+
+    def enable_early_exit(self, threshold, heads=None):
+        """Classify from intermediate layers once the hate margin reaches `threshold`.
+
+        Without `heads`, the final classifier is reused at every layer.
+        """
+        if heads is None:
+            heads = ExitHeads.from_classifier(self.model['classifier'], len(self.model['encoder'].layers))
+        self.exit_heads = heads.to(self.device, self.model['classifier'].weight.dtype).eval()
+        self.early_exit_threshold = threshold
+
+    def _probs(self, input_ids):
+        if self.exit_heads is not None:
+            probs, _ = early_exit_forward(self.model, self.exit_heads, input_ids, self.early_exit_threshold)
+            return probs
+        encoded = self.model['encoder'](input_ids)
+        cls_output = encoded[:, 0, :]  # Take [CLS] token output
+        logits = self.model['classifier'](cls_output)
+        return torch.softmax(logits.float(), dim=1)
+
+    def _batch_probs(self, texts):
+        with precision_context(self.precision, self.device):
+            return self._layout_probs(texts)
+
+    def _layout_probs(self, texts):
+        if self.padding == FIXED:
+            encodings = self.tokenizer.encode_batch(texts)
+            input_ids = torch.tensor([enc.ids for enc in encodings]).to(self.device)
+            self._record_padding(len(texts), sum(sum(enc.attention_mask) for enc in encodings), input_ids.numel())
+            return self._probs(input_ids)
+        # Early exit only applies to the fixed layout
+        ids_list = [enc.ids for enc in self._unpadded_tokenizer.encode_batch(texts)]
+        pad_id = self.tokenizer.token_to_id("[PAD]")
+        if self.padding == PACKED:
+            layout = packed_layout(ids_list, pad_id, MODEL_CONFIG['MAX_LEN'])
+        else:
+            layout = dynamic_layout(ids_list, pad_id)
+        self._record_padding(len(texts), sum(len(ids) for ids in ids_list), layout.slots)
+        logits = self.model['classifier'](cls_states(self.model, layout.to(self.device)))
+        return torch.softmax(logits.float(), dim=1)
+
+    def predict_proba(self, texts):
+        """(class probabilities [N, classes], is_hate [N], hate_confidence [N]) as numpy arrays.
+
+        One device-to-host copy per batch; the rest is vectorised on the host.
+        Classes 0 and 1 are the hate classes.
+        """
         with torch.no_grad():
-            encoded = self.model['encoder'](input_ids)
-            cls_output = encoded[:, 0, :]  # Take [CLS] token output
-            logits = self.model['classifier'](cls_output)
-            probs = torch.softmax(logits, dim=1)
-            prediction = torch.argmax(probs, dim=1).item()
-            confidence = probs[0][prediction].item()
-
-            is_hate = prediction <= 1
-            hate_confidence = sum(probs[0][:2].tolist()) if is_hate else sum(probs[0][2:].tolist())
-            
-        return int(is_hate), float(hate_confidence)
+            probs = self._batch_probs(list(texts)).cpu().numpy()
+        is_hate = probs.argmax(axis=1) <= 1
+        hate_confidence = np.where(is_hate, probs[:, :2].sum(axis=1), probs[:, 2:].sum(axis=1))
+        return probs, is_hate, hate_confidence
+
+    def predict_batch_with_probs(self, texts):
+        """(label, hate_confidence, class probabilities) per text."""
+        if not texts:
+            return []
+        probs, is_hate, hate_confidence = self.predict_proba(texts)
+        return list(zip(is_hate.astype(int).tolist(), hate_confidence.tolist(), probs.tolist()))
+
+    def predict(self, text):
+        return self.predict_batch([text])[0]
+
+    def predict_batch(self, texts):
+        # One forward pass for the whole batch
+        return [(label, confidence) for label, confidence, _ in self.predict_batch_with_probs(texts)]
 
 class HateSpeechDetector:
     def __init__(self, model_path="transformer_classifier_checkpoint_best_best.pth",
@@ -176,23 +276,26 @@ class HateSpeechDetector:
         self.classifier = TransformerClassifier(model_path, tokenizer_path)
 
     def predict(self, text):
+        return self.predict_batch([text])[0]
 
-        label, confidence = self.classifier.predict(text)
-        sentiment = "negative" if label == 1 else "neutral"
-        
-        return label, confidence, sentiment
+    def predict_batch(self, texts):
+        # (label, confidence, sentiment, class probabilities) per text
+        return [
+            (label, confidence, "negative" if label == 1 else "neutral", probs)
+            for label, confidence, probs in self.classifier.predict_batch_with_probs(texts)
+        ]
     
 # example usage
 # # Initialize once
 # detector = HateSpeechDetector()
 
 # # Predict
-# label, conf, sentiment = detector.predict("Those people are disgusting animals.")
+# label, conf, sentiment, probs = detector.predict("Those people are disgusting animals.")
 # print(f"Prediction: {'Hate' if label else 'Non-Hate'}")
 # print(f"Sentiment: {sentiment}")
 # print(f"Confidence: {conf:.2%}")
 
-# label, conf, sentiment = detector.predict("I love spending time with everyone.")
+# label, conf, sentiment, probs = detector.predict("I love spending time with everyone.")
 # print(f"Prediction: {'Hate' if label else 'Non-Hate'}")
 # print(f"Sentiment: {sentiment}")
 # print(f"Confidence: {conf:.2%}")
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+"""
+Compare the WSGI (gunicorn sync workers) and ASGI (uvicorn + async views)
+deployments of POST /api/detect/ across concurrency levels.
+
+Both servers are started locally against the same database with the same
+number of worker processes. Usage (from backend/):
+
+    python benchmarks/asgi_vs_wsgi.py --workers 2 --concurrency 1,8,32,64 --requests 400
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'hate_speech_api.settings')
+
+from servers import running_server  # noqa: E402
+
+SAMPLE_TEXT = "You people are the worst, get out of this thread before I report you"
+
+
+def ensure_api_key():
+    import django
+    django.setup()
+    from users.models import APIKey, User
+
+    user, _ = User.objects.get_or_create(email='bench@example.com', defaults={'is_verified': True})
+    api_key, _ = APIKey.objects.get_or_create(user=user, defaults={'key': 'bench-api-key'})
+    return api_key.key
+
+
+def post_detect(base_url, api_key):
+    body = json.dumps({'text': SAMPLE_TEXT}).encode()
+    request = urllib.request.Request(
+        f'{base_url}/api/detect/', data=body, method='POST',
+        headers={'Content-Type': 'application/json', 'X-API-KEY': api_key},
+    )
+    start = time.perf_counter()
+    try:
+        urllib.request.urlopen(request, timeout=60).read()
+        ok = True
+    except (urllib.error.URLError, OSError):
+        ok = False
+    return (time.perf_counter() - start) * 1000.0, ok
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * (len(values) - 1)))] if values else 0.0
+
+
+def run_level(base_url, api_key, concurrency, requests):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outcomes = list(pool.map(lambda _: post_detect(base_url, api_key), range(requests)))
+    elapsed = time.perf_counter() - start
+    latencies = [ms for ms, ok in outcomes if ok]
+    return {
+        'concurrency': concurrency,
+        'requests': requests,
+        'errors': sum(1 for _, ok in outcomes if not ok),
+        'throughput_rps': round(len(latencies) / elapsed, 2),
+        'p50_ms': round(percentile(latencies, 0.50), 2),
+        'p99_ms': round(percentile(latencies, 0.99), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--concurrency', default='1,8,32,64')
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--servers', default='wsgi,asgi')
+    parser.add_argument('--output', help='Write results as JSON to this file.')
+    args = parser.parse_args()
+
+    api_key = ensure_api_key()
+    levels = [int(c) for c in args.concurrency.split(',')]
+    results = {}
+    for kind in args.servers.split(','):
+        with running_server(kind, args.workers) as base_url:
+            post_detect(base_url, api_key)  # load the model before measuring
+            results[kind] = [run_level(base_url, api_key, c, args.requests) for c in levels]
+
+    print(f"{'server':<6} {'conc':>5} {'rps':>9} {'p50 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for kind, rows in results.items():
+        for row in rows:
+            print(f"{kind:<6} {row['concurrency']:>5} {row['throughput_rps']:>9} "
+                  f"{row['p50_ms']:>9} {row['p99_ms']:>9} {row['errors']:>7}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
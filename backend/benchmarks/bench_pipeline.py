@@ -0,0 +1,223 @@
+#!/usr/bin/env python
+"""
+Per-stage benchmark of the detection pipeline.
+
+Stages, each measured on short/medium/long texts:
+
+    clean                TextPreprocessor.basic_clean
+    preprocess           TextPreprocessor.preprocess
+    detector_preprocess  HateSpeechDetector.preprocess_text
+    tokenize             tokenizer.encode
+    predict.bsN          TransformerClassifier.predict / predict_batch at batch size N
+    http_detect          POST /api/detect/ through the Django test client
+
+Results are written as JSON and compared against a stored baseline; the run
+fails if any stage's p50 regressed by more than --threshold. Runs offline: if
+the trained checkpoint is missing, a randomly initialised one with the same
+architecture is used (timings are the same, verdicts are meaningless).
+
+Usage (from backend/):
+
+    python benchmarks/bench_pipeline.py                     # run and compare
+    python benchmarks/bench_pipeline.py --update-baseline   # accept current numbers
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+sys.path.append(BACKEND_DIR)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'hate_speech_api.settings')
+
+import corpora  # noqa: E402
+
+DEFAULT_OUTPUT = os.path.join(BENCH_DIR, 'results.json')
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, 'baseline.json')
+CHECKPOINT_NAME = 'transformer_classifier_checkpoint_best_best.pth'
+# Differences below this are timer noise, whatever the percentage
+NOISE_FLOOR_MS = 0.05
+
+
+def ensure_checkpoint():
+    """Returns 'trained' or 'random'; points the app at a random checkpoint if needed."""
+    if os.path.exists(os.path.join(BACKEND_DIR, 'Classifier', CHECKPOINT_NAME)) or os.environ.get('DETECTION_MODEL_PATH'):
+        return 'trained'
+    import torch
+    from tokenizers import Tokenizer
+    from Classifier.utilities import build_model
+
+    vocab_size = Tokenizer.from_file(os.path.join(BACKEND_DIR, 'Classifier', 'tokenizer.json')).get_vocab_size()
+    torch.manual_seed(0)
+    path = os.path.join(tempfile.mkdtemp(prefix='bench-'), CHECKPOINT_NAME)
+    torch.save(build_model(vocab_size).state_dict(), path)
+    os.environ['DETECTION_MODEL_PATH'] = path
+    return 'random'
+
+
+def measure(fn, inputs, repeats, warmup=3):
+    for item in inputs[:warmup]:
+        fn(item)
+    timings = []
+    for _ in range(repeats):
+        for item in inputs:
+            start = time.perf_counter()
+            fn(item)
+            timings.append((time.perf_counter() - start) * 1000.0)
+    timings.sort()
+    return {
+        'calls': len(timings),
+        'mean_ms': round(statistics.fmean(timings), 4),
+        'p50_ms': round(timings[len(timings) // 2], 4),
+        'p95_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 4),
+    }
+
+
+def with_rate(stats, items_per_call):
+    stats['items_per_sec'] = round(items_per_call * 1000.0 / stats['mean_ms'], 1) if stats['mean_ms'] else 0.0
+    return stats
+
+
+def run_http(corpus, repeats):
+    from django.db import connection
+    from django.test import Client
+    from django.test.utils import setup_test_environment
+    from users.models import APIKey, User
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        user = User.objects.create_user(email='bench@example.com', password='bench-password', is_verified=True)
+        api_key = APIKey.objects.create(user=user, key='bench-api-key').key
+        client = Client()
+
+        def post(text):
+            response = client.post('/api/detect/', {'text': text}, content_type='application/json',
+                                   HTTP_X_API_KEY=api_key)
+            if response.status_code != 200:
+                raise RuntimeError(f'POST /api/detect/ returned {response.status_code}: {response.content[:200]}')
+
+        return {
+            f'http_detect.{name}': with_rate(measure(post, texts, repeats), 1)
+            for name, texts in corpus.items()
+        }
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+def run(args):
+    checkpoint = ensure_checkpoint()
+    import django
+    django.setup()
+    from detection.model import get_detector
+    from detection.preprocess import get_preprocessor
+
+    corpus = corpora.load(args.corpus, args.count, args.seed)
+    preprocessor = get_preprocessor()
+    detector = get_detector()
+    if detector is None:
+        raise SystemExit('HateSpeechDetector failed to load; see the log above')
+    classifier = detector.classifier
+
+    results = {}
+    for name, texts in corpus.items():
+        results[f'clean.{name}'] = with_rate(measure(preprocessor.basic_clean, texts, args.repeats), 1)
+        results[f'preprocess.{name}'] = with_rate(measure(preprocessor.preprocess, texts, args.repeats), 1)
+        results[f'detector_preprocess.{name}'] = with_rate(measure(detector.preprocess_text, texts, args.repeats), 1)
+        model_inputs = [detector.preprocess_text(preprocessor.basic_clean(t)) for t in texts]
+        results[f'tokenize.{name}'] = with_rate(measure(classifier.tokenizer.encode, model_inputs, args.repeats), 1)
+
+    model_inputs = [
+        detector.preprocess_text(preprocessor.basic_clean(t))
+        for texts in corpus.values() for t in texts
+    ]
+    for batch_size in args.batch_sizes:
+        # Cycle the corpus so every batch is full
+        batches = [
+            [model_inputs[(start + i) % len(model_inputs)] for i in range(batch_size)]
+            for start in range(0, max(len(model_inputs), batch_size), batch_size)
+        ]
+        fn = (lambda batch: classifier.predict(batch[0])) if batch_size == 1 else classifier.predict_batch
+        results[f'predict.bs{batch_size}'] = with_rate(measure(fn, batches, args.repeats, warmup=1), batch_size)
+
+    if not args.skip_http:
+        results.update(run_http(corpus, args.repeats))
+
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'processor': platform.processor(),
+            'cpu_count': os.cpu_count(),
+            'checkpoint': checkpoint,
+            'corpus': args.corpus,
+            'repeats': args.repeats,
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'results': results,
+    }
+
+
+def compare(current, baseline, threshold):
+    """Prints a comparison table; returns the names of regressed stages."""
+    regressions = []
+    print(f"{'stage':<34} {'p50 ms':>10} {'base ms':>10} {'delta':>8}")
+    for stage, stats in current['results'].items():
+        base = baseline['results'].get(stage)
+        if base is None:
+            print(f"{stage:<34} {stats['p50_ms']:>10.4f} {'-':>10} {'new':>8}")
+            continue
+        delta = (stats['p50_ms'] - base['p50_ms']) / base['p50_ms'] if base['p50_ms'] else 0.0
+        regressed = delta > threshold and stats['p50_ms'] - base['p50_ms'] > NOISE_FLOOR_MS
+        if regressed:
+            regressions.append(stage)
+        flag = '  REGRESSION' if regressed else ''
+        print(f"{stage:<34} {stats['p50_ms']:>10.4f} {base['p50_ms']:>10.4f} {delta:>+8.1%}{flag}")
+    if baseline['meta'].get('checkpoint') != current['meta'].get('checkpoint'):
+        print('note: baseline and current run used different checkpoints')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--corpus', choices=['fixture', 'synthetic', 'both'], default='both')
+    parser.add_argument('--count', type=int, default=64, help='Synthetic texts per length class.')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--batch-sizes', type=lambda s: [int(x) for x in s.split(',')], default=[1, 8, 32, 64])
+    parser.add_argument('--skip-http', action='store_true', help='Skip the Django test client stage.')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT)
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--threshold', type=float, default=0.15, help='Allowed p50 slowdown (0.15 = 15%%).')
+    parser.add_argument('--update-baseline', action='store_true', help='Store this run as the new baseline.')
+    args = parser.parse_args()
+
+    current = run(args)
+    with open(args.output, 'w') as f:
+        json.dump(current, f, indent=2)
+    print(f'Wrote {args.output}')
+
+    if args.update_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(current, f, indent=2)
+        print(f'Updated baseline {args.baseline}')
+        return
+    if not os.path.exists(args.baseline):
+        print(f'No baseline at {args.baseline}; rerun with --update-baseline to create one')
+        return
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(current, baseline, args.threshold)
+    if regressions:
+        print(f'{len(regressions)} stage(s) regressed by more than {args.threshold:.0%}: {", ".join(regressions)}')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""Benchmark corpora: a checked-in fixture plus seeded synthetic texts.
+
+Texts come in three length classes so that per-stage costs can be read
+against input size:
+
+    short   5-15 words     (chat messages)
+    medium  30-60 words    (comments)
+    long    150-250 words  (posts; longer than the 256-token model window)
+"""
+
+import json
+import os
+import random
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURE_PATH = os.path.join(BENCH_DIR, 'fixtures', 'corpus.jsonl')
+WORDS_PATH = os.path.join(os.path.dirname(BENCH_DIR), 'Classifier', 'words.json')
+
+LENGTHS = {
+    'short': (5, 15),
+    'medium': (30, 60),
+    'long': (150, 250),
+}
+
+_COMMON_WORDS = (
+    "the a to and of you i it is that in this for on with be are not have was they "
+    "just so people what like your get do all can but me my at think one know about "
+    "would there if really time good make see going from want their will thread post "
+    "comment game team love hate never always everyone nobody today night lol honestly"
+).split()
+
+_NOISE = [
+    "@user_{n}", "#topic{n}", "https://example.com/p/{n}", "www.site{n}.org", "<b>{n}</b>",
+    "{n}!!!", "mail{n}@example.com", "😂", "🔥", "...",
+]
+
+
+def _hate_words():
+    try:
+        with open(WORDS_PATH, encoding='utf-8') as f:
+            return json.load(f).get('hate_words', [])
+    except (OSError, ValueError):
+        return []
+
+
+def synthetic(length_class, count, seed=0):
+    """Seeded texts of one length class with realistic noise and lexicon hits."""
+    rng = random.Random(f"{seed}-{length_class}")
+    low, high = LENGTHS[length_class]
+    lexicon = _hate_words() or ['idiot']
+    texts = []
+    for _ in range(count):
+        words = []
+        for _ in range(rng.randint(low, high)):
+            roll = rng.random()
+            if roll < 0.05:
+                words.append(rng.choice(lexicon))
+            elif roll < 0.10:
+                words.append(rng.choice(_NOISE).format(n=rng.randint(1, 999)))
+            else:
+                words.append(rng.choice(_COMMON_WORDS))
+        if rng.random() < 0.5:
+            words[0] = words[0].capitalize()
+        texts.append(' '.join(words))
+    return texts
+
+
+def fixture():
+    """{length_class: [texts]} from fixtures/corpus.jsonl."""
+    corpus = {name: [] for name in LENGTHS}
+    with open(FIXTURE_PATH, encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                corpus[record['length']].append(record['text'])
+    return corpus
+
+
+def load(kind='both', count=64, seed=0):
+    """{length_class: [texts]} for 'fixture', 'synthetic' or 'both'."""
+    corpus = {name: [] for name in LENGTHS}
+    if kind in ('fixture', 'both'):
+        for name, texts in fixture().items():
+            corpus[name].extend(texts)
+    if kind in ('synthetic', 'both'):
+        for name in LENGTHS:
+            corpus[name].extend(synthetic(name, count, seed))
+    return corpus
@@ -0,0 +1,345 @@
+#!/usr/bin/env python
+"""
+Closed-loop load generator for the HTTP API.
+
+Each of --concurrency worker threads keeps one keep-alive connection open and
+sends requests back to back, picking the request type from --mix and the text
+length class from --lengths:
+
+    single    POST /api/detect/           (X-API-KEY)
+    batch     POST /api/detect/batch/     (X-API-KEY, --batch-size texts)
+    history   GET  /api/detect/history/   (JWT from /api/auth/login/)
+
+Reports throughput, p50/p95/p99/p999 latency per request type, error rates by
+status code, and the server-side stage timings the detect views return in
+their Server-Timing header (preprocess, model, db).
+
+Usage (from backend/):
+
+    # Fresh SQLite database with 20 users/API keys, gunicorn started locally
+    python benchmarks/loadtest.py --setup-db var/loadtest.sqlite3 --users 20 --start wsgi \\
+        --concurrency 32 --duration 60 --mix single=80,batch=15,history=5
+
+    # Same against uvicorn (async views)
+    python benchmarks/loadtest.py --setup-db var/loadtest.sqlite3 --start asgi --concurrency 32
+
+    # An already running server
+    python benchmarks/loadtest.py --url http://127.0.0.1:8000 --api-key KEY \\
+        --email me@example.com --password secret
+"""
+
+import argparse
+import http.client
+import json
+import os
+import random
+import sys
+import threading
+import time
+import urllib.parse
+from collections import defaultdict
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+sys.path.append(BACKEND_DIR)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'hate_speech_api.settings')
+
+import corpora  # noqa: E402
+from servers import running_server  # noqa: E402
+
+REQUEST_TYPES = ('single', 'batch', 'history')
+USER_PASSWORD = 'loadtest-password'
+
+
+def parse_weights(spec, allowed):
+    """Parses 'a=80,b=20' into {'a': 0.8, 'b': 0.2}."""
+    weights = {}
+    for part in spec.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in allowed:
+            raise SystemExit(f'Unknown entry {name!r}; expected one of {", ".join(allowed)}')
+        weights[name] = float(weight or 1)
+    total = sum(weights.values())
+    if total <= 0:
+        raise SystemExit(f'Weights must add up to more than zero: {spec!r}')
+    return {name: weight / total for name, weight in weights.items()}
+
+
+def setup_database(path, users):
+    """Creates a migrated SQLite database with verified users and API keys."""
+    if os.path.exists(path):
+        os.remove(path)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    os.environ['SQLITE_PATH'] = os.path.abspath(path)
+
+    import django
+    django.setup()
+    from django.core.management import call_command
+    from users.models import APIKey, User
+
+    call_command('migrate', verbosity=0)
+    credentials = []
+    for i in range(users):
+        email = f'loadtest{i}@example.com'
+        user = User.objects.create_user(email=email, password=USER_PASSWORD, is_verified=True)
+        api_key = APIKey.objects.create(user=user)
+        credentials.append({'email': email, 'password': USER_PASSWORD, 'api_key': str(api_key.key)})
+    return credentials
+
+
+def parse_server_timing(header):
+    stages = {}
+    for entry in (header or '').split(','):
+        name, *params = [p.strip() for p in entry.split(';')]
+        for param in params:
+            if param.startswith('dur='):
+                try:
+                    stages[name] = float(param[4:])
+                except ValueError:
+                    pass
+    return stages
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * (len(sorted_values) - 1)))]
+
+
+class Worker(threading.Thread):
+    def __init__(self, base_url, credentials, mix, lengths, texts, batch_size, budget, deadline, seed):
+        super().__init__(daemon=True)
+        url = urllib.parse.urlsplit(base_url)
+        self.host, self.port = url.hostname, url.port or 80
+        self.credentials = credentials
+        self.mix = mix
+        self.lengths = lengths
+        self.texts = texts
+        self.batch_size = batch_size
+        self.budget = budget
+        self.deadline = deadline
+        self.rng = random.Random(seed)
+        self.connection = None
+        self.token = None
+        # (request type, status, latency ms, server stages)
+        self.samples = []
+
+    def _request(self, method, path, body=None, headers=None):
+        headers = dict(headers or {})
+        data = None
+        if body is not None:
+            data = json.dumps(body).encode('utf-8')
+            headers['Content-Type'] = 'application/json'
+        for attempt in range(2):
+            if self.connection is None:
+                self.connection = http.client.HTTPConnection(self.host, self.port, timeout=120)
+            try:
+                self.connection.request(method, path, body=data, headers=headers)
+                response = self.connection.getresponse()
+                payload = response.read()
+                return response.status, response.getheader('Server-Timing'), payload
+            except (http.client.HTTPException, OSError):
+                self.connection.close()
+                self.connection = None
+                if attempt:
+                    raise
+
+    def _login(self):
+        status, _, payload = self._request('POST', '/api/auth/login/', {
+            'email': self.credentials['email'], 'password': self.credentials['password'],
+        })
+        if status != 200:
+            raise RuntimeError(f'Login failed with {status}: {payload[:200]!r}')
+        self.token = json.loads(payload)['access']
+
+    def _pick(self, weights):
+        roll, cumulative = self.rng.random(), 0.0
+        for name, weight in weights.items():
+            cumulative += weight
+            if roll < cumulative:
+                return name
+        return name
+
+    def _text(self):
+        return self.rng.choice(self.texts[self._pick(self.lengths)])
+
+    def _send(self, kind):
+        api_headers = {'X-API-KEY': self.credentials['api_key']}
+        if kind == 'single':
+            return self._request('POST', '/api/detect/', {'text': self._text()}, api_headers)
+        if kind == 'batch':
+            texts = [self._text() for _ in range(self.batch_size)]
+            return self._request('POST', '/api/detect/batch/', {'texts': texts}, api_headers)
+        if self.token is None:
+            self._login()
+        return self._request('GET', '/api/detect/history/', headers={'Authorization': f'Bearer {self.token}'})
+
+    def run(self):
+        while time.perf_counter() < self.deadline and self.budget.take():
+            kind = self._pick(self.mix)
+            start = time.perf_counter()
+            try:
+                status, timing, _ = self._send(kind)
+            except Exception:
+                status, timing = 0, None
+            self.samples.append((kind, status, (time.perf_counter() - start) * 1000.0, parse_server_timing(timing)))
+        if self.connection is not None:
+            self.connection.close()
+
+
+class Budget:
+    """Shared request budget; unlimited when `total` is None."""
+
+    def __init__(self, total):
+        self.remaining = total
+        self.lock = threading.Lock()
+
+    def take(self):
+        if self.remaining is None:
+            return True
+        with self.lock:
+            if self.remaining <= 0:
+                return False
+            self.remaining -= 1
+            return True
+
+
+def summarise(samples, elapsed):
+    def block(rows):
+        latencies = sorted(ms for _, status, ms, _ in rows if 200 <= status < 300)
+        errors = defaultdict(int)
+        for _, status, _, _ in rows:
+            if not 200 <= status < 300:
+                errors[str(status) if status else 'connection'] += 1
+        stages = defaultdict(list)
+        for _, _, _, timing in rows:
+            for stage, ms in timing.items():
+                stages[stage].append(ms)
+        return {
+            'requests': len(rows),
+            'throughput_rps': round(len(rows) / elapsed, 2) if elapsed else 0.0,
+            'error_rate': round(sum(errors.values()) / len(rows), 4) if rows else 0.0,
+            'errors': dict(errors),
+            'p50_ms': round(percentile(latencies, 0.50), 2),
+            'p95_ms': round(percentile(latencies, 0.95), 2),
+            'p99_ms': round(percentile(latencies, 0.99), 2),
+            'p999_ms': round(percentile(latencies, 0.999), 2),
+            'max_ms': round(latencies[-1], 2) if latencies else 0.0,
+            'server_timing': {
+                stage: {
+                    'mean_ms': round(sum(values) / len(values), 2),
+                    'p95_ms': round(percentile(sorted(values), 0.95), 2),
+                }
+                for stage, values in stages.items()
+            },
+        }
+
+    by_type = defaultdict(list)
+    for sample in samples:
+        by_type[sample[0]].append(sample)
+    return {
+        'elapsed_s': round(elapsed, 2),
+        'overall': block(samples),
+        'by_type': {kind: block(rows) for kind, rows in by_type.items()},
+    }
+
+
+def run_load(base_url, credentials, args):
+    mix = parse_weights(args.mix, REQUEST_TYPES)
+    length_weights = parse_weights(args.lengths, tuple(corpora.LENGTHS))
+    texts = {name: corpora.synthetic(name, 200, args.seed) for name in length_weights}
+
+    # Warm up: loads the model in each worker before measuring
+    Worker(base_url, credentials[0], {'single': 1.0}, length_weights, texts, args.batch_size,
+           Budget(args.warmup), float('inf'), args.seed).run()
+
+    budget = Budget(args.requests)
+    start = time.perf_counter()
+    deadline = start + args.duration if args.duration else float('inf')
+    workers = [
+        Worker(base_url, credentials[i % len(credentials)], mix, length_weights, texts, args.batch_size,
+               budget, deadline, f'{args.seed}-{i}')
+        for i in range(args.concurrency)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+    return summarise([sample for worker in workers for sample in worker.samples], elapsed)
+
+
+def print_report(report):
+    print(f"{'type':<9} {'reqs':>7} {'rps':>9} {'p50':>8} {'p95':>8} {'p99':>8} {'p999':>8} {'err %':>7}")
+    rows = list(report['by_type'].items()) + [('overall', report['overall'])]
+    for kind, stats in rows:
+        print(f"{kind:<9} {stats['requests']:>7} {stats['throughput_rps']:>9} {stats['p50_ms']:>8} "
+              f"{stats['p95_ms']:>8} {stats['p99_ms']:>8} {stats['p999_ms']:>8} {stats['error_rate'] * 100:>6.2f}%")
+    if report['overall']['errors']:
+        print('errors by status:', ', '.join(f'{k}={v}' for k, v in sorted(report['overall']['errors'].items())))
+    for kind, stats in report['by_type'].items():
+        if stats['server_timing']:
+            stages = ', '.join(f"{stage} {s['mean_ms']} ms (p95 {s['p95_ms']})" for stage, s in stats['server_timing'].items())
+            print(f'server timing [{kind}]: {stages}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--url', help='Base URL of a running server.')
+    target.add_argument('--start', choices=['wsgi', 'asgi'], help='Start a local server of this kind.')
+    parser.add_argument('--workers', type=int, default=2, help='Server worker processes (with --start).')
+    parser.add_argument('--setup-db', metavar='PATH', help='Create a fresh SQLite database with test users.')
+    parser.add_argument('--users', type=int, default=10, help='Users/API keys to create with --setup-db.')
+    parser.add_argument('--api-key', help='API key to use without --setup-db.')
+    parser.add_argument('--email', help='Login for history requests without --setup-db.')
+    parser.add_argument('--password')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=30.0, help='Seconds to run (0 = until --requests).')
+    parser.add_argument('--requests', type=int, help='Stop after this many requests.')
+    parser.add_argument('--warmup', type=int, default=10, help='Unmeasured requests sent first.')
+    parser.add_argument('--mix', default='single=80,batch=15,history=5')
+    parser.add_argument('--lengths', default='short=60,medium=30,long=10')
+    parser.add_argument('--batch-size', type=int, default=16)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Write the report as JSON to this file.')
+    args = parser.parse_args()
+    if not args.duration and not args.requests:
+        parser.error('--duration 0 needs --requests')
+
+    if args.setup_db:
+        credentials = setup_database(args.setup_db, max(1, args.users))
+        print(f'Created {len(credentials)} users in {args.setup_db}')
+    elif args.api_key:
+        credentials = [{'email': args.email, 'password': args.password, 'api_key': args.api_key}]
+        if 'history' in parse_weights(args.mix, REQUEST_TYPES) and not (args.email and args.password):
+            parser.error('history requests need --email and --password (or --setup-db)')
+    else:
+        parser.error('either --setup-db or --api-key is required')
+
+    if args.start:
+        env = {'SQLITE_PATH': os.environ['SQLITE_PATH']} if args.setup_db else {}
+        with running_server(args.start, args.workers, env) as base_url:
+            report = run_load(base_url, credentials, args)
+    else:
+        if args.setup_db:
+            print(f'note: {args.url} must be running with SQLITE_PATH={os.environ["SQLITE_PATH"]}')
+        report = run_load(args.url.rstrip('/'), credentials, args)
+
+    report['config'] = {
+        'target': args.start or args.url,
+        'concurrency': args.concurrency,
+        'mix': args.mix,
+        'lengths': args.lengths,
+        'batch_size': args.batch_size,
+    }
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f'Wrote {args.output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+"""
+Wire-format cost of /api/detect/batch/: JSON vs MessagePack.
+
+For each batch size, a request body of short texts and a response of
+verdicts (default batch fields) are put through the code the API and a
+typical client run:
+
+    client_encode    json.dumps / msgpack.packb of the request body
+    server_parse     DRF JSONParser / MessagePackParser
+    server_render    DRF JSONRenderer, ORJSONRenderer, MessagePackRenderer
+                     (row-wise, and column-wise as the batch endpoint sends it)
+    client_decode    json.loads / msgpack.unpackb of the response
+
+It also reports request and response sizes. No model or database is needed.
+Usage (from backend/):
+
+    python benchmarks/msgpack_vs_json.py
+    python benchmarks/msgpack_vs_json.py --batch-sizes 1,100,1000 --repeats 20 --output var/wire.json
+"""
+
+import argparse
+import io
+import json
+import os
+import random
+import sys
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+sys.path.append(BACKEND_DIR)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'hate_speech_api.settings')
+
+import corpora  # noqa: E402
+from bench_pipeline import measure  # noqa: E402
+
+
+def fake_results(count, seed=0):
+    """Verdicts shaped like the batch endpoint's default fields."""
+    rng = random.Random(seed)
+    results = []
+    for i in range(count):
+        toxic = rng.random() < 0.2
+        results.append({
+            'id': 100000 + i,
+            'classification': 'toxic' if toxic else 'safe',
+            'confidence': rng.uniform(0.5, 1.0),
+            'sentiment': 'negative' if toxic else 'neutral',
+            'engine': 'transformer',
+        })
+    return results
+
+
+def run(args):
+    import django
+
+    django.setup()
+    import msgpack
+    from rest_framework.parsers import JSONParser
+    from rest_framework.renderers import JSONRenderer
+
+    from detection.parsers import MessagePackParser
+    from detection.renderers import ORJSONRenderer, MessagePackRenderer, columns
+
+    texts = corpora.synthetic('short', max(args.batch_sizes), args.seed)
+    rows = []
+    for size in args.batch_sizes:
+        request = {'texts': texts[:size]}
+        results = fake_results(size, args.seed)
+        response = {'count': size, 'latency_ms': 12.34, 'results': results}
+        columnar = {'count': size, 'latency_ms': 12.34, 'results': columns(results, tuple(results[0]))}
+        json_request, msgpack_request = json.dumps(request).encode('utf-8'), msgpack.packb(request)
+        renderers = {
+            'json (DRF)': lambda: JSONRenderer().render(response),
+            'json (orjson)': lambda: ORJSONRenderer().render(response),
+            'msgpack rows': lambda: MessagePackRenderer().render(response),
+            'msgpack columns': lambda: MessagePackRenderer().render(columnar),
+        }
+        bodies = {name: render() for name, render in renderers.items()}
+        inputs = [None] * max(1, args.calls // size)
+
+        stages = [
+            ('client_encode', 'json', lambda _: json.dumps(request).encode('utf-8'), len(json_request)),
+            ('client_encode', 'msgpack', lambda _: msgpack.packb(request), len(msgpack_request)),
+            ('server_parse', 'json', lambda _: JSONParser().parse(io.BytesIO(json_request)), len(json_request)),
+            ('server_parse', 'msgpack', lambda _: MessagePackParser().parse(io.BytesIO(msgpack_request)), len(msgpack_request)),
+        ]
+        stages += [('server_render', name, lambda _, render=render: render(), len(bodies[name]))
+                   for name, render in renderers.items()]
+        decoders = {'json (orjson)': json.loads, 'msgpack rows': msgpack.unpackb, 'msgpack columns': msgpack.unpackb}
+        stages += [('client_decode', name, lambda _, body=bodies[name], decode=decode: decode(body), len(bodies[name]))
+                   for name, decode in decoders.items()]
+        for stage, fmt, fn, size_bytes in stages:
+            stats = measure(fn, inputs, args.repeats)
+            rows.append({'batch_size': size, 'stage': stage, 'format': fmt, 'bytes': size_bytes,
+                         'p50_ms': stats['p50_ms'], 'us_per_item': round(stats['p50_ms'] * 1000.0 / size, 3)})
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--batch-sizes', type=lambda s: [int(x) for x in s.split(',')], default=[1, 100, 1000])
+    parser.add_argument('--calls', type=int, default=2000, help='Items encoded per repeat (calls = calls // batch size).')
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Also write the results as JSON.')
+    args = parser.parse_args()
+
+    rows = run(args)
+    print(f"{'batch':>6} {'stage':<14} {'format':<16} {'bytes':>9} {'p50 ms':>9} {'us/item':>9}")
+    for row in rows:
+        print(f"{row['batch_size']:>6} {row['stage']:<14} {row['format']:<16} {row['bytes']:>9} "
+              f"{row['p50_ms']:>9.4f} {row['us_per_item']:>9.3f}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(rows, f, indent=2)
+        print(f'Wrote {args.output}')
+
+
+if __name__ == '__main__':
+    main()
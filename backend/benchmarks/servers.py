@@ -0,0 +1,59 @@
+"""
+Start and stop local WSGI/ASGI deployments for the benchmarks.
+
+    wsgi   gunicorn sync workers, hate_speech_api.wsgi
+    asgi   uvicorn workers, hate_speech_api.asgi (async views + streaming)
+"""
+
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from contextlib import contextmanager
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SERVERS = {
+    'wsgi': lambda port, workers: [
+        sys.executable, '-m', 'gunicorn', 'hate_speech_api.wsgi:application',
+        '--workers', str(workers), '--bind', f'127.0.0.1:{port}', '--log-level', 'warning',
+    ],
+    'asgi': lambda port, workers: [
+        sys.executable, '-m', 'uvicorn', 'hate_speech_api.asgi:application',
+        '--workers', str(workers), '--host', '127.0.0.1', '--port', str(port), '--log-level', 'warning',
+    ],
+}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_until_up(base_url, timeout=120.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f'{base_url}/api/docs/', timeout=2).read()
+            return
+        except (urllib.error.URLError, ConnectionError, OSError):
+            time.sleep(0.5)
+    raise RuntimeError(f'Server at {base_url} did not start within {timeout:.0f}s')
+
+
+@contextmanager
+def running_server(kind, workers=2, env=None):
+    """Starts a server of the given kind on a free port; yields its base URL."""
+    port = free_port()
+    base_url = f'http://127.0.0.1:{port}'
+    server = subprocess.Popen(SERVERS[kind](port, workers), cwd=BACKEND_DIR, env={**os.environ, **(env or {})})
+    try:
+        wait_until_up(base_url)
+        yield base_url
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
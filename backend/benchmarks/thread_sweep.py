@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+"""
+Sweep worker processes x torch intra-op threads on this machine.
+
+Each configuration starts `workers` processes, each loading the classifier
+with `threads` intra-op threads (as detection/torch_threads.py would). All
+of them run back-to-back predict_batch calls at the same time for
+--duration seconds. That is the CPU contention of a busy multi-worker
+deployment without the HTTP layer. Reported per configuration: total
+texts/s and per-call p50/p99 latency.
+
+The recommendation is the highest-throughput configuration whose p99 is
+within --p99-ms, which defaults to 3x the best p99 measured. Runs offline
+with a random checkpoint if the trained one is missing. Usage (from
+backend/):
+
+    python benchmarks/thread_sweep.py                         # powers of two up to the core count
+    python benchmarks/thread_sweep.py --workers 1,2,4 --threads 1,2,4 --batch-size 8 --pin
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+sys.path.append(BACKEND_DIR)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'hate_speech_api.settings')
+
+import corpora  # noqa: E402
+from bench_pipeline import CHECKPOINT_NAME, ensure_checkpoint  # noqa: E402
+
+
+def usable_cores():
+    return len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count() or 1
+
+
+def powers_of_two(limit):
+    values, n = [], 1
+    while n < limit:
+        values.append(n)
+        n *= 2
+    return values + [limit]
+
+
+def percentile(sorted_values, q):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * q))]
+
+
+def _worker(slot, workers, threads, pin, model_path, texts, batch_size, duration, barrier, results):
+    if pin:
+        from detection.torch_threads import pin_worker
+        pin_worker(slot, workers)
+    import torch
+    torch.set_num_threads(threads)
+    torch.set_num_interop_threads(1)
+    from Classifier.utilities import TransformerClassifier
+
+    classifier = TransformerClassifier(model_path, os.path.join(BACKEND_DIR, 'Classifier', 'tokenizer.json'))
+    classifier.predict_batch(texts[:batch_size])  # warm up
+    barrier.wait()
+    latencies, i = [], 0
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        batch = [texts[(i + k) % len(texts)] for k in range(batch_size)]
+        i += batch_size
+        start = time.perf_counter()
+        classifier.predict_batch(batch)
+        latencies.append((time.perf_counter() - start) * 1000.0)
+    results.put(latencies)
+
+
+def run_config(workers, threads, args, model_path, texts):
+    ctx = multiprocessing.get_context('spawn')  # fresh torch thread pools per process
+    barrier = ctx.Barrier(workers)
+    results = ctx.Queue()
+    processes = [
+        ctx.Process(target=_worker, args=(slot, workers, threads, args.pin, model_path, texts,
+                                          args.batch_size, args.duration, barrier, results))
+        for slot in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    latencies = []
+    for _ in processes:
+        latencies.extend(results.get())
+    for process in processes:
+        process.join()
+    latencies.sort()
+    return {
+        'workers': workers,
+        'threads': threads,
+        'texts_per_s': round(len(latencies) * args.batch_size / args.duration, 1),
+        'p50_ms': round(percentile(latencies, 0.50), 2),
+        'p99_ms': round(percentile(latencies, 0.99), 2),
+    }
+
+
+def main():
+    cores = usable_cores()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=lambda s: [int(x) for x in s.split(',')], default=powers_of_two(cores))
+    parser.add_argument('--threads', type=lambda s: [int(x) for x in s.split(',')], default=powers_of_two(cores))
+    parser.add_argument('--max-oversubscription', type=float, default=2.0,
+                        help='Skip workers x threads above this many times the core count '
+                             '(one thread per core for every worker, torch\'s default, is always run).')
+    parser.add_argument('--batch-size', type=int, default=1, help='Texts per call (1 = interactive requests).')
+    parser.add_argument('--duration', type=float, default=10.0, help='Seconds per configuration.')
+    parser.add_argument('--pin', action='store_true', help='Pin each worker to its own cores (DETECTION_PIN_WORKERS).')
+    parser.add_argument('--p99-ms', type=float, help='p99 budget for the recommendation (default: 3x the best p99).')
+    parser.add_argument('--output', help='Also write the results as JSON.')
+    args = parser.parse_args()
+
+    checkpoint = ensure_checkpoint()
+    model_path = os.environ.get('DETECTION_MODEL_PATH') or os.path.join(BACKEND_DIR, 'Classifier', CHECKPOINT_NAME)
+    texts = [text for group in corpora.load('synthetic', 32).values() for text in group]
+
+    configs = [
+        (w, t) for w in args.workers for t in args.threads
+        if w * t <= args.max_oversubscription * cores or t == cores
+    ]
+    print(f'{cores} usable cores, {checkpoint} checkpoint, batch size {args.batch_size}, '
+          f'{len(configs)} configurations x {args.duration:.0f}s')
+    print(f"{'workers':>7} {'threads':>7} {'texts/s':>9} {'p50 ms':>8} {'p99 ms':>8}")
+    results = []
+    for workers, threads in configs:
+        result = run_config(workers, threads, args, model_path, texts)
+        results.append(result)
+        print(f"{workers:>7} {threads:>7} {result['texts_per_s']:>9.1f} {result['p50_ms']:>8.2f} {result['p99_ms']:>8.2f}")
+
+    budget = args.p99_ms or 3 * min(r['p99_ms'] for r in results)
+    within = [r for r in results if r['p99_ms'] <= budget] or results
+    best = max(within, key=lambda r: r['texts_per_s'])
+    print(f"\nRecommended (highest throughput with p99 <= {budget:.1f} ms): "
+          f"{best['workers']} workers x {best['threads']} threads, "
+          f"{best['texts_per_s']:.0f} texts/s, p99 {best['p99_ms']:.1f} ms")
+    print(f"  WEB_CONCURRENCY={best['workers']} DETECTION_TORCH_THREADS={best['threads']}"
+          + (" DETECTION_PIN_WORKERS=True" if args.pin else ""))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'cores': cores, 'checkpoint': checkpoint, 'batch_size': args.batch_size,
+                       'results': results, 'recommended': best}, f, indent=2)
+        print(f'Wrote {args.output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""Async variants of the detect and history views for ASGI deployments.
+
+DRF's function views are synchronous, so these are plain Django async views
+that mirror the request/response contract of `views.detect_hate_speech` and
+`views.get_history`. Database access uses the async ORM; preprocessing and
+inference run on the bounded model executor so the event loop stays free.
+"""
+
+import json
+import time
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from .executor import run_in_model_executor
+from .metrics import server_timing
+from .models import DetectionResult
+from .pipeline import detect_texts
+from .parsers import unpackb
+from .renderers import MSGPACK, json_response, msgpack, msgpack_response, prefers_msgpack
+from .shadow import observe as shadow_observe
+from .views import (DETECT_DEFAULT_FIELDS, _resolve_priority, _response_fields, detect_payload, history_item,
+                    history_queryset)
+from users.models import APIKey
+
+
+async def detect_hate_speech(request):
+    if request.method != 'POST':
+        return JsonResponse({"detail": f'Method "{request.method}" not allowed.'}, status=405)
+
+    api_key = request.headers.get('X-API-KEY')
+    if not api_key:
+        return JsonResponse({
+            "error": "API key required in 'X-API-KEY' header.",
+            "message": "To get an API key, register at our website and create one in your dashboard."
+        }, status=401)
+    try:
+        api_key_obj = await APIKey.objects.select_related('user').aget(key=api_key)
+    except APIKey.DoesNotExist:
+        return JsonResponse({
+            "error": "Invalid API key.",
+            "message": "Please check your API key or create a new one in your dashboard."
+        }, status=403)
+
+    if request.content_type == MSGPACK:
+        if msgpack is None:
+            return JsonResponse({"detail": f'Unsupported media type "{MSGPACK}" in request.'}, status=415)
+        try:
+            data = unpackb(request.body) if request.body else {}
+        except ValueError as exc:
+            return JsonResponse({"detail": str(exc)}, status=400)
+    else:
+        try:
+            data = json.loads(request.body or b"{}")
+        except ValueError:
+            return JsonResponse({"detail": "JSON parse error"}, status=400)
+    text = data.get("text", "") if isinstance(data, dict) else ""
+    if not text:
+        return JsonResponse({"error": "Text is required"}, status=400)
+    try:
+        fields = _response_fields(data, request.GET, DETECT_DEFAULT_FIELDS)
+    except ValueError as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+
+    start = time.perf_counter()
+    timings = {}
+    verdicts = await run_in_model_executor(detect_texts, [text], _resolve_priority(request, api_key_obj), timings,
+                                           "preprocessed" in fields)
+    if verdicts is None:
+        return JsonResponse({"error": "Model prediction failed"}, status=500)
+    verdict = verdicts[0]
+    latency_ms = (time.perf_counter() - start) * 1000.0
+
+    db_start = time.perf_counter()
+    result = await DetectionResult.objects.acreate(
+        user=api_key_obj.user,
+        text=text,
+        classification=verdict["classification"],
+        confidence=verdict["confidence"],
+        engine=verdict["engine"],
+        latency_ms=round(latency_ms, 2),
+        preprocessed_text=verdict["cleaned"],
+        model_version=verdict["model_version"],
+    )
+    timings["db"] = (time.perf_counter() - db_start) * 1000.0
+    shadow_observe(verdicts, timings)
+    payload = detect_payload(result, verdict, text, latency_ms, fields)
+    if prefers_msgpack(request.headers.get('Accept', '')):
+        response = msgpack_response(payload)
+    else:
+        response = json_response(payload)
+    response["Server-Timing"] = server_timing(timings)
+    return response
+
+
+# Authenticated by API key, not by session cookie
+detect_hate_speech.csrf_exempt = True
+
+
+async def get_history(request):
+    if request.method != 'GET':
+        return JsonResponse({"detail": f'Method "{request.method}" not allowed.'}, status=405)
+    try:
+        authenticated = await sync_to_async(JWTAuthentication().authenticate)(request)
+    except AuthenticationFailed as exc:
+        return JsonResponse({"detail": str(exc.detail)}, status=401)
+    if authenticated is None:
+        return JsonResponse({"detail": "Authentication credentials were not provided."}, status=401)
+    user = authenticated[0]
+
+    return json_response([history_item(item) async for item in history_queryset(user)])
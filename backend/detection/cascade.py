@@ -0,0 +1,116 @@
+"""Cheap lexicon stage in front of the transformer.
+
+With `DETECTION_CASCADE` on, `detect_texts` scores each cleaned text against
+the hate-word lexicon first and only sends the uncertain ones through spaCy
+and the transformer:
+
+    hits >= toxic_min_hits                     -> toxic  (engine "lexicon")
+    no hits and tokens <= safe_max_tokens      -> safe   (engine "lexicon")
+    anything else                              -> transformer
+
+The thresholds and the confidence reported for each rule (its precision on a
+labelled set) come from the JSON file written by `manage.py calibrate_cascade
+--write`. That file records the hash of the lexicon it was calibrated
+against; a missing or stale file leaves the cascade off.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import threading
+from typing import List, Optional, Sequence, Tuple
+
+from .model import _build_paths, _setting
+
+logger = logging.getLogger(__name__)
+
+ENGINE = "lexicon"
+# A threshold of 0 (toxic) or -1 (safe) turns that rule off
+TOXIC_OFF = 0
+SAFE_OFF = -1
+
+
+def load_lexicon(json_path: str) -> Tuple[frozenset, str]:
+    """The lowercased hate words and the sha256 of the file they came from."""
+    with open(json_path, "rb") as f:
+        raw = f.read()
+    words = json.loads(raw).get("hate_words", [])
+    return frozenset(word.lower() for word in words), hashlib.sha256(raw).hexdigest()
+
+
+def lexicon_features(hate_words: frozenset, cleaned: str) -> Tuple[int, int]:
+    """(lexicon hits, token count) for a `basic_clean`-ed text."""
+    tokens = cleaned.split()
+    return sum(1 for token in tokens if token in hate_words), len(tokens)
+
+
+class LexiconStage:
+    def __init__(self, hate_words: frozenset, toxic_min_hits: int = TOXIC_OFF, safe_max_tokens: int = SAFE_OFF,
+                 toxic_confidence: float = 1.0, safe_confidence: float = 1.0, version: str = ""):
+        self.hate_words = hate_words
+        self.toxic_min_hits = toxic_min_hits
+        self.safe_max_tokens = safe_max_tokens
+        self.toxic_confidence = toxic_confidence
+        self.safe_confidence = safe_confidence
+        self.version = version
+
+    def decide_features(self, hits: int, n_tokens: int) -> Optional[int]:
+        if self.toxic_min_hits != TOXIC_OFF and hits >= self.toxic_min_hits:
+            return 1
+        if hits == 0 and n_tokens <= self.safe_max_tokens:
+            return 0
+        return None
+
+    def decide(self, cleaned: str) -> Optional[Tuple[int, float]]:
+        """(label, confidence) when the lexicon is confident, else None (escalate)."""
+        label = self.decide_features(*lexicon_features(self.hate_words, cleaned))
+        if label is None:
+            return None
+        return label, self.toxic_confidence if label == 1 else self.safe_confidence
+
+    def decide_batch(self, cleaned: Sequence[str]) -> List[Optional[Tuple[int, float]]]:
+        decide = self.decide
+        return [decide(text) for text in cleaned]
+
+
+def load_cascade(config_path: str, json_path: str) -> Optional[LexiconStage]:
+    """The calibrated stage, or None when the config is missing or was calibrated on another lexicon."""
+    try:
+        with open(config_path, encoding="utf-8") as f:
+            config = json.load(f)
+    except (OSError, ValueError) as exc:
+        logger.warning("Cascade disabled: cannot read %s (%s); run manage.py calibrate_cascade --write",
+                       config_path, exc)
+        return None
+    hate_words, lexicon_sha = load_lexicon(json_path)
+    if config.get("lexicon_sha256") != lexicon_sha:
+        logger.warning("Cascade disabled: %s was calibrated against another lexicon; recalibrate", config_path)
+        return None
+    return LexiconStage(
+        hate_words,
+        toxic_min_hits=int(config["toxic_min_hits"]),
+        safe_max_tokens=int(config["safe_max_tokens"]),
+        toxic_confidence=float(config["toxic_confidence"]),
+        safe_confidence=float(config["safe_confidence"]),
+        version=f"{ENGINE}-{config['version']}",
+    )
+
+
+_CASCADE: Optional[LexiconStage] = None
+_CASCADE_LOADED = False
+_CASCADE_LOCK = threading.Lock()
+
+
+def get_cascade() -> Optional[LexiconStage]:
+    """The process-wide lexicon stage, or None when the cascade is off."""
+    global _CASCADE, _CASCADE_LOADED
+    if not _CASCADE_LOADED:
+        with _CASCADE_LOCK:
+            if not _CASCADE_LOADED:
+                json_path = _build_paths()["json_path"]
+                if _setting("DETECTION_CASCADE", False) and json_path:
+                    _CASCADE = load_cascade(_setting("DETECTION_CASCADE_CONFIG", ""), json_path)
+                _CASCADE_LOADED = True
+    return _CASCADE
@@ -0,0 +1,156 @@
+"""Streaming readers for text corpora (JSONL, CSV and Parquet).
+
+Corpora can be far larger than memory, so everything here yields one text at a
+time and never materialises the whole file.
+"""
+
+from __future__ import annotations
+
+import csv
+import json
+from itertools import islice
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+JSONL = "jsonl"
+CSV = "csv"
+PARQUET = "parquet"
+FORMATS = (JSONL, CSV, PARQUET)
+
+_SUFFIXES = {
+    ".jsonl": JSONL,
+    ".ndjson": JSONL,
+    ".json": JSONL,
+    ".csv": CSV,
+    ".parquet": PARQUET,
+    ".pq": PARQUET,
+}
+
+
+class CorpusError(ValueError):
+    """Raised when a corpus file cannot be read."""
+
+
+def detect_format(path: str, fmt: Optional[str] = None) -> str:
+    if fmt:
+        if fmt not in FORMATS:
+            raise CorpusError(f"Unsupported corpus format: {fmt!r}")
+        return fmt
+    suffix = Path(path).suffix.lower()
+    if suffix not in _SUFFIXES:
+        raise CorpusError(f"Cannot infer corpus format from {Path(path).name!r}; pass it explicitly")
+    return _SUFFIXES[suffix]
+
+
+def _iter_jsonl(path: str, text_field: str) -> Iterator[str]:
+    with open(path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as exc:
+                raise CorpusError(f"Line {line_no}: invalid JSON ({exc.msg})") from exc
+            if isinstance(record, str):
+                yield record
+            elif isinstance(record, dict) and isinstance(record.get(text_field), str):
+                yield record[text_field]
+            else:
+                raise CorpusError(f"Line {line_no}: expected a string or an object with a {text_field!r} string")
+
+
+def _iter_csv(path: str, text_field: str) -> Iterator[str]:
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        reader = csv.DictReader(f)
+        if reader.fieldnames is None or text_field not in reader.fieldnames:
+            raise CorpusError(f"CSV header has no {text_field!r} column")
+        for row in reader:
+            yield row[text_field] or ""
+
+
+def _open_parquet(path: str, text_field: str):
+    try:
+        import pyarrow.parquet as pq  # type: ignore
+    except ImportError as exc:  # pragma: no cover
+        raise CorpusError("Reading Parquet corpora requires pyarrow") from exc
+    parquet_file = pq.ParquetFile(path)
+    if text_field not in parquet_file.schema_arrow.names:
+        raise CorpusError(f"Parquet schema has no {text_field!r} column")
+    return parquet_file
+
+
+def _iter_parquet(path: str, text_field: str) -> Iterator[str]:
+    parquet_file = _open_parquet(path, text_field)
+    # Row-group batches keep memory bounded regardless of file size
+    for record_batch in parquet_file.iter_batches(columns=[text_field], batch_size=8192):
+        for text in record_batch.column(0).to_pylist():
+            yield text or ""
+
+
+def iter_texts(path: str, fmt: Optional[str] = None, text_field: str = "text") -> Iterator[str]:
+    """Yields the texts of a corpus file in file order."""
+    fmt = detect_format(path, fmt)
+    if fmt == JSONL:
+        return _iter_jsonl(path, text_field)
+    if fmt == PARQUET:
+        return _iter_parquet(path, text_field)
+    return _iter_csv(path, text_field)
+
+
+_TOXIC_LABELS = {"1", "true", "toxic", "hate", "yes"}
+_SAFE_LABELS = {"0", "false", "safe", "neutral", "no"}
+
+
+def parse_label(value) -> int:
+    """1 (toxic) or 0 (safe) from an int, bool or common label string."""
+    text = str(value).strip().lower()
+    if text in _TOXIC_LABELS:
+        return 1
+    if text in _SAFE_LABELS:
+        return 0
+    raise CorpusError(f"Unrecognised label {value!r}")
+
+
+def iter_labelled(path: str, fmt: Optional[str] = None, text_field: str = "text",
+                  label_field: str = "label") -> Iterator[Tuple[str, int]]:
+    """Yields (text, label) pairs of a labelled corpus file in file order."""
+    fmt = detect_format(path, fmt)
+    if fmt == JSONL:
+        with open(path, "r", encoding="utf-8") as f:
+            for line_no, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                    yield record[text_field] or "", parse_label(record[label_field])
+                except (json.JSONDecodeError, KeyError, TypeError) as exc:
+                    raise CorpusError(f"Line {line_no}: expected an object with {text_field!r} and {label_field!r}") from exc
+    elif fmt == CSV:
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            reader = csv.DictReader(f)
+            if reader.fieldnames is None or not {text_field, label_field} <= set(reader.fieldnames):
+                raise CorpusError(f"CSV header needs {text_field!r} and {label_field!r} columns")
+            for row in reader:
+                yield row[text_field] or "", parse_label(row[label_field])
+    else:
+        parquet_file = _open_parquet(path, text_field)
+        for record_batch in parquet_file.iter_batches(columns=[text_field, label_field], batch_size=8192):
+            for text, label in zip(record_batch.column(0).to_pylist(), record_batch.column(1).to_pylist()):
+                yield text or "", parse_label(label)
+
+
+def count_texts(path: str, fmt: Optional[str] = None, text_field: str = "text") -> int:
+    if detect_format(path, fmt) == PARQUET:
+        # Row count is in the footer metadata; no need to read the data
+        return _open_parquet(path, text_field).metadata.num_rows
+    return sum(1 for _ in iter_texts(path, fmt, text_field))
+
+
+def batched(iterable: Iterable, size: int) -> Iterator[List]:
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
@@ -0,0 +1,49 @@
+"""Bounded thread pool for blocking model work called from async views.
+
+Preprocessing and inference hold the GIL for long stretches or block on the
+scheduler, so async views must not run them on the event loop. Most of a
+request's time in this pool is spent waiting on a scheduler future, not
+computing (torch's own intra-op threads do the math), so the pool is sized for
+concurrent requests: with fewer threads than the interactive lane's
+max_batch_size, requests would reach the scheduler one at a time and never be
+batched together.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from .scheduler import DEFAULT_LANES, INTERACTIVE
+
+_EXECUTOR: Optional[ThreadPoolExecutor] = None
+_EXECUTOR_LOCK = threading.Lock()
+
+
+def executor_size() -> int:
+    """DETECTION_ASYNC_THREADS, or by default twice the interactive batch size
+    (one batch filling while the previous one runs)."""
+    from django.conf import settings
+
+    configured = getattr(settings, "DETECTION_ASYNC_THREADS", 0)
+    if configured:
+        return configured
+    lane = (getattr(settings, "DETECTION_SCHEDULER", {}) or {}).get(INTERACTIVE) or {}
+    return 2 * max(1, lane.get("max_batch_size", DEFAULT_LANES[INTERACTIVE].max_batch_size))
+
+
+def get_model_executor() -> ThreadPoolExecutor:
+    global _EXECUTOR
+    if _EXECUTOR is None:
+        with _EXECUTOR_LOCK:
+            if _EXECUTOR is None:
+                _EXECUTOR = ThreadPoolExecutor(max_workers=executor_size(), thread_name_prefix="model-executor")
+    return _EXECUTOR
+
+
+async def run_in_model_executor(func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_model_executor(), functools.partial(func, *args, **kwargs))
@@ -0,0 +1,193 @@
+"""Asynchronous detection jobs over large corpora.
+
+A job reads its input file in streaming batches, runs each batch through the
+bulk inference lane and writes the verdicts either as `DetectionResult` rows or
+as a JSONL results file. Progress is checkpointed after every batch so that an
+interrupted job resumes where it left off (see `run_detection_jobs`).
+
+Only the local database and filesystem are used: jobs run on an in-process
+thread pool, and `manage.py run_detection_jobs` can drain or resume them from
+a separate process.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from itertools import islice
+from pathlib import Path
+from typing import Iterator, Optional
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .corpus import batched, count_texts, iter_texts
+from .models import DetectionJob, DetectionResult
+from .pipeline import detect_texts
+from .scheduler import BULK
+
+logger = logging.getLogger(__name__)
+
+_RUNNER: Optional["JobRunner"] = None
+_RUNNER_LOCK = threading.Lock()
+
+
+def jobs_dir() -> Path:
+    path = Path(getattr(settings, "DETECTION_JOBS_DIR", Path(settings.BASE_DIR) / "var" / "jobs"))
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def claim_job(job_id, stale_after: Optional[float] = None) -> bool:
+    """Atomically moves a job to running; also reclaims stale running jobs."""
+    claimable = Q(status=DetectionJob.STATUS_QUEUED)
+    if stale_after is not None:
+        cutoff = timezone.now() - timedelta(seconds=stale_after)
+        claimable |= Q(status=DetectionJob.STATUS_RUNNING, updated_at__lt=cutoff)
+    now = timezone.now()
+    claimed = DetectionJob.objects.filter(claimable, pk=job_id).update(
+        status=DetectionJob.STATUS_RUNNING, updated_at=now,
+    )
+    if claimed:
+        DetectionJob.objects.filter(pk=job_id, started_at__isnull=True).update(started_at=now)
+    return bool(claimed)
+
+
+def _checkpoint(job: DetectionJob, **fields) -> None:
+    for name, value in fields.items():
+        setattr(job, name, value)
+    DetectionJob.objects.filter(pk=job.pk).update(updated_at=timezone.now(), **fields)
+
+
+def _process(job: DetectionJob) -> None:
+    batch_size = getattr(settings, "DETECTION_JOB_BATCH_SIZE", 256)
+    if job.total is None:
+        _checkpoint(job, total=count_texts(job.input_path, job.input_format, job.text_field))
+
+    texts = islice(iter_texts(job.input_path, job.input_format, job.text_field), job.processed, None)
+    results_file = None
+    if job.output == DetectionJob.OUTPUT_FILE:
+        results_file = open(job.results_path, "ab")
+        # Drop anything written after the last checkpoint
+        results_file.truncate(job.results_offset)
+        results_file.seek(job.results_offset)
+
+    try:
+        for batch in batched(texts, batch_size):
+            start = time.perf_counter()
+            verdicts = detect_texts(batch, BULK)
+            if verdicts is None:
+                raise RuntimeError("Model prediction failed")
+            latency_ms = round((time.perf_counter() - start) * 1000.0 / len(batch), 2)
+
+            if results_file is None:
+                with transaction.atomic():
+                    DetectionResult.objects.bulk_create([
+                        DetectionResult(
+                            user_id=job.user_id,
+                            job_id=job.pk,
+                            text=text,
+                            classification=verdict["classification"],
+                            confidence=verdict["confidence"],
+                            engine=verdict["engine"],
+                            latency_ms=latency_ms,
+                            preprocessed_text=verdict["cleaned"],
+                            model_version=verdict["model_version"],
+                        )
+                        for text, verdict in zip(batch, verdicts)
+                    ])
+                    _checkpoint(job, processed=job.processed + len(batch))
+            else:
+                lines = []
+                for index, (text, verdict) in enumerate(zip(batch, verdicts), start=job.processed):
+                    lines.append(json.dumps({
+                        "index": index,
+                        "text": text,
+                        "classification": verdict["classification"],
+                        "confidence": verdict["confidence"],
+                        "sentiment": verdict["sentiment"],
+                        "engine": verdict["engine"],
+                    }))
+                results_file.write(("\n".join(lines) + "\n").encode("utf-8"))
+                results_file.flush()
+                _checkpoint(job, processed=job.processed + len(batch), results_offset=results_file.tell())
+    finally:
+        if results_file is not None:
+            results_file.close()
+
+
+def run_job(job_id, stale_after: Optional[float] = None) -> bool:
+    """Claims and processes a job. Returns False if another worker owns it."""
+    close_old_connections()
+    try:
+        if not claim_job(job_id, stale_after):
+            return False
+        job = DetectionJob.objects.get(pk=job_id)
+        logger.info("Running detection job %s from offset %d", job.pk, job.processed)
+        try:
+            _process(job)
+        except Exception as exc:
+            logger.exception("Detection job %s failed: %s", job.pk, exc)
+            _checkpoint(job, status=DetectionJob.STATUS_FAILED, error=str(exc), finished_at=timezone.now())
+        else:
+            _checkpoint(job, status=DetectionJob.STATUS_COMPLETED, finished_at=timezone.now())
+        return True
+    finally:
+        close_old_connections()
+
+
+def iter_job_results(job: DetectionJob) -> Iterator[bytes]:
+    """Yields the job's results as NDJSON lines, in input order."""
+    if job.output == DetectionJob.OUTPUT_FILE:
+        if not job.results_path or not Path(job.results_path).exists():
+            return
+        remaining = job.results_offset
+        with open(job.results_path, "rb") as f:
+            # Only serve checkpointed bytes; a running job may be mid-write
+            while remaining > 0:
+                chunk = f.read(min(64 * 1024, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+        return
+
+    rows = (
+        DetectionResult.objects.filter(job=job)
+        .order_by("id")
+        .values_list("text", "classification", "confidence", "engine")
+        .iterator(chunk_size=2000)
+    )
+    for index, (text, classification, confidence, engine) in enumerate(rows):
+        yield (json.dumps({
+            "index": index,
+            "text": text,
+            "classification": classification,
+            "confidence": confidence,
+            "engine": engine,
+        }) + "\n").encode("utf-8")
+
+
+class JobRunner:
+    """Local worker pool that processes jobs in the background."""
+
+    def __init__(self, workers: int):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="detection-job")
+
+    def submit(self, job_id) -> None:
+        self._executor.submit(run_job, job_id)
+
+
+def get_job_runner() -> JobRunner:
+    global _RUNNER
+    if _RUNNER is None:
+        with _RUNNER_LOCK:
+            if _RUNNER is None:
+                _RUNNER = JobRunner(getattr(settings, "DETECTION_JOB_WORKERS", 2))
+    return _RUNNER
@@ -0,0 +1,51 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from detection.model import _build_paths
+
+
+class Command(BaseCommand):
+    help = (
+        "Build the pre-configured tokenizer/lexicon/lemma bundle that workers load instead "
+        "of parsing and configuring the source files (DETECTION_ARTIFACTS_PATH)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=None, help='Bundle path (default: DETECTION_ARTIFACTS_PATH).')
+        parser.add_argument('--no-lemmas', action='store_true', help='Skip the spaCy lemma table.')
+        parser.add_argument('--check', action='store_true',
+                            help='Verify the existing bundle and that it matches the source files; build nothing.')
+
+    def handle(self, *args, **options):
+        from Classifier.artifacts import ArtifactError, build_bundle, load_bundle, source_hashes
+        from Classifier.utilities import MODEL_CONFIG
+
+        output = options['output'] or getattr(settings, 'DETECTION_ARTIFACTS_PATH', '')
+        if not output:
+            raise CommandError('Pass --output or set DETECTION_ARTIFACTS_PATH')
+        paths = _build_paths()
+        if not paths.get('json_path'):
+            raise CommandError('No words.json/hate_words.json found under Classifier/')
+
+        if options['check']:
+            try:
+                bundle = load_bundle(output)
+            except ArtifactError as exc:
+                raise CommandError(str(exc))
+            if bundle.header['sources'] != source_hashes(paths['tokenizer_path'], paths['json_path']):
+                raise CommandError(f'{output} (version {bundle.version}) is stale; rebuild it')
+            self.stdout.write(self.style.SUCCESS(f'{output} is valid and current (version {bundle.version})'))
+            return
+
+        nlp = None
+        if not options['no_lemmas']:
+            from detection.preprocess import get_nlp
+
+            nlp = get_nlp()
+            if nlp is None or 'lemmatizer' not in nlp.pipe_names:
+                self.stdout.write(self.style.WARNING('No spaCy lemmatizer available; building without a lemma table'))
+                nlp = None
+
+        header = build_bundle(paths['tokenizer_path'], paths['json_path'], output, MODEL_CONFIG['MAX_LEN'], nlp)
+        sizes = ', '.join(f"{name} {entry['size'] / 1024:.0f} KB" for name, entry in header['blobs'].items())
+        self.stdout.write(self.style.SUCCESS(f"Wrote {output} (version {header['version']}): {sizes}"))
@@ -0,0 +1,163 @@
+import hashlib
+import json
+import os
+import time
+from datetime import datetime, timezone
+from itertools import islice
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from detection.cascade import SAFE_OFF, TOXIC_OFF, LexiconStage, lexicon_features, load_lexicon
+from detection.corpus import CorpusError, batched, iter_labelled
+
+TOXIC_GRID = (TOXIC_OFF, 1, 2, 3, 4, 5)
+SAFE_GRID = (SAFE_OFF, 0, 1, 2, 3, 5, 8, 12, 20)
+
+
+def _precision(correct, decided):
+    return correct / decided if decided else 1.0
+
+
+class Command(BaseCommand):
+    help = (
+        "Calibrate the lexicon stage of the cascade on a labelled corpus: for each threshold "
+        "pair, report the share of texts decided without the transformer, the precision of "
+        "each rule, overall accuracy and estimated throughput, and pick the fastest setting "
+        "within the accuracy budget. --write saves it for DETECTION_CASCADE."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', help='Labelled corpus (.jsonl, .csv or .parquet).')
+        parser.add_argument('--format', choices=['jsonl', 'csv', 'parquet'], help='Override format detection.')
+        parser.add_argument('--text-field', default='text')
+        parser.add_argument('--label-field', default='label', help='1/0, true/false or toxic/safe.')
+        parser.add_argument('--limit', type=int, default=0, help='Only use the first N rows.')
+        parser.add_argument('--batch-size', type=int, default=64, help='Texts per transformer batch.')
+        parser.add_argument('--max-accuracy-drop', type=float, default=0.005,
+                            help='Largest accuracy loss against the transformer alone to accept.')
+        parser.add_argument('--min-precision', type=float, default=0.95,
+                            help='Smallest precision to accept for each enabled rule.')
+        parser.add_argument('--write', action='store_true', help='Save the recommended setting.')
+        parser.add_argument('--output', default=getattr(settings, 'DETECTION_CASCADE_CONFIG', ''),
+                            help='Config file to write (default: DETECTION_CASCADE_CONFIG).')
+
+    def handle(self, *args, **options):
+        from detection.model import _build_paths, get_detector
+        from detection.preprocess import get_preprocessor
+
+        try:
+            rows = iter_labelled(options['input'], options['format'], options['text_field'], options['label_field'])
+            rows = list(islice(rows, options['limit'] or None))
+        except (CorpusError, OSError) as exc:
+            raise CommandError(str(exc))
+        if not rows:
+            raise CommandError('The corpus is empty')
+        json_path = _build_paths()['json_path']
+        if not json_path:
+            raise CommandError('No hate-word lexicon (Classifier/words.json) found')
+        detector = get_detector()
+        if detector is None:
+            raise CommandError('The detector failed to load (see the log)')
+
+        texts = [text for text, _ in rows]
+        labels = [label for _, label in rows]
+        preprocessor = get_preprocessor()
+        hate_words, lexicon_sha = load_lexicon(json_path)
+
+        start = time.perf_counter()
+        cleaned = preprocessor.basic_clean_batch(texts)
+        features = [lexicon_features(hate_words, c) for c in cleaned]
+        cheap_s = time.perf_counter() - start
+
+        # What escalating a text costs: lemmatisation plus the transformer
+        predictions = []
+        start = time.perf_counter()
+        for batch_texts, batch_cleaned in zip(batched(texts, options['batch_size']), batched(cleaned, options['batch_size'])):
+            preprocessor.preprocess_cleaned_batch(batch_texts, batch_cleaned)
+            predictions.extend(label for label, _, _, _ in detector.predict_batch(batch_cleaned))
+        escalate_s = (time.perf_counter() - start) / len(texts)
+
+        n = len(texts)
+        model_correct = [int(p == y) for p, y in zip(predictions, labels)]
+        baseline = sum(model_correct) / n
+        self.stdout.write(
+            f"{n} texts, {sum(labels)} toxic. Transformer alone: accuracy {baseline:.4f}, "
+            f"{1.0 / (cheap_s / n + escalate_s):.0f} texts/s"
+        )
+
+        results = []
+        for toxic_min_hits in TOXIC_GRID:
+            for safe_max_tokens in SAFE_GRID:
+                stage = LexiconStage(hate_words, toxic_min_hits, safe_max_tokens)
+                toxic = [0, 0]  # decided, correct
+                safe = [0, 0]
+                correct = 0
+                for (hits, n_tokens), label, right in zip(features, labels, model_correct):
+                    decision = stage.decide_features(hits, n_tokens)
+                    if decision is None:
+                        correct += right
+                        continue
+                    counts = toxic if decision == 1 else safe
+                    counts[0] += 1
+                    counts[1] += int(decision == label)
+                    correct += int(decision == label)
+                decided = toxic[0] + safe[0]
+                results.append({
+                    "toxic_min_hits": toxic_min_hits,
+                    "safe_max_tokens": safe_max_tokens,
+                    "fast_share": decided / n,
+                    "toxic_precision": _precision(toxic[1], toxic[0]),
+                    "safe_precision": _precision(safe[1], safe[0]),
+                    "accuracy": correct / n,
+                    "throughput": n / (cheap_s + (n - decided) * escalate_s),
+                })
+
+        acceptable = [
+            r for r in results
+            if r["accuracy"] >= baseline - options['max_accuracy_drop']
+            and r["toxic_precision"] >= options['min_precision']
+            and r["safe_precision"] >= options['min_precision']
+        ]
+        best = max(acceptable, key=lambda r: (r["fast_share"], r["accuracy"]))
+
+        self.stdout.write(f"\n{'toxic>=':>8} {'safe<=':>7} {'fast':>7} {'P(tox)':>7} {'P(safe)':>7} {'acc':>7} {'texts/s':>9}")
+        for r in sorted(results, key=lambda r: -r["throughput"]):
+            if r not in acceptable:
+                continue
+            self.stdout.write(
+                f"{r['toxic_min_hits'] or 'off':>8} {r['safe_max_tokens'] if r['safe_max_tokens'] != SAFE_OFF else 'off':>7} "
+                f"{r['fast_share']:>7.2%} {r['toxic_precision']:>7.4f} {r['safe_precision']:>7.4f} "
+                f"{r['accuracy']:>7.4f} {r['throughput']:>9.0f}" + ("  <- recommended" if r is best else "")
+            )
+        self.stdout.write(f"({len(results) - len(acceptable)} settings outside the accuracy/precision budget not shown)")
+
+        if not options['write']:
+            return
+        if not options['output']:
+            raise CommandError('No --output and DETECTION_CASCADE_CONFIG is not set')
+        config = {
+            "toxic_min_hits": best["toxic_min_hits"],
+            "safe_max_tokens": best["safe_max_tokens"],
+            "toxic_confidence": round(best["toxic_precision"], 4),
+            "safe_confidence": round(best["safe_precision"], 4),
+            "lexicon_sha256": lexicon_sha,
+        }
+        config["version"] = hashlib.sha256(json.dumps(config, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+        config.update({
+            "calibrated_at": datetime.now(timezone.utc).isoformat(),
+            "corpus": os.path.abspath(options['input']),
+            "samples": n,
+            "accuracy": round(best["accuracy"], 4),
+            "transformer_accuracy": round(baseline, 4),
+            "fast_share": round(best["fast_share"], 4),
+        })
+        output = Path(options['output'])
+        output.parent.mkdir(parents=True, exist_ok=True)
+        tmp = output.with_name(output.name + '.tmp')
+        tmp.write_text(json.dumps(config, indent=2))
+        os.replace(tmp, output)
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {output} (version {config['version']}); workers pick it up on restart"
+        ))
@@ -0,0 +1,96 @@
+import time
+from itertools import islice
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from detection.corpus import CorpusError, iter_labelled
+
+
+class Command(BaseCommand):
+    help = (
+        "Report early exit on a labelled corpus: for each margin threshold, the average number "
+        "of encoder layers executed, accuracy, agreement with the full model and throughput."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', help='Labelled corpus (.jsonl, .csv or .parquet).')
+        parser.add_argument('--format', choices=['jsonl', 'csv', 'parquet'], help='Override format detection.')
+        parser.add_argument('--text-field', default='text')
+        parser.add_argument('--label-field', default='label', help='1/0, true/false or toxic/safe.')
+        parser.add_argument('--limit', type=int, default=5000, help='Rows to use (0 = all).')
+        parser.add_argument('--batch-size', type=int, default=64)
+        parser.add_argument('--thresholds', default='0.5,0.7,0.8,0.9,0.95,0.99',
+                            help='Comma-separated hate-margin thresholds.')
+        parser.add_argument('--heads', default=getattr(settings, 'DETECTION_EXIT_HEADS_PATH', ''),
+                            help="Exit heads file; 'none' reuses the final classifier.")
+
+    def handle(self, *args, **options):
+        import torch
+
+        from Classifier.early_exit import ExitHeads, early_exit_forward, load_exit_heads
+        from detection.model import _build_paths, load_local_detector
+        from detection.preprocess import get_preprocessor
+
+        try:
+            rows = list(islice(iter_labelled(options['input'], options['format'], options['text_field'],
+                                             options['label_field']), options['limit'] or None))
+            thresholds = [float(t) for t in options['thresholds'].split(',') if t.strip()]
+        except (CorpusError, OSError, ValueError) as exc:
+            raise CommandError(str(exc))
+        if not rows:
+            raise CommandError('The corpus is empty')
+        detector = load_local_detector()
+        if detector is None:
+            raise CommandError('The detector failed to load (see the log)')
+        classifier = detector.classifier
+        model = classifier.model
+        num_layers = len(model['encoder'].layers)
+
+        heads_path = options['heads']
+        if heads_path and heads_path != 'none' and Path(heads_path).exists():
+            try:
+                heads = load_exit_heads(heads_path, model, _build_paths()['model_path'], classifier.device)
+            except ValueError as exc:
+                raise CommandError(str(exc))
+            source = heads_path
+        else:
+            heads = ExitHeads.from_classifier(model['classifier'], num_layers)
+            source = 'final classifier reused at every layer'
+        heads = heads.to(classifier.device).eval()
+
+        inputs = detector.preprocess_texts(get_preprocessor().basic_clean_batch([text for text, _ in rows]))
+        input_ids = torch.tensor([enc.ids for enc in classifier.tokenizer.encode_batch(inputs)])
+        labels = torch.tensor([label for _, label in rows])
+        batches = list(torch.split(input_ids.to(classifier.device), options['batch_size']))
+
+        def run(forward):
+            hate, layers = [], []
+            start = time.perf_counter()
+            with torch.no_grad():
+                for batch in batches:
+                    probs, exit_layer = forward(batch)
+                    hate.append((probs.argmax(dim=1) <= 1).long().cpu())
+                    layers.append(exit_layer.cpu())
+            return torch.cat(hate), torch.cat(layers).float(), time.perf_counter() - start
+
+        def full(batch):
+            encoded = model['encoder'](batch)
+            probs = torch.softmax(model['classifier'](encoded[:, 0]), dim=1)
+            return probs, torch.full((len(batch),), num_layers)
+
+        n = len(rows)
+        full_hate, _, full_s = run(full)
+        self.stdout.write(f"{n} texts, {num_layers} encoder layers, exit heads: {source}")
+        self.stdout.write(f"\n{'threshold':>9} {'layers':>7} {'accuracy':>9} {'agree':>7} {'texts/s':>9}")
+        self.stdout.write(
+            f"{'full':>9} {num_layers:>7.2f} {(full_hate == labels).float().mean().item():>9.4f} "
+            f"{1.0:>7.2%} {n / full_s:>9.0f}"
+        )
+        for threshold in thresholds:
+            hate, layers, seconds = run(lambda batch: early_exit_forward(model, heads, batch, threshold))
+            self.stdout.write(
+                f"{threshold:>9.2f} {layers.mean().item():>7.2f} {(hate == labels).float().mean().item():>9.4f} "
+                f"{(hate == full_hate).float().mean().item():>7.2%} {n / seconds:>9.0f}"
+            )
@@ -0,0 +1,42 @@
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from detection.model import _file_model_version, load_local_detector
+
+
+class Command(BaseCommand):
+    help = (
+        "Ask every running worker and model server to hot-reload the model files by touching "
+        "DETECTION_MODEL_RELOAD_FILE. By default the new files are test-loaded here first."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--skip-check', action='store_true',
+                            help='Do not test-load the detector before triggering the reload.')
+
+    def handle(self, *args, **options):
+        trigger = getattr(settings, 'DETECTION_MODEL_RELOAD_FILE', '')
+        if not trigger:
+            raise CommandError('DETECTION_MODEL_RELOAD_FILE is not set')
+        interval = getattr(settings, 'DETECTION_MODEL_WATCH_INTERVAL', 0)
+        if not interval or interval <= 0:
+            self.stdout.write(self.style.WARNING(
+                'DETECTION_MODEL_WATCH_INTERVAL is 0; workers are not watching for reloads'
+            ))
+
+        version = _file_model_version()
+        if not options['skip_check']:
+            started = time.perf_counter()
+            if load_local_detector() is None:
+                raise CommandError('The new model files do not load; not triggering a reload (see the log)')
+            self.stdout.write(f"Model version {version} loads cleanly ({time.perf_counter() - started:.1f}s)")
+
+        path = Path(trigger)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(f"{version} {time.time()}\n")
+        self.stdout.write(self.style.SUCCESS(
+            f"Triggered reload to {version}; workers pick it up within {2 * interval:.0f}s"
+        ))
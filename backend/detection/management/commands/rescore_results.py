@@ -0,0 +1,125 @@
+import json
+import os
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from detection.cascade import ENGINE as CASCADE_ENGINE
+from detection.model import get_model_version, predict_batch_with_version
+from detection.models import DetectionResult
+from detection.preprocess import get_preprocessor
+from detection.scheduler import BULK
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-score stored DetectionResult rows produced by an older model version "
+        "(lexicon-stage verdicts are left alone). "
+        "Walks the table in primary-key order in chunks, predicts each chunk in one "
+        "batch and writes it back with bulk_update. Resumable and throttled."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=512, help='Rows per batch/transaction.')
+        parser.add_argument('--max-rate', type=float, default=0.0,
+                            help='Upper bound on rows/sec (0 = unthrottled).')
+        parser.add_argument('--pause', type=float, default=0.0, help='Extra seconds to sleep between chunks.')
+        parser.add_argument('--nice', type=int, default=10,
+                            help='Lower this process\'s CPU priority so live traffic wins (0 to disable).')
+        parser.add_argument('--limit', type=int, default=0, help='Stop after this many rows (0 = all).')
+        parser.add_argument('--checkpoint', default=None,
+                            help='Resume file (default: <DETECTION_JOBS_DIR>/../rescore.ckpt).')
+        parser.add_argument('--restart', action='store_true', help='Ignore the checkpoint and start from the first row.')
+        parser.add_argument('--dry-run', action='store_true', help='Count stale (non-lexicon) rows and exit.')
+
+    def _checkpoint_path(self, option):
+        if option:
+            return Path(option)
+        base = Path(getattr(settings, 'DETECTION_JOBS_DIR', Path(settings.BASE_DIR) / 'var' / 'jobs')).parent
+        base.mkdir(parents=True, exist_ok=True)
+        return base / 'rescore.ckpt'
+
+    @staticmethod
+    def _save_checkpoint(path, state):
+        # Atomic, so a crash mid-write cannot leave a truncated file that breaks every resume
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(state))
+        os.replace(tmp, path)
+
+    def handle(self, *args, **options):
+        version = get_model_version()
+        # Lexicon verdicts do not come from the model (their model_version is
+        # the cascade's), so a new model version leaves them as they are
+        stale = DetectionResult.objects.exclude(model_version=version).exclude(engine=CASCADE_ENGINE)
+        if options['dry_run']:
+            self.stdout.write(f"{stale.count()} row(s) not on model version {version}")
+            return
+        if options['nice']:
+            os.nice(options['nice'])
+
+        checkpoint = self._checkpoint_path(options['checkpoint'])
+        last_id = 0
+        if checkpoint.exists() and not options['restart']:
+            state = json.loads(checkpoint.read_text())
+            # A checkpoint from an earlier rollout is meaningless for this one
+            if state.get('model_version') == version:
+                last_id = state['last_id']
+                self.stdout.write(f"Resuming after id {last_id}")
+
+        preprocessor = get_preprocessor()
+        chunk_size = options['chunk_size']
+        max_rate = options['max_rate']
+        done = changed = 0
+        started = time.perf_counter()
+
+        while not options['limit'] or done < options['limit']:
+            chunk_start = time.perf_counter()
+            rows = list(
+                stale.filter(pk__gt=last_id).order_by('pk').only('id', 'text', 'classification')[:chunk_size]
+            )
+            if not rows:
+                break
+
+            cleaned = [preprocessor.basic_clean(row.text) for row in rows]
+            outcomes, predicted_by = predict_batch_with_version(cleaned, BULK)
+            if outcomes is None:
+                raise CommandError(f"Model prediction failed; resume later from id {last_id}")
+            if predicted_by != version:
+                raise CommandError(
+                    f"Model changed from {version} to {predicted_by} during the backfill; "
+                    f"rerun to rescore against the new version"
+                )
+
+            for row, text, (hate_label, confidence, _, _) in zip(rows, cleaned, outcomes):
+                classification = "toxic" if hate_label == 1 else "safe"
+                changed += classification != row.classification
+                row.classification = classification
+                row.confidence = float(confidence)
+                row.engine = "transformer"
+                row.preprocessed_text = text
+                row.model_version = version
+
+            with transaction.atomic():
+                DetectionResult.objects.bulk_update(
+                    rows, ['classification', 'confidence', 'engine', 'preprocessed_text', 'model_version'],
+                )
+            last_id = rows[-1].pk
+            done += len(rows)
+            self._save_checkpoint(checkpoint, {'model_version': version, 'last_id': last_id})
+
+            elapsed = time.perf_counter() - chunk_start
+            delay = options['pause']
+            if max_rate > 0:
+                delay += max(0.0, len(rows) / max_rate - elapsed)
+            if delay:
+                time.sleep(delay)
+
+        total = time.perf_counter() - started
+        rate = done / total if total > 0 else 0.0
+        self.stdout.write(self.style.SUCCESS(
+            f"Re-scored {done} row(s) to model version {version} in {total:.1f}s ({rate:.1f} rows/sec); "
+            f"{changed} verdict(s) changed; last id {last_id}"
+        ))
@@ -0,0 +1,43 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from detection.jobs import run_job
+from detection.models import DetectionJob
+
+
+class Command(BaseCommand):
+    help = "Process queued detection jobs and resume interrupted ones from their checkpoint."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2, help='Jobs processed concurrently.')
+        parser.add_argument('--poll', type=float, default=5.0, help='Seconds between polls for new jobs.')
+        parser.add_argument('--stale-after', type=float, default=300.0,
+                            help='Reclaim running jobs with no checkpoint for this many seconds.')
+        parser.add_argument('--once', action='store_true', help='Drain pending jobs and exit.')
+
+    def _pending(self, stale_after):
+        cutoff = timezone.now() - timedelta(seconds=stale_after)
+        return list(
+            DetectionJob.objects.filter(
+                Q(status=DetectionJob.STATUS_QUEUED)
+                | Q(status=DetectionJob.STATUS_RUNNING, updated_at__lt=cutoff)
+            ).order_by('created_at').values_list('pk', flat=True)
+        )
+
+    def handle(self, *args, **options):
+        stale_after = options['stale_after']
+        with ThreadPoolExecutor(max_workers=options['workers'], thread_name_prefix='detection-job') as pool:
+            while True:
+                job_ids = self._pending(stale_after)
+                ran = sum(pool.map(lambda pk: run_job(pk, stale_after), job_ids))
+                if ran:
+                    self.stdout.write(f"Processed {ran} job(s)")
+                if options['once'] and not job_ids:
+                    return
+                if not job_ids:
+                    time.sleep(options['poll'])
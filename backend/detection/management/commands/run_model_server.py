@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from detection.model import _lane_configs
+from detection.model_server import serve
+
+
+class Command(BaseCommand):
+    help = (
+        "Run the local inference server that owns the detector. Web workers reach it "
+        "through DETECTION_MODEL_SERVER_SOCKET instead of loading the model themselves."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--socket', default=None,
+                            help='Unix socket path (default: DETECTION_MODEL_SERVER_SOCKET).')
+        parser.add_argument('--processes', type=int, default=1,
+                            help='Server processes, each with its own copy of the model.')
+
+    def handle(self, *args, **options):
+        socket_path = options['socket'] or getattr(settings, 'DETECTION_MODEL_SERVER_SOCKET', '')
+        if not socket_path:
+            raise CommandError('Pass --socket or set DETECTION_MODEL_SERVER_SOCKET')
+        self.stdout.write(f"Model server listening on {socket_path} with {options['processes']} process(es)")
+        try:
+            serve(socket_path, processes=max(1, options['processes']), lanes=_lane_configs())
+        except KeyboardInterrupt:
+            pass
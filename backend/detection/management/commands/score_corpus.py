@@ -0,0 +1,146 @@
+import json
+import multiprocessing
+import os
+import time
+from collections import deque
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from detection.corpus import CorpusError, batched, detect_format, iter_texts
+
+# Per-process state, set up once by _init_worker
+_WORKER = {}
+
+
+def _init_worker(workers, threads, spacy_batch_size):
+    # Before get_detector, so loading the model keeps these threads
+    try:
+        from detection.torch_threads import configure_torch_threads
+        configure_torch_threads(workers, threads)
+    except Exception:  # pragma: no cover
+        pass
+    from detection.model import get_detector
+    from detection.preprocess import get_preprocessor
+
+    _WORKER["preprocessor"] = get_preprocessor()
+    _WORKER["detector"] = get_detector()
+    _WORKER["spacy_batch_size"] = spacy_batch_size
+
+
+def _score_chunk(texts):
+    """Scores one chunk in a worker process. Returns (outcomes, stage timings)."""
+    detector = _WORKER["detector"]
+    if detector is None:
+        raise RuntimeError("HateSpeechDetector failed to load in worker process")
+    start = time.perf_counter()
+    cleaned = _WORKER["preprocessor"].basic_clean_batch(texts)
+    cleaned_at = time.perf_counter()
+    outcomes = detector.predict_batch(cleaned, batch_size=_WORKER["spacy_batch_size"])
+    done = time.perf_counter()
+    return outcomes, {"clean": cleaned_at - start, "model": done - cleaned_at}
+
+
+class Command(BaseCommand):
+    help = (
+        "Score a JSONL/CSV/Parquet corpus offline with a pool of worker processes. "
+        "Results are written as JSONL in input order; interrupted runs resume from "
+        "the checkpoint next to the output file."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', help='Corpus file (.jsonl, .csv or .parquet).')
+        parser.add_argument('output', help='Results file (JSONL).')
+        parser.add_argument('--format', choices=['jsonl', 'csv', 'parquet'], help='Override format detection.')
+        parser.add_argument('--text-field', default='text', help='Field/column holding the text.')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Worker processes.')
+        parser.add_argument('--threads-per-worker', type=int,
+                            help='Torch threads per worker (default: cores / workers).')
+        parser.add_argument('--batch-size', type=int, default=256, help='Texts per worker task.')
+        parser.add_argument('--spacy-batch-size', type=int, default=256, help='Texts per spaCy nlp.pipe batch.')
+        parser.add_argument('--include-text', action='store_true', help='Copy the input text into each result.')
+        parser.add_argument('--restart', action='store_true', help='Ignore any checkpoint and start over.')
+
+    def _write_checkpoint(self, path, offset, size):
+        tmp = path.with_suffix(path.suffix + '.tmp')
+        tmp.write_text(json.dumps({"offset": offset, "bytes": size}))
+        os.replace(tmp, path)
+
+    def handle(self, *args, **options):
+        input_path, output_path = options['input'], Path(options['output'])
+        checkpoint_path = output_path.with_name(output_path.name + '.ckpt')
+        workers = max(1, options['workers'])
+        threads = options['threads_per_worker'] or max(1, (os.cpu_count() or 1) // workers)
+        try:
+            fmt = detect_format(input_path, options['format'])
+        except CorpusError as exc:
+            raise CommandError(str(exc))
+
+        offset, size = 0, 0
+        if checkpoint_path.exists() and not options['restart']:
+            state = json.loads(checkpoint_path.read_text())
+            offset, size = state["offset"], state["bytes"]
+            self.stdout.write(f"Resuming at text {offset}")
+
+        texts = iter_texts(input_path, fmt, options['text_field'])
+        for _ in range(offset):
+            next(texts, None)
+
+        timings = {"read": 0.0, "clean": 0.0, "model": 0.0, "write": 0.0}
+        scored = 0
+        started = time.perf_counter()
+        # Bounded window of in-flight chunks keeps memory flat and output ordered
+        max_in_flight = workers * 2
+        pending = deque()
+        chunks = batched(texts, options['batch_size'])
+
+        with open(output_path, 'ab') as out, multiprocessing.Pool(workers, _init_worker, (workers, threads, options['spacy_batch_size'])) as pool:
+            out.truncate(size)
+
+            def drain_one():
+                nonlocal offset, scored
+                chunk, result = pending.popleft()
+                outcomes, stage = result.get()
+                timings["clean"] += stage["clean"]
+                timings["model"] += stage["model"]
+                write_start = time.perf_counter()
+                lines = []
+                for index, (text, (label, confidence, sentiment, _)) in enumerate(zip(chunk, outcomes), start=offset):
+                    record = {
+                        "index": index,
+                        "classification": "toxic" if label == 1 else "safe",
+                        "confidence": float(confidence),
+                        "sentiment": sentiment,
+                    }
+                    if options['include_text']:
+                        record["text"] = text
+                    lines.append(json.dumps(record))
+                out.write(("\n".join(lines) + "\n").encode('utf-8'))
+                out.flush()
+                offset += len(chunk)
+                scored += len(chunk)
+                self._write_checkpoint(checkpoint_path, offset, out.tell())
+                timings["write"] += time.perf_counter() - write_start
+
+            while True:
+                read_start = time.perf_counter()
+                chunk = next(chunks, None)
+                timings["read"] += time.perf_counter() - read_start
+                if chunk is None:
+                    break
+                pending.append((chunk, pool.apply_async(_score_chunk, (chunk,))))
+                if len(pending) >= max_in_flight:
+                    drain_one()
+            while pending:
+                drain_one()
+
+        checkpoint_path.unlink(missing_ok=True)
+        elapsed = time.perf_counter() - started
+        rate = scored / elapsed if elapsed > 0 else 0.0
+        self.stdout.write(self.style.SUCCESS(
+            f"Scored {scored} texts in {elapsed:.1f}s ({rate:.1f} texts/sec) with {workers} worker(s) "
+            f"x {threads} thread(s); {offset} total in {output_path}"
+        ))
+        # clean/model are summed across workers, so they can exceed wall time
+        for stage, seconds in timings.items():
+            self.stdout.write(f"  {stage:<6} {seconds:8.2f}s")
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from detection.shadow import shadow_summary
+
+
+class Command(BaseCommand):
+    help = (
+        "Summarise shadow evaluation (DETECTION_SHADOW_MODEL_PATH): verdict agreement, flips "
+        "and per-text latency of each candidate against the primary model it shadowed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=0, help='Only the last N hours (0 = all recorded).')
+
+    def handle(self, *args, **options):
+        summary = shadow_summary(options['hours'] or None)
+        if not summary:
+            self.stdout.write("No shadow samples recorded")
+            return
+        for row in summary:
+            self.stdout.write(f"candidate {row['candidate_version']} vs primary {row['primary_version']}")
+            self.stdout.write(f"  samples           {row['samples']}  (errors: {row['errors']})")
+            self.stdout.write(f"  agreement         {row['agreement_rate']:.2%}")
+            self.stdout.write(f"  safe -> toxic     {row['safe_to_toxic']}")
+            self.stdout.write(f"  toxic -> safe     {row['toxic_to_safe']}")
+            self.stdout.write(
+                f"  ms per text       primary {row['primary_ms_per_text']:.2f}, "
+                f"candidate {row['candidate_ms_per_text']:.2f} ({row['latency_delta_ms']:+.2f})"
+            )
+            self.stdout.write(f"  confidence delta  {row['mean_confidence_delta']:+.4f}")
@@ -0,0 +1,78 @@
+import os
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+DEFAULT_MODULES = ['detection.urls', 'detection.views', 'detection.jobs', 'detection.streaming']
+
+
+def _import_times(modules):
+    """Cumulative import time (ms) per top-level module, from a fresh `python -X importtime`."""
+    code = "import django; django.setup(); " + "; ".join(f"import {m}" for m in modules)
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=settings.BASE_DIR, capture_output=True, text=True,
+        env={**os.environ, 'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'hate_speech_api.settings')},
+    )
+    if result.returncode != 0:
+        raise CommandError(f"Importing {', '.join(modules)} failed:\n{result.stderr[-2000:]}")
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if not cumulative.strip().isdigit():
+            continue  # header line
+        # Only top-level packages (no nesting indent); cumulative covers submodules
+        if name.startswith(' ') and not name.startswith('  '):
+            package = name.strip().split('.')[0]
+            times[package] = times.get(package, 0.0) + int(cumulative) / 1000.0
+    return times
+
+
+def _wall_time(args):
+    start = time.perf_counter()
+    subprocess.run([sys.executable, 'manage.py', *args], cwd=settings.BASE_DIR, capture_output=True, check=False)
+    return time.perf_counter() - start
+
+
+class Command(BaseCommand):
+    help = (
+        "Report start-up costs: wall time of a model-free management command, import time "
+        "per top-level package for the web modules, and preprocessing/model load time."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--modules', default=','.join(DEFAULT_MODULES),
+                            help='Comma-separated modules to import for the import-time breakdown.')
+        parser.add_argument('--top', type=int, default=15, help='Packages to list.')
+        parser.add_argument('--skip-model', action='store_true', help='Do not load preprocessing resources or the model.')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"manage.py check: {_wall_time(['check']):.2f}s wall")
+
+        modules = [m.strip() for m in options['modules'].split(',') if m.strip()]
+        times = _import_times(modules)
+        self.stdout.write(f"\nImport time importing {', '.join(modules)} (cumulative, ms):")
+        for package, ms in sorted(times.items(), key=lambda item: -item[1])[:options['top']]:
+            self.stdout.write(f"  {package:<28} {ms:>9.1f}")
+        heavy = [name for name in ('torch', 'spacy', 'nltk', 'tokenizers', 'pyarrow') if name in times]
+        if heavy:
+            self.stdout.write(self.style.WARNING(f"Heavy packages imported eagerly: {', '.join(heavy)}"))
+
+        if options['skip_model']:
+            return
+        from detection.model import get_detector
+        from detection.preprocess import get_preprocessor
+
+        start = time.perf_counter()
+        get_preprocessor()
+        preprocess_s = time.perf_counter() - start
+        start = time.perf_counter()
+        detector = get_detector()
+        model_s = time.perf_counter() - start
+        self.stdout.write(f"\nPreprocessor (nltk, spaCy) load: {preprocess_s:.2f}s")
+        self.stdout.write(f"Detector load: {model_s:.2f}s" + ("" if detector is not None else " (failed; see log)"))
@@ -0,0 +1,70 @@
+from itertools import islice
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from detection.corpus import CorpusError, iter_texts
+
+
+class Command(BaseCommand):
+    help = (
+        "Fine-tune the early-exit heads (DETECTION_EARLY_EXIT_THRESHOLD) on an unlabelled corpus. "
+        "Each head learns to reproduce the final classifier from its layer's [CLS] state; the "
+        "encoder stays frozen, so this runs offline on CPU."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', help='Corpus file (.jsonl, .csv or .parquet).')
+        parser.add_argument('--format', choices=['jsonl', 'csv', 'parquet'], help='Override format detection.')
+        parser.add_argument('--text-field', default='text')
+        parser.add_argument('--limit', type=int, default=20000, help='Texts to train on (0 = all).')
+        parser.add_argument('--epochs', type=int, default=2)
+        parser.add_argument('--batch-size', type=int, default=32)
+        parser.add_argument('--lr', type=float, default=1e-3)
+        parser.add_argument('--threads', type=int, help='Torch intra-op threads.')
+        parser.add_argument('--output', default=getattr(settings, 'DETECTION_EXIT_HEADS_PATH', ''),
+                            help='Where to save the heads (default: DETECTION_EXIT_HEADS_PATH).')
+
+    def handle(self, *args, **options):
+        import torch
+
+        from Classifier.early_exit import ExitHeads, save_exit_heads, train_exit_heads
+        from detection.model import _build_paths, load_local_detector
+        from detection.preprocess import get_preprocessor
+
+        if not options['output']:
+            raise CommandError('No --output and DETECTION_EXIT_HEADS_PATH is not set')
+        if options['threads']:
+            torch.set_num_threads(options['threads'])
+        try:
+            texts = list(islice(iter_texts(options['input'], options['format'], options['text_field']),
+                                options['limit'] or None))
+        except (CorpusError, OSError) as exc:
+            raise CommandError(str(exc))
+        if not texts:
+            raise CommandError('The corpus is empty')
+        detector = load_local_detector()
+        if detector is None:
+            raise CommandError('The detector failed to load (see the log)')
+        classifier = detector.classifier
+
+        inputs = detector.preprocess_texts(get_preprocessor().basic_clean_batch(texts))
+        input_ids = torch.tensor([enc.ids for enc in classifier.tokenizer.encode_batch(inputs)])
+        batch_size = options['batch_size']
+
+        def batches():
+            order = torch.randperm(len(input_ids))
+            for start in range(0, len(order), batch_size):
+                yield input_ids[order[start:start + batch_size]].to(classifier.device)
+
+        model = classifier.model
+        heads = ExitHeads.from_classifier(model['classifier'], len(model['encoder'].layers)).to(classifier.device)
+        self.stdout.write(f"Training {len(heads.heads)} exit head(s) on {len(texts)} texts")
+        try:
+            train_exit_heads(model, heads, batches, options['epochs'], options['lr'], log=self.stdout.write)
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        save_exit_heads(heads, options['output'], _build_paths()['model_path'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Saved {options['output']}; check the trade-off with manage.py early_exit_report"
+        ))
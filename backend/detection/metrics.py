@@ -0,0 +1,69 @@
+"""Lightweight in-process metrics for the detection pipeline.
+
+Everything here is kept in memory per worker process and is cheap enough to
+update on every request. Percentiles are computed over a sliding window of the
+most recent observations, which is what we care about for p99 alerting.
+"""
+
+from __future__ import annotations
+
+import threading
+from collections import deque
+from typing import Deque
+
+
+def _percentile(sorted_values: list, q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(q * (len(sorted_values) - 1)))))
+    return float(sorted_values[index])
+
+
+class LatencyStats:
+    """Thread-safe sliding-window latency recorder (values in milliseconds)."""
+
+    def __init__(self, window: int = 2048):
+        self._values: Deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self._count = 0
+        self._total = 0.0
+
+    def observe(self, value_ms: float) -> None:
+        with self._lock:
+            self._values.append(value_ms)
+            self._count += 1
+            self._total += value_ms
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            values = sorted(self._values)
+            count, total = self._count, self._total
+        return {
+            "count": count,
+            "mean_ms": round(total / count, 3) if count else 0.0,
+            "p50_ms": round(_percentile(values, 0.50), 3),
+            "p95_ms": round(_percentile(values, 0.95), 3),
+            "p99_ms": round(_percentile(values, 0.99), 3),
+            "max_ms": round(values[-1], 3) if values else 0.0,
+        }
+
+
+class Counter:
+    """Thread-safe monotonically increasing counter."""
+
+    def __init__(self):
+        self._value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: int = 1) -> None:
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self) -> int:
+        return self._value
+
+
+def server_timing(timings: dict) -> str:
+    """Formats stage timings (ms) as a `Server-Timing` header value."""
+    return ", ".join(f"{stage};dur={ms:.2f}" for stage, ms in timings.items())
@@ -0,0 +1,90 @@
+"""Response compression for large JSON API responses.
+
+Batch and history responses grow with the number of texts and compress
+several times over. `CompressionMiddleware` picks brotli or gzip from the
+request's Accept-Encoding (q-values honoured; brotli preferred if the
+`brotli` package is installed). It only compresses:
+
+    - complete (non-streaming) 200 responses, so the NDJSON stream and job
+      downloads keep flushing line by line
+    - JSON/MessagePack responses of at least DETECTION_COMPRESS_MIN_BYTES;
+      smaller ones gain little and cost CPU on every call
+
+Unlike Django's GZipMiddleware it leaves HTML pages alone, so it does not
+need BREACH padding for pages that carry CSRF tokens.
+"""
+
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.text import compress_string
+
+from .model import _setting
+
+try:
+    import brotli  # type: ignore
+except ImportError:  # pragma: no cover
+    brotli = None
+
+COMPRESSIBLE_TYPES = ("application/json", "application/msgpack")
+# Fast setting for dynamic content; higher levels cost far more CPU for a few % less
+BROTLI_QUALITY = 4
+
+
+def accepted_encodings(header: str) -> dict:
+    """{coding: q} from an Accept-Encoding header."""
+    accepted = {}
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[coding] = q
+    return accepted
+
+
+def choose_encoding(header: str):
+    """'br', 'gzip' or None for an Accept-Encoding header."""
+    accepted = accepted_encodings(header)
+    wildcard = accepted.get("*", 0.0)
+    options = [("br", accepted.get("br", wildcard))] if brotli is not None else []
+    options.append(("gzip", accepted.get("gzip", wildcard)))
+    # Ties go to the first option (brotli)
+    coding, q = max(options, key=lambda option: option[1])
+    return coding if q > 0 else None
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    def process_response(self, request, response):
+        if response.streaming or response.status_code != 200 or response.has_header("Content-Encoding"):
+            return response
+        if not response.get("Content-Type", "").startswith(COMPRESSIBLE_TYPES):
+            return response
+        # Whether or not this one is compressed, the response depends on the header
+        patch_vary_headers(response, ("Accept-Encoding",))
+        if len(response.content) < _setting("DETECTION_COMPRESS_MIN_BYTES", 1024):
+            return response
+        coding = choose_encoding(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+        if coding is None:
+            return response
+
+        if coding == "br":
+            compressed = brotli.compress(response.content, mode=brotli.MODE_TEXT, quality=BROTLI_QUALITY)
+        else:
+            compressed = compress_string(response.content)
+        if len(compressed) >= len(response.content):
+            return response
+        response.content = compressed
+        response.headers["Content-Length"] = str(len(compressed))
+        response.headers["Content-Encoding"] = coding
+        # The bytes changed, so a strong ETag no longer holds
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response.headers["ETag"] = "W/" + etag
+        return response
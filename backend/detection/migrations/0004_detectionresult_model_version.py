@@ -0,0 +1,18 @@
+# Generated by Django 4.2.16 on 2026-10-19 11:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('detection', '0003_detectionjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='detectionresult',
+            name='model_version',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=64),
+        ),
+    ]
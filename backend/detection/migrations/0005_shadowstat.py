@@ -0,0 +1,34 @@
+# Generated by Django 4.2.16 on 2026-10-19 13:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('detection', '0004_detectionresult_model_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShadowStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('candidate_version', models.CharField(max_length=64)),
+                ('primary_version', models.CharField(max_length=64)),
+                ('bucket', models.DateTimeField()),
+                ('samples', models.PositiveIntegerField(default=0)),
+                ('agreements', models.PositiveIntegerField(default=0)),
+                ('safe_to_toxic', models.PositiveIntegerField(default=0)),
+                ('toxic_to_safe', models.PositiveIntegerField(default=0)),
+                ('primary_latency_ms', models.FloatField(default=0.0)),
+                ('candidate_latency_ms', models.FloatField(default=0.0)),
+                ('confidence_delta', models.FloatField(default=0.0)),
+                ('errors', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['-bucket'],
+                'unique_together': {('candidate_version', 'primary_version', 'bucket')},
+            },
+        ),
+    ]
@@ -8,14 +8,37 @@ gracefully.
 
 from __future__ import annotations
 
+import atexit
+import hashlib
 import logging
 from pathlib import Path
-from typing import Optional, Tuple
-import contextlib
+from typing import Callable, List, Optional, Sequence, Tuple
+import threading
+import time
+
+from .metrics import Counter
+from .scheduler import BULK, INTERACTIVE, LANES, InferenceScheduler, LaneConfig, SchedulerClosed
 
 logger = logging.getLogger(__name__)
 
-_DETECTOR = None  # type: ignore[var-annotated]
+# (hate_label, confidence, sentiment, per-class probabilities or None)
+Outcome = Tuple[int, float, str, Optional[List[float]]]
+
+_MODEL_VERSION: Optional[str] = None
+_LEMMA_CACHE_SAVE_REGISTERED = False
+_CLIENT_CLOSE_REGISTERED = False
+
+
+def _setting(name: str, default):
+    """Reads a Django setting, or returns `default` outside a configured project."""
+    try:
+        from django.conf import settings
+
+        if not settings.configured:
+            return default
+        return getattr(settings, name, default)
+    except Exception:  # pragma: no cover
+        return default
 
 
 def _build_paths() -> dict:
@@ -25,80 +48,483 @@ def _build_paths() -> dict:
     words_json = classifier_dir / "words.json"
     hate_words_json = classifier_dir / "hate_words.json"
     json_path = words_json if words_json.exists() else hate_words_json
+    model_path = classifier_dir / "transformer_classifier_checkpoint_best_best.pth"
+    override = _setting("DETECTION_MODEL_PATH", "")
+    early_exit_threshold = _setting("DETECTION_EARLY_EXIT_THRESHOLD", 0.0)
     return {
         "json_path": str(json_path) if json_path.exists() else None,
-        "model_path": str(classifier_dir / "transformer_classifier_checkpoint_best_best.pth"),
+        "model_path": str(override or model_path),
         "tokenizer_path": str(classifier_dir / "tokenizer.json"),
+        "early_exit_threshold": early_exit_threshold,
+        "exit_heads_path": _setting("DETECTION_EXIT_HEADS_PATH", "") if early_exit_threshold else None,
+        "padding": _setting("DETECTION_PADDING", "fixed"),
+        "precision": _setting("DETECTION_PRECISION", "fp32"),
     }
 
 
-def _try_load_detector():
-    global _DETECTOR
-    if _DETECTOR is not None:
-        return _DETECTOR
+def load_artifacts():
+    """The pre-built tokenizer/lexicon bundle, or None to load from the source files.
+
+    A bundle that fails its hash check is logged and ignored.
+    """
+    path = _setting("DETECTION_ARTIFACTS_PATH", "")
+    if not path or not Path(path).exists():
+        return None
     try:
-        # Import the user's detector
-        # Patch spaCy load to gracefully fall back if the small model isn't installed
-        try:
-            import spacy as _spacy  # type: ignore
-        except Exception:  # pragma: no cover
-            _spacy = None  # type: ignore
-
-        @contextlib.contextmanager
-        def _patched_spacy_load():
-            if _spacy is None:
-                yield
-                return
-            original_load = getattr(_spacy, 'load', None)
-            if original_load is None:
-                yield
-                return
-            def safe_load(name, *args, **kwargs):
-                try:
-                    return original_load(name, *args, **kwargs)
-                except Exception:
-                    # Fallback to a blank English pipeline so detector can still run
-                    return _spacy.blank('en')
-            _spacy.load = safe_load  # type: ignore[attr-defined]
-            try:
-                yield
-            finally:
-                _spacy.load = original_load  # type: ignore[attr-defined]
+        from Classifier.artifacts import load_bundle, source_hashes  # type: ignore
+
+        start = time.perf_counter()
+        bundle = load_bundle(path)
+        paths = _build_paths()
+        if paths.get("json_path") and bundle.header["sources"] != source_hashes(paths["tokenizer_path"], paths["json_path"]):
+            logger.warning("Ignoring stale artifact bundle %s; rebuild it with manage.py build_artifacts", path)
+            return None
+        logger.info("Loaded artifact bundle %s (version %s) in %.1fms",
+                    path, bundle.version, (time.perf_counter() - start) * 1000.0)
+        return bundle
+    except Exception as exc:
+        logger.error("Ignoring artifact bundle %s: %s", path, exc)
+        return None
 
-        with _patched_spacy_load():
-            from Classifier.preprocessor import HateSpeechDetector  # type: ignore
 
+def load_local_detector(model_path: Optional[str] = None):
+    """Builds a new in-process HateSpeechDetector, or returns None on failure.
+
+    `model_path` loads a different checkpoint (e.g. a shadow candidate) with
+    the same tokenizer and lexicon.
+    """
+    try:
+        start = time.perf_counter()
+        # Share the preprocessor's spaCy pipeline (same model, same disabled
+        # components; it already falls back to a blank pipeline if the model
+        # is missing) instead of loading a second copy
+        from .preprocess import get_nlp
+
+        nlp = get_nlp()
+        bundle = load_artifacts()
         paths = _build_paths()
+        if model_path:
+            paths["model_path"] = model_path
         kwargs = {
             # Only pass json_path if available; the user's class may not accept None
             k: v for k, v in {
                 "json_path": paths.get("json_path"),
                 "model_path": paths["model_path"],
                 "tokenizer_path": paths["tokenizer_path"],
+                "nlp": nlp,
+                "bundle": bundle,
             }.items() if v is not None
         }
-        _DETECTOR = HateSpeechDetector(**kwargs)
-        logger.info("HateSpeechDetector loaded successfully")
+        from Classifier.preprocessor import HateSpeechDetector  # type: ignore
+        from .torch_threads import configure_torch_threads
+
+        configure_torch_threads()
+        detector = HateSpeechDetector(**kwargs)
+        if paths["padding"] != "fixed":
+            detector.classifier.set_padding(paths["padding"])
+        _configure_precision(detector.classifier, paths)
+        _configure_early_exit(detector.classifier, paths)
+        detector.lemma_cache = get_lemma_cache(detector.nlp)
+        if bundle is not None and bundle.lemmas and detector.lemma_cache is not None \
+                and bundle.header.get("lemma_model") == detector.lemma_cache.key:
+            detector.lemma_cache.warm(bundle.lemmas)
+        logger.info("HateSpeechDetector loaded in %.2fs", time.perf_counter() - start)
+        return detector
     except Exception as exc:  # pragma: no cover
-        _DETECTOR = None
         logger.exception("Failed to load HateSpeechDetector: %s", exc)
-    return _DETECTOR
+        return None
 
 
-def get_detector():
-    return _try_load_detector()
+def _configure_precision(classifier, paths: dict) -> None:
+    """Switches to bf16 when DETECTION_PRECISION asks for it and the self-check passes."""
+    mode = paths.get("precision", "fp32")
+    if mode == "fp32":
+        return
+    from Classifier.precision import apply_precision  # type: ignore
+
+    report = apply_precision(classifier, mode, _setting("DETECTION_PRECISION_TOLERANCE", 0.1))
+    if report["mode"] == mode:
+        logger.info("Inference in %s (max logit drift %.4f on the probe set)", mode, report["max_logit_drift"])
+    else:
+        logger.warning("Keeping fp32 instead of %s: %s", mode, report["reason"])
 
 
-def predict_with_model(text: str) -> Optional[Tuple[int, float, str]]:
-    """Returns (hate_label, confidence, sentiment) or None if unavailable."""
-    detector = get_detector()
-    if detector is None:
+def _configure_early_exit(classifier, paths: dict) -> None:
+    """Turns on early exit when DETECTION_EARLY_EXIT_THRESHOLD is set.
+
+    Trained exit heads are used if present and trained for this checkpoint;
+    without a heads file the final classifier is reused at every layer.
+    """
+    threshold = paths.get("early_exit_threshold")
+    if not threshold:
+        return
+    if paths.get("padding", "fixed") != "fixed":
+        logger.warning("Early exit disabled: it needs DETECTION_PADDING=fixed")
+        return
+    heads = None
+    heads_path = paths.get("exit_heads_path")
+    if heads_path and Path(heads_path).exists():
+        try:
+            from Classifier.early_exit import load_exit_heads  # type: ignore
+
+            heads = load_exit_heads(heads_path, classifier.model, paths["model_path"], classifier.device)
+        except Exception as exc:
+            logger.warning("Early exit disabled: %s", exc)
+            return
+    classifier.enable_early_exit(threshold, heads)
+    logger.info("Early exit at margin %.2f with %s", threshold, heads_path if heads is not None else "the final classifier")
+
+
+def get_lemma_cache(nlp):
+    """The process-wide lemma cache for `nlp`, or None unless DETECTION_LEMMA_CACHE is on."""
+    if not _setting("DETECTION_LEMMA_CACHE", False):
         return None
     try:
-        # The user's detector returns (hate_label, confidence, sentiment)
-        return detector.predict(text)
+        from Classifier.lemma_cache import get_shared_cache, save_shared_caches  # type: ignore
     except Exception as exc:  # pragma: no cover
-        logger.exception("Model prediction failed: %s", exc)
+        logger.warning("Lemma cache unavailable: %s", exc)
         return None
+    directory = _setting("DETECTION_LEMMA_CACHE_DIR", "")
+    cache = get_shared_cache(nlp, _setting("DETECTION_LEMMA_CACHE_SIZE", 50000), directory or None)
+    global _LEMMA_CACHE_SAVE_REGISTERED
+    if directory and not _LEMMA_CACHE_SAVE_REGISTERED:
+        # Persist for the next process's warm start
+        atexit.register(save_shared_caches, directory)
+        _LEMMA_CACHE_SAVE_REGISTERED = True
+    return cache
+
+
+def lemma_cache_stats() -> dict:
+    try:
+        from Classifier.lemma_cache import shared_cache_stats  # type: ignore
+    except Exception:  # pragma: no cover
+        return {}
+    return shared_cache_stats()
+
+
+def compute_model_version(paths: dict) -> str:
+    """Short content hash of everything that determines a verdict."""
+    digest = hashlib.sha256()
+    for key in ("model_path", "tokenizer_path", "json_path", "exit_heads_path"):
+        path = paths.get(key)
+        if not path or not Path(path).exists():
+            continue
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+    if paths.get("early_exit_threshold"):
+        digest.update(f"early-exit:{paths['early_exit_threshold']}".encode("utf-8"))
+    if paths.get("padding", "fixed") != "fixed":
+        digest.update(f"padding:{paths['padding']}".encode("utf-8"))
+    if paths.get("precision", "fp32") != "fp32":
+        digest.update(f"precision:{paths['precision']}".encode("utf-8"))
+    return digest.hexdigest()[:12]
+
+
+def _file_model_version() -> str:
+    """`DETECTION_MODEL_VERSION`, or the content hash of the current model files."""
+    return _setting("DETECTION_MODEL_VERSION", "") or compute_model_version(_build_paths())
+
+
+def get_model_version() -> str:
+    """Version stamp stored with every DetectionResult.
+
+    This is the version of the active model once one is loaded.
+    `DETECTION_MODEL_VERSION` overrides the hash, e.g. for human-readable
+    release names.
+    """
+    global _MODEL_VERSION
+    entry = _REGISTRY.loaded()
+    if entry is not None:
+        return entry.version
+    if _MODEL_VERSION is None:
+        _MODEL_VERSION = _file_model_version()
+    return _MODEL_VERSION
+
+
+def _new_detector():
+    socket_path = _setting("DETECTION_MODEL_SERVER_SOCKET", "")
+    if socket_path:
+        # The model lives in `manage.py run_model_server`; this process only
+        # holds a small client
+        from .model_server import ModelServerClient
+
+        global _CLIENT_CLOSE_REGISTERED
+        if not _CLIENT_CLOSE_REGISTERED:
+            # Replaced clients are closed when their ModelEntry retires
+            atexit.register(_close_active_client)
+            _CLIENT_CLOSE_REGISTERED = True
+        return ModelServerClient(socket_path)
+    return load_local_detector()
+
+
+def _close_active_client() -> None:
+    entry = _REGISTRY.loaded()
+    if entry is not None and hasattr(entry.detector, "close"):
+        entry.detector.close()
+
+
+def _lane_configs() -> dict:
+    from django.conf import settings
+
+    configured = getattr(settings, "DETECTION_SCHEDULER", {}) or {}
+    return {
+        lane: LaneConfig(**{**configured[lane], "buckets": tuple(configured[lane].get("buckets") or ())})
+        for lane in LANES if lane in configured
+    }
+
+
+class ModelEntry:
+    """One loaded model version: the detector and the scheduler that feeds it."""
+
+    def __init__(self, detector, version: str, lanes=None):
+        self.detector = detector
+        self.version = version
+        self.loaded_at = time.time()
+        self.scheduler = InferenceScheduler(self.predict_batch, lanes)
+
+    def predict_batch(self, texts: List[str], lane: str = INTERACTIVE) -> list:
+        detector = self.detector
+        if getattr(detector, "accepts_lane", False):
+            return detector.predict_batch(texts, lane)
+        if hasattr(detector, "predict_batch"):
+            return detector.predict_batch(texts)
+        return [detector.predict(text) for text in texts]
+
+    def warm_up(self, batch_sizes: Sequence[int]) -> None:
+        for size in batch_sizes:
+            self.predict_batch([WARMUP_TEXT] * size, BULK)
 
+    def close(self) -> None:
+        # Finishes whatever is still queued on this version first
+        self.scheduler.shutdown()
+        if hasattr(self.detector, "close"):
+            self.detector.close()
 
+
+WARMUP_TEXT = "warm up the model before it takes traffic"
+
+
+class ModelRegistry:
+    """Holds the active model version and swaps in new ones without dropping requests.
+
+    `reload` loads and warms the new version while the old one keeps serving,
+    then swaps the reference atomically. Requests already submitted to the old
+    version finish on it: its scheduler is shut down (which drains its queue)
+    only after a grace period, and a submit that races with that shutdown is
+    retried on the new version.
+    """
+
+    def __init__(self, load_detector: Callable, lanes_factory: Callable[[], dict] = dict,
+                 version_factory: Callable[[], str] = _file_model_version):
+        self._load_detector = load_detector
+        self._lanes_factory = lanes_factory
+        self._version_factory = version_factory
+        self._active: Optional[ModelEntry] = None
+        self._lock = threading.Lock()
+        self._watcher: Optional[threading.Thread] = None
+        self.reloads = Counter()
+        self.failed_reloads = Counter()
+
+    def loaded(self) -> Optional[ModelEntry]:
+        """The active entry, without loading one."""
+        return self._active
+
+    def active(self) -> Optional[ModelEntry]:
+        entry = self._active
+        if entry is None:
+            with self._lock:
+                if self._active is None:
+                    self._active = self._load_entry()
+                    if self._active is not None:
+                        self._start_watcher()
+                entry = self._active
+        return entry
+
+    def _load_entry(self) -> Optional[ModelEntry]:
+        version = self._version_factory()
+        detector = self._load_detector()
+        if detector is None:
+            return None
+        return ModelEntry(detector, version, self._lanes_factory())
+
+    def reload(self) -> bool:
+        """Loads, warms and activates the current model files; False if loading failed."""
+        with self._lock:
+            started = time.perf_counter()
+            entry = None
+            try:
+                entry = self._load_entry()
+                if entry is None:
+                    raise RuntimeError("detector failed to load")
+                lanes = self._lanes_factory()
+                entry.warm_up(sorted({1, *(config.max_batch_size for config in lanes.values())}))
+            except Exception as exc:
+                # A loaded but unwarmed entry already owns a dispatcher thread and a detector
+                if entry is not None:
+                    entry.close()
+                self.failed_reloads.inc()
+                logger.error("Model reload failed; keeping version %s: %s",
+                             self._active.version if self._active else None, exc)
+                return False
+            old, self._active = self._active, entry
+            self.reloads.inc()
+            self._start_watcher()
+        logger.info("Activated model version %s (was %s) in %.2fs",
+                    entry.version, old.version if old else None, time.perf_counter() - started)
+        if old is not None:
+            threading.Thread(target=self._retire, args=(old,), name="model-retire", daemon=True).start()
+        return True
+
+    @staticmethod
+    def _retire(entry: ModelEntry) -> None:
+        # Requests that picked up the old entry just before the swap may still
+        # be about to submit to it
+        time.sleep(_setting("DETECTION_MODEL_DRAIN_GRACE_S", 2.0))
+        entry.close()
+        logger.info("Retired model version %s", entry.version)
+
+    def predict(self, texts: Sequence[str], lane: str, timeout: Optional[float] = None):
+        """Returns (outcomes, version), or (None, '') if no model is available."""
+        for _ in range(3):
+            entry = self.active()
+            if entry is None:
+                return None, ""
+            try:
+                futures = entry.scheduler.submit(list(texts), lane)
+            except SchedulerClosed:
+                continue  # swapped under us; the new version is active now
+            return [future.result(timeout) for future in futures], entry.version
+        raise RuntimeError("No open model version to submit to")
+
+    def submit(self, texts: Sequence[str], lane: str):
+        """Like `predict` without waiting: returns (futures, version) or (None, '')."""
+        for _ in range(3):
+            entry = self.active()
+            if entry is None:
+                return None, ""
+            try:
+                return entry.scheduler.submit(list(texts), lane), entry.version
+            except SchedulerClosed:
+                continue
+        raise RuntimeError("No open model version to submit to")
+
+    def _start_watcher(self) -> None:
+        interval = _setting("DETECTION_MODEL_WATCH_INTERVAL", 0)
+        if self._watcher is None and interval and interval > 0:
+            self._watcher = _ModelWatcher(self, float(interval))
+            self._watcher.start()
+
+    def stats(self) -> dict:
+        entry = self._active
+        return {
+            "version": entry.version if entry else None,
+            "loaded_at": entry.loaded_at if entry else None,
+            "reloads": self.reloads.value,
+            "failed_reloads": self.failed_reloads.value,
+            "padding": _padding_stats(entry.detector) if entry else None,
+            "precision": _precision_report(entry.detector) if entry else None,
+        }
+
+
+def _padding_stats(detector) -> Optional[dict]:
+    # Only in-process detectors expose their classifier
+    classifier = getattr(detector, "classifier", None)
+    return classifier.padding_stats() if hasattr(classifier, "padding_stats") else None
+
+
+def _precision_report(detector) -> Optional[dict]:
+    return getattr(getattr(detector, "classifier", None), "precision_report", None)
+
+
+def _watched_paths() -> List[str]:
+    paths = _build_paths()
+    return [
+        path for path in (
+            paths.get("model_path"), paths.get("tokenizer_path"), paths.get("json_path"), paths.get("exit_heads_path"),
+            _setting("DETECTION_ARTIFACTS_PATH", ""), _setting("DETECTION_MODEL_RELOAD_FILE", ""),
+        ) if path
+    ]
+
+
+class _ModelWatcher(threading.Thread):
+    """Reloads the registry when the model files or the reload trigger file change.
+
+    A change is acted on once the files have stopped changing for one
+    interval, so a checkpoint that is still being copied is not loaded.
+    """
+
+    def __init__(self, registry: ModelRegistry, interval: float):
+        super().__init__(name="model-watcher", daemon=True)
+        self.registry = registry
+        self.interval = interval
+
+    @staticmethod
+    def _signature() -> tuple:
+        signature = []
+        for path in _watched_paths():
+            try:
+                stat = Path(path).stat()
+                signature.append((path, stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                signature.append((path, None, None))
+        return tuple(signature)
+
+    def run(self) -> None:
+        last, pending = self._signature(), None
+        while True:
+            time.sleep(self.interval)
+            signature = self._signature()
+            if signature == last:
+                pending = None
+                continue
+            if signature != pending:
+                pending = signature  # still changing; look again next interval
+                continue
+            last, pending = signature, None
+            logger.info("Model files changed; reloading")
+            self.registry.reload()
+
+
+_REGISTRY = ModelRegistry(_new_detector, _lane_configs)
+
+
+def get_registry() -> ModelRegistry:
+    return _REGISTRY
+
+
+def get_detector():
+    entry = _REGISTRY.active()
+    return entry.detector if entry is not None else None
+
+
+def get_scheduler() -> Optional[InferenceScheduler]:
+    entry = _REGISTRY.active()
+    return entry.scheduler if entry is not None else None
+
+
+def scheduler_stats() -> Optional[dict]:
+    """Per-lane scheduler metrics, or None if nothing has been scheduled yet."""
+    entry = _REGISTRY.loaded()
+    return entry.scheduler.stats() if entry is not None else None
+
+
+def predict_with_model(text: str, priority: str = INTERACTIVE) -> Optional[Outcome]:
+    """Returns (hate_label, confidence, sentiment, probabilities) or None if unavailable."""
+    outcomes = predict_batch_with_model([text], priority)
+    return outcomes[0] if outcomes else None
+
+
+def predict_batch_with_model(texts: Sequence[str], priority: str = BULK) -> Optional[List[Outcome]]:
+    """Batched variant of `predict_with_model`; one outcome per text, in order."""
+    return predict_batch_with_version(texts, priority)[0]
+
+
+def predict_batch_with_version(texts: Sequence[str], priority: str = BULK) -> Tuple[Optional[list], str]:
+    """Like `predict_batch_with_model`, plus the version of the model that produced them."""
+    try:
+        # The user's detector returns (hate_label, confidence, sentiment, probabilities)
+        return _REGISTRY.predict(texts, priority)
+    except Exception as exc:  # pragma: no cover
+        logger.exception("Model prediction failed: %s", exc)
+        return None, ""
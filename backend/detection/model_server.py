@@ -0,0 +1,334 @@
+"""Out-of-process model server and its client.
+
+`manage.py run_model_server` starts one or more processes that own the
+detector (torch, spaCy, checkpoint). Web workers talk to it over a Unix
+socket through `ModelServerClient`, which `detection.model` returns in place
+of the detector when `DETECTION_MODEL_SERVER_SOCKET` is set. Web worker
+memory then no longer grows with the model, and web concurrency is decoupled
+from model concurrency.
+
+Only small length-prefixed JSON headers go over the socket. Batch payloads go
+through a shared-memory segment owned by each pooled client connection:
+
+    request   uint32 byte length per text (little-endian), then UTF-8 texts
+    response  uint8 label per text, then float32 confidence per text, then
+              float32 class probabilities per text (`classes` per text, as
+              given in the JSON reply; 0 if the detector has none)
+
+The server runs every batch through the scheduler of its own
+`ModelRegistry`, so batches from many web workers are merged, priority lanes
+still apply across workers, and the server hot-reloads its model.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import queue
+import socket
+import socketserver
+import struct
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Sequence
+
+from .model import Outcome
+from .scheduler import INTERACTIVE
+
+logger = logging.getLogger(__name__)
+
+_FRAME = struct.Struct("!I")
+_MIN_SEGMENT = 64 * 1024
+# Probabilities per text the client makes room for (MODEL_CONFIG['NUM_CLASSES'];
+# not imported, so web workers stay free of torch)
+_CLASSES = 5
+
+
+class ModelServerError(RuntimeError):
+    """Raised by the client when the server reports an error or goes away."""
+
+
+def _send(sock: socket.socket, payload: dict) -> None:
+    data = json.dumps(payload).encode("utf-8")
+    sock.sendall(_FRAME.pack(len(data)) + data)
+
+
+def _recv_exact(sock: socket.socket, size: int) -> Optional[bytes]:
+    chunks, remaining = [], size
+    while remaining:
+        chunk = sock.recv(remaining)
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b"".join(chunks)
+
+
+def _recv(sock: socket.socket) -> Optional[dict]:
+    header = _recv_exact(sock, _FRAME.size)
+    if header is None:
+        return None
+    body = _recv_exact(sock, _FRAME.unpack(header)[0])
+    return json.loads(body) if body is not None else None
+
+
+def pack_texts(texts: Sequence[str]) -> bytes:
+    encoded = [text.encode("utf-8") for text in texts]
+    return struct.pack(f"<{len(encoded)}I", *(len(e) for e in encoded)) + b"".join(encoded)
+
+
+def unpack_texts(buf, count: int) -> List[str]:
+    lengths = struct.unpack_from(f"<{count}I", buf, 0)
+    offset = 4 * count
+    data = bytes(buf[offset:offset + sum(lengths)])
+    texts, position = [], 0
+    for length in lengths:
+        texts.append(data[position:position + length].decode("utf-8"))
+        position += length
+    return texts
+
+
+def _results_size(count: int, classes: int = _CLASSES) -> int:
+    return 5 * count + 4 * count * classes
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    segment = shared_memory.SharedMemory(name=name)
+    try:
+        # The client owns the segment; stop this process's resource tracker
+        # from unlinking it when we exit
+        from multiprocessing import resource_tracker
+
+        resource_tracker.unregister(segment._name, "shared_memory")  # type: ignore[attr-defined]
+    except Exception:  # pragma: no cover
+        pass
+    return segment
+
+
+# --- Server -------------------------------------------------------------------
+
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        segments: Dict[str, shared_memory.SharedMemory] = {}
+        try:
+            while True:
+                request = _recv(self.request)
+                if request is None:
+                    return
+                try:
+                    response = self.server.dispatch(request, segments)
+                except Exception as exc:
+                    logger.exception("Model server request failed: %s", exc)
+                    response = {"ok": False, "error": str(exc)}
+                _send(self.request, response)
+        finally:
+            for segment in segments.values():
+                segment.close()
+
+
+class ModelServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path: str):
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        super().__init__(socket_path, _Handler)
+        self.registry = None
+
+    def load(self, lanes=None, processes: int = 1) -> None:
+        """Loads the detector; call after forking so each process owns one.
+
+        The process hot-reloads its model like a web worker would (see
+        `detection.model.ModelRegistry`). Torch threads are split between
+        the `processes` server processes.
+        """
+        from .model import ModelRegistry, load_local_detector
+        from .torch_threads import configure_torch_threads
+
+        configure_torch_threads(processes)
+        self.registry = ModelRegistry(load_local_detector, lambda: dict(lanes or {}))
+        if self.registry.active() is None:
+            raise RuntimeError("HateSpeechDetector failed to load")
+
+    def dispatch(self, request: dict, segments: Dict[str, shared_memory.SharedMemory]) -> dict:
+        op = request.get("op")
+        if op == "ping":
+            return {"ok": True, "pid": os.getpid(), "model_version": self.registry.active().version}
+        if op != "predict":
+            return {"ok": False, "error": f"Unknown op {op!r}"}
+
+        name, count = request["shm"], request["count"]
+        if name not in segments:
+            # A client that grew its segment has moved on from the old one
+            for old in segments.values():
+                old.close()
+            segments.clear()
+            segments[name] = _attach(name)
+        segment = segments[name]
+
+        texts = unpack_texts(segment.buf, count)
+        outcomes, model_version = self.registry.predict(texts, request.get("lane", INTERACTIVE))
+        if outcomes is None:
+            raise RuntimeError("HateSpeechDetector is not available")
+        classes = len(outcomes[0][3]) if outcomes and outcomes[0][3] is not None else 0
+        if _results_size(count, classes) > segment.size:
+            classes = 0
+        struct.pack_into(
+            f"<{count}B{count}f{count * classes}f", segment.buf, 0,
+            *(int(label) for label, _, _, _ in outcomes),
+            *(float(confidence) for _, confidence, _, _ in outcomes),
+            *(p for _, _, _, probs in outcomes for p in (probs if classes else ())),
+        )
+        return {"ok": True, "count": count, "classes": classes, "model_version": model_version}
+
+
+def serve(socket_path: str, processes: int = 1, lanes=None) -> None:
+    """Binds the socket and serves forever from `processes` forked processes."""
+    server = ModelServer(socket_path)
+    children = []
+    if processes > 1:
+        for _ in range(processes):
+            pid = os.fork()
+            if pid == 0:
+                server.load(lanes, processes)
+                server.serve_forever()
+                os._exit(0)
+            children.append(pid)
+        try:
+            for pid in children:
+                os.waitpid(pid, 0)
+        finally:
+            server.server_close()
+            if os.path.exists(socket_path):
+                os.unlink(socket_path)
+        return
+
+    server.load(lanes)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+
+# --- Client -------------------------------------------------------------------
+
+class _Connection:
+    def __init__(self, socket_path: str, timeout: float):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(timeout)
+        self.sock.connect(socket_path)
+        self.segment: Optional[shared_memory.SharedMemory] = None
+
+    def ensure_segment(self, size: int) -> shared_memory.SharedMemory:
+        if self.segment is None or self.segment.size < size:
+            self.release_segment()
+            capacity = _MIN_SEGMENT
+            while capacity < size:
+                capacity *= 2
+            self.segment = shared_memory.SharedMemory(create=True, size=capacity)
+        return self.segment
+
+    def release_segment(self) -> None:
+        if self.segment is not None:
+            self.segment.close()
+            self.segment.unlink()
+            self.segment = None
+
+    def close(self) -> None:
+        try:
+            self.sock.close()
+        finally:
+            self.release_segment()
+
+
+class ModelServerClient:
+    """Detector stand-in that forwards batches to the model server.
+
+    Connections (each with its own shared-memory segment) are pooled and
+    reused. The worker's scheduler sends one batch at a time, so the pool
+    normally holds one connection, plus one while a ping overlaps a batch.
+    """
+
+    # Lets the scheduler pass the priority lane through to the server
+    accepts_lane = True
+
+    def __init__(self, socket_path: str, timeout: float = 60.0):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._idle: "queue.LifoQueue[_Connection]" = queue.LifoQueue()
+
+    def _acquire(self) -> _Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return _Connection(self.socket_path, self.timeout)
+
+    def _release(self, connection: _Connection, broken: bool) -> None:
+        if broken:
+            connection.close()
+        else:
+            self._idle.put(connection)
+
+    def _call(self, build_request, read_results=None):
+        """One request/response on a pooled connection.
+
+        `read_results(connection, response)` runs before the connection goes
+        back to the pool, while nobody else can overwrite its shared-memory
+        segment.
+        """
+        connection = self._acquire()
+        broken = True
+        try:
+            _send(connection.sock, build_request(connection))
+            response = _recv(connection.sock)
+            if response is None:
+                raise ModelServerError("Model server closed the connection")
+            broken = False
+            if not response.get("ok"):
+                raise ModelServerError(response.get("error", "Model server error"))
+            return read_results(connection, response) if read_results else response
+        except OSError as exc:
+            raise ModelServerError(f"Model server unavailable at {self.socket_path}: {exc}") from exc
+        finally:
+            self._release(connection, broken)
+
+    def ping(self) -> dict:
+        return self._call(lambda connection: {"op": "ping"})
+
+    def predict_batch(self, texts: Sequence[str], lane: str = INTERACTIVE, batch_size: Optional[int] = None) -> List[Outcome]:
+        # batch_size (spaCy pipe batching) is the server's business; accepted
+        # so callers can treat this like a local detector
+        if not texts:
+            return []
+        payload = pack_texts(texts)
+        count = len(texts)
+
+        def build_request(connection):
+            segment = connection.ensure_segment(max(len(payload), _results_size(count)))
+            segment.buf[:len(payload)] = payload
+            return {"op": "predict", "shm": segment.name, "count": count, "lane": lane}
+
+        def read_results(connection, response):
+            classes = response.get("classes", 0)
+            return classes, struct.unpack_from(f"<{count}B{count}f{count * classes}f", connection.segment.buf, 0)
+
+        classes, unpacked = self._call(build_request, read_results)
+        labels, confidences = unpacked[:count], unpacked[count:2 * count]
+        probabilities = unpacked[2 * count:]
+        return [
+            (label, confidence, "negative" if label == 1 else "neutral",
+             list(probabilities[i * classes:(i + 1) * classes]) if classes else None)
+            for i, (label, confidence) in enumerate(zip(labels, confidences))
+        ]
+
+    def predict(self, text: str) -> Outcome:
+        return self.predict_batch([text])[0]
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
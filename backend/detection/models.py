@@ -1,5 +1,8 @@
+import uuid
+
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 
 class DetectionResult(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
@@ -10,9 +13,111 @@ class DetectionResult(models.Model):
     engine = models.CharField(max_length=50)
     latency_ms = models.FloatField()
     preprocessed_text = models.TextField(null=True, blank=True)
+    # Hash (or configured name) of the checkpoint/tokenizer/lexicon that produced the verdict
+    model_version = models.CharField(max_length=64, blank=True, default='', db_index=True)
+    # Set for rows produced by an asynchronous detection job
+    job = models.ForeignKey('DetectionJob', null=True, blank=True, on_delete=models.SET_NULL, related_name='results')
 
     class Meta:
         ordering = ['-created_at']
 
     def __str__(self):
         return f"{self.classification} ({self.confidence:.2f}) - {self.text[:50]}..."
+
+
+class DetectionJob(models.Model):
+    """
+    An asynchronous detection run over an uploaded corpus.
+
+    `processed` doubles as the resume checkpoint: it only advances once the
+    corresponding results have been durably written, so an interrupted job
+    picks up exactly where it stopped.
+    """
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_COMPLETED = 'completed'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_COMPLETED, 'Completed'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    OUTPUT_DB = 'db'
+    OUTPUT_FILE = 'file'
+    OUTPUT_CHOICES = [
+        (OUTPUT_DB, 'DetectionResult rows'),
+        (OUTPUT_FILE, 'Results file'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='detection_jobs')
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_QUEUED, db_index=True)
+    output = models.CharField(max_length=8, choices=OUTPUT_CHOICES, default=OUTPUT_DB)
+    input_path = models.CharField(max_length=512)
+    input_format = models.CharField(max_length=8)
+    text_field = models.CharField(max_length=64, default='text')
+    results_path = models.CharField(max_length=512, blank=True)
+    # Byte length of the results file at the last checkpoint
+    results_offset = models.BigIntegerField(default=0)
+    total = models.PositiveIntegerField(null=True, blank=True)
+    processed = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Refreshed on every checkpoint; a running job that stops updating is stale
+    updated_at = models.DateTimeField(auto_now=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Job {self.id} ({self.status}, {self.processed}/{self.total or '?'})"
+
+    @property
+    def throughput(self):
+        """Texts per second since the job started."""
+        if not self.started_at or not self.processed:
+            return 0.0
+        end = self.finished_at or timezone.now()
+        elapsed = (end - self.started_at).total_seconds()
+        return self.processed / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def eta_seconds(self):
+        if self.status != self.STATUS_RUNNING or not self.total:
+            return None
+        rate = self.throughput
+        if rate <= 0:
+            return None
+        return max(0.0, (self.total - self.processed) / rate)
+
+
+class ShadowStat(models.Model):
+    """
+    Hourly aggregate of a candidate model shadowing the live one.
+
+    One row per (candidate, primary, hour) with running sums; per-request
+    details are not kept.
+    """
+    candidate_version = models.CharField(max_length=64)
+    primary_version = models.CharField(max_length=64)
+    bucket = models.DateTimeField()
+    samples = models.PositiveIntegerField(default=0)
+    agreements = models.PositiveIntegerField(default=0)
+    # Disagreements by direction, seen from the primary verdict
+    safe_to_toxic = models.PositiveIntegerField(default=0)
+    toxic_to_safe = models.PositiveIntegerField(default=0)
+    primary_latency_ms = models.FloatField(default=0.0)
+    candidate_latency_ms = models.FloatField(default=0.0)
+    confidence_delta = models.FloatField(default=0.0)
+    errors = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['-bucket']
+        unique_together = [('candidate_version', 'primary_version', 'bucket')]
+
+    def __str__(self):
+        return f"{self.candidate_version} vs {self.primary_version} @ {self.bucket:%Y-%m-%d %H:00}"
@@ -0,0 +1,178 @@
+"""MinHash/LSH index of recently scored texts, to reuse verdicts for near-duplicates.
+
+Spam waves repeat one message with small mutations. `basic_clean` already
+drops usernames, links, emoji, punctuation and digits. This index catches
+what is left (an added or changed word, a typo) by the Jaccard similarity of
+the cleaned texts' character 4-gram sets:
+
+    signature   NUM_PERM MinHash values (uint32) per text
+    LSH         the signature is split into bands; texts sharing any band
+                are candidates, and a candidate matches when the estimated
+                Jaccard (share of equal MinHash values) reaches the threshold
+
+Only model verdicts are stored, along with the model version they came
+from. Entries expire after `ttl` seconds, and the oldest are evicted beyond
+`max_entries`, so memory stays bounded (about 1 KB per entry).
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from .metrics import Counter
+from .model import _setting
+
+ENGINE = "near_duplicate"
+SHINGLE = 4
+_PRIME = np.uint64(4294967291)  # largest prime below 2**32, so values fit in uint32
+
+
+def lsh_params(num_perm: int, threshold: float) -> Tuple[int, int]:
+    """(bands, rows) with bands * rows == num_perm whose S-curve midpoint is nearest the threshold."""
+    options = [(b, num_perm // b) for b in range(1, num_perm + 1) if num_perm % b == 0]
+    return min(options, key=lambda br: abs((1.0 / br[0]) ** (1.0 / br[1]) - threshold))
+
+
+class MinHasher:
+    def __init__(self, num_perm: int = 64, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self._a = rng.integers(1, int(_PRIME), size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, int(_PRIME), size=num_perm, dtype=np.uint64)
+
+    def signature(self, cleaned: str) -> np.ndarray:
+        if len(cleaned) <= SHINGLE:
+            shingles = {cleaned}
+        else:
+            shingles = {cleaned[i:i + SHINGLE] for i in range(len(cleaned) - SHINGLE + 1)}
+        hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+        # a, b and the hashes are below 2**32, so a * h + b cannot overflow uint64
+        permuted = (hashes[:, None] * self._a + self._b) % _PRIME
+        return permuted.min(axis=0).astype(np.uint32)
+
+
+class _Entry:
+    __slots__ = ("signature", "verdict", "version", "created")
+
+    def __init__(self, signature, verdict, version, created):
+        self.signature = signature
+        self.verdict = verdict
+        self.version = version
+        self.created = created
+
+
+class NearDuplicateIndex:
+    """Thread-safe, bounded, expiring MinHash/LSH index of verdicts."""
+
+    def __init__(self, threshold: float = 0.8, num_perm: int = 64, max_entries: int = 50000, ttl: float = 600.0):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hasher = MinHasher(num_perm)
+        self.bands, self.rows = lsh_params(num_perm, threshold)
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()  # oldest first
+        self._buckets: Dict[Tuple[int, bytes], Set[int]] = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.lookups = Counter()
+        self.hits = Counter()
+        self.inserts = Counter()
+        self.evictions = Counter()
+
+    def _band_keys(self, signature: np.ndarray) -> List[Tuple[int, bytes]]:
+        rows = self.rows
+        return [(band, signature[band * rows:(band + 1) * rows].tobytes()) for band in range(self.bands)]
+
+    def _evict(self, now: float) -> None:
+        # Entries are kept in insertion order, so expired ones are at the front
+        while self._entries:
+            entry_id, entry = next(iter(self._entries.items()))
+            if len(self._entries) <= self.max_entries and now - entry.created < self.ttl:
+                break
+            del self._entries[entry_id]
+            for key in self._band_keys(entry.signature):
+                bucket = self._buckets.get(key)
+                if bucket is not None:
+                    bucket.discard(entry_id)
+                    if not bucket:
+                        del self._buckets[key]
+            self.evictions.inc()
+
+    def lookup(self, signature: np.ndarray, version: str) -> Optional[dict]:
+        """The stored verdict of the most similar live entry from `version`, if similar enough."""
+        self.lookups.inc()
+        now = time.monotonic()
+        best, best_similarity = None, self.threshold
+        with self._lock:
+            self._evict(now)
+            candidates = set()
+            for key in self._band_keys(signature):
+                candidates.update(self._buckets.get(key, ()))
+            for entry_id in candidates:
+                entry = self._entries[entry_id]
+                if entry.version != version:
+                    continue
+                similarity = float(np.count_nonzero(entry.signature == signature)) / len(signature)
+                if similarity >= best_similarity:
+                    best, best_similarity = entry.verdict, similarity
+        if best is not None:
+            self.hits.inc()
+        return best
+
+    def add(self, signature: np.ndarray, verdict: dict, version: str) -> None:
+        now = time.monotonic()
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = _Entry(signature, verdict, version, now)
+            for key in self._band_keys(signature):
+                self._buckets.setdefault(key, set()).add(entry_id)
+            self._evict(now)
+        self.inserts.inc()
+
+    def signatures(self, cleaned: Sequence[str]) -> List[np.ndarray]:
+        signature = self.hasher.signature
+        return [signature(text) for text in cleaned]
+
+    def stats(self) -> dict:
+        lookups, hits = self.lookups.value, self.hits.value
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_s": self.ttl,
+            "threshold": self.threshold,
+            "bands": self.bands,
+            "rows": self.rows,
+            "lookups": lookups,
+            "reused": hits,
+            "reuse_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "inserts": self.inserts.value,
+            "evictions": self.evictions.value,
+        }
+
+
+_INDEX: Optional[NearDuplicateIndex] = None
+_INDEX_LOCK = threading.Lock()
+
+
+def get_near_duplicate_index() -> Optional[NearDuplicateIndex]:
+    """The process-wide index, or None unless DETECTION_NEAR_DUP is on."""
+    global _INDEX
+    if not _setting("DETECTION_NEAR_DUP", False):
+        return None
+    if _INDEX is None:
+        with _INDEX_LOCK:
+            if _INDEX is None:
+                _INDEX = NearDuplicateIndex(
+                    threshold=_setting("DETECTION_NEAR_DUP_THRESHOLD", 0.8),
+                    num_perm=_setting("DETECTION_NEAR_DUP_NUM_PERM", 64),
+                    max_entries=_setting("DETECTION_NEAR_DUP_MAX_ENTRIES", 50000),
+                    ttl=_setting("DETECTION_NEAR_DUP_TTL_S", 600.0),
+                )
+    return _INDEX
@@ -0,0 +1,29 @@
+"""MessagePack request bodies for the detect views (see renderers.py)."""
+
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+from rest_framework.settings import api_settings
+
+from .renderers import MSGPACK, msgpack
+
+
+def unpackb(data: bytes):
+    """Decodes one MessagePack object; raises ValueError on malformed input."""
+    try:
+        return msgpack.unpackb(data, raw=False)
+    except Exception as exc:
+        raise ValueError(f"MessagePack parse error - {exc}") from exc
+
+
+class MessagePackParser(BaseParser):
+    media_type = MSGPACK
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return unpackb(stream.read())
+        except ValueError as exc:
+            raise ParseError(str(exc))
+
+
+# Parsers for the detect views: the defaults plus MessagePack, if available
+DETECT_PARSERS = list(api_settings.DEFAULT_PARSER_CLASSES) + ([MessagePackParser] if msgpack else [])
@@ -0,0 +1,120 @@
+"""End-to-end detection for one or many texts.
+
+Views, jobs and management commands all go through `detect_texts` so that
+preprocessing, scheduling and result shaping stay identical across entry
+points.
+"""
+
+from __future__ import annotations
+
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .cascade import ENGINE as CASCADE_ENGINE, get_cascade
+from .model import _setting, get_model_version, predict_batch_with_version
+from .neardup import ENGINE as NEAR_DUP_ENGINE, get_near_duplicate_index
+from .preprocess import get_preprocessor
+from .scheduler import INTERACTIVE
+
+
+def detect_texts(texts: Sequence[str], priority: str = INTERACTIVE, timings: Optional[dict] = None,
+                 with_tokens: bool = False) -> Optional[List[dict]]:
+    """Returns one verdict dict per text, or None if the model is unavailable.
+
+    The model only needs cleaned text; tokens and lemmas (the spaCy stage) are
+    computed only `with_tokens`, and are None otherwise. Texts decided without
+    the model skip lemmatisation and have no lemmas: with the cascade on (see
+    cascade.py) the lexicon stage decides clear-cut texts (engine "lexicon"),
+    and with the near-duplicate index on (see neardup.py) a text close to a
+    recently scored one reuses that verdict (engine "near_duplicate"). If
+    `timings` is given, per-stage wall times (ms) are recorded into it.
+    """
+    start = time.perf_counter()
+    texts = list(texts)
+    preprocessor = get_preprocessor()
+    cleaned = preprocessor.basic_clean_batch(texts)
+    shortcuts, signatures = decide_without_model(cleaned)
+    escalated = [i for i, shortcut in enumerate(shortcuts) if shortcut is None]
+    if with_tokens:
+        pre = preprocessor.preprocess_cleaned_batch(
+            [texts[i] for i in escalated], [cleaned[i] for i in escalated],
+            batch_size=_setting("DETECTION_SPACY_BATCH_SIZE", 256),
+        )
+    else:
+        pre = [{"cleaned": cleaned[i], "tokens": None, "lemmas": None} for i in escalated]
+    preprocessed = time.perf_counter()
+
+    # Model runs on cleaned text
+    outcomes, model_version = predict_batch_with_version([p["cleaned"] for p in pre], priority) if pre else ([], "")
+    if timings is not None:
+        timings["preprocess"] = (preprocessed - start) * 1000.0
+        timings["model"] = (time.perf_counter() - preprocessed) * 1000.0
+    if outcomes is None:
+        return None
+
+    verdicts: List[Optional[dict]] = [None] * len(texts)
+    for i, p, (hate_label, confidence, sentiment, probabilities) in zip(escalated, pre, outcomes):
+        verdicts[i] = _verdict(hate_label, confidence, sentiment, probabilities, "transformer", model_version,
+                               p["cleaned"], p["tokens"], p["lemmas"])
+        remember_verdict(signatures.get(i), (hate_label, confidence, sentiment, probabilities), model_version)
+    for i, shortcut in enumerate(shortcuts):
+        if shortcut is not None:
+            tokens = preprocessor.remove_stopwords(preprocessor.tokenize(cleaned[i])) if with_tokens else None
+            verdicts[i] = _verdict(*shortcut, cleaned[i], tokens, [] if with_tokens else None)
+    return verdicts
+
+
+def decide_without_model(cleaned: Sequence[str]) -> Tuple[List[Optional[tuple]], Dict[int, object]]:
+    """Runs the cascade and near-duplicate stages over cleaned texts.
+
+    Returns, per text, (hate_label, confidence, sentiment, probabilities,
+    engine, model_version) if it was decided without the model, else None; and
+    the near-duplicate signatures of the texts left for the model, to pass to
+    `remember_verdict` once they are scored.
+    """
+    shortcuts: List[Optional[tuple]] = [None] * len(cleaned)
+    cascade = get_cascade()
+    if cascade is not None:
+        for i, decision in enumerate(cascade.decide_batch(cleaned)):
+            if decision is not None:
+                hate_label, confidence = decision
+                shortcuts[i] = (hate_label, confidence, "negative" if hate_label == 1 else "neutral", None,
+                                CASCADE_ENGINE, cascade.version)
+    index = get_near_duplicate_index()
+    signatures = {}
+    if index is not None:
+        version = get_model_version()
+        for i in (i for i, shortcut in enumerate(shortcuts) if shortcut is None):
+            signature = index.hasher.signature(cleaned[i])
+            reused = index.lookup(signature, version)
+            if reused is not None:
+                shortcuts[i] = (reused["hate_label"], reused["confidence"], reused["sentiment"],
+                                reused["probabilities"], NEAR_DUP_ENGINE, version)
+            else:
+                signatures[i] = signature
+    return shortcuts, signatures
+
+
+def remember_verdict(signature, outcome, model_version: str) -> None:
+    """Adds a model outcome to the near-duplicate index (no-op without a signature)."""
+    index = get_near_duplicate_index()
+    if signature is None or index is None:
+        return
+    hate_label, confidence, sentiment, probabilities = outcome
+    index.add(signature, {"hate_label": hate_label, "confidence": float(confidence),
+                          "sentiment": sentiment, "probabilities": probabilities}, model_version)
+
+
+def _verdict(hate_label, confidence, sentiment, probabilities, engine, model_version, cleaned, tokens, lemmas) -> dict:
+    return {
+        "classification": "toxic" if hate_label == 1 else "safe",
+        "confidence": float(confidence),
+        "sentiment": sentiment,
+        # Per-class model probabilities; None for lexicon decisions
+        "probabilities": probabilities,
+        "engine": engine,
+        "model_version": model_version,
+        "cleaned": cleaned,
+        "tokens": tokens,
+        "lemmas": lemmas,
+    }
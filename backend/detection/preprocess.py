@@ -11,78 +11,128 @@ This module avoids crashing if resources are missing and falls back to minimal b
 
 from __future__ import annotations
 
+import logging
 import re
+import time
 import unicodedata
 from typing import List, Optional
 
-# NLTK setup
-try:
-    import nltk
-    from nltk.corpus import stopwords
-    from nltk.stem import WordNetLemmatizer
-    _NLTK_OK = True
-except Exception:  # pragma: no cover
-    nltk = None  # type: ignore
-    stopwords = None  # type: ignore
-    WordNetLemmatizer = None  # type: ignore
-    _NLTK_OK = False
-
-# spaCy setup
-try:
-    import spacy
-    _SPACY_OK = True
-except Exception:  # pragma: no cover
-    spacy = None  # type: ignore
-    _SPACY_OK = False
+logger = logging.getLogger(__name__)
+
+# nltk and spaCy are imported on first use, not at module import, so that
+# processes that never preprocess (migrations, job runners talking to a model
+# server, ...) do not pay for them. Resources are never downloaded at runtime:
+# they must be installed or vendored under NLTK_DATA_PATH / DETECTION_SPACY_MODEL.
+
+# Only the tagger/attribute_ruler/lemmatizer are needed for lemmas
+SPACY_DISABLED = ['parser', 'ner', 'senter']
+_FALLBACK_STOPWORDS = {"the", "a", "an", "and", "or", "is", "are", "to", "in", "of"}
 
 _STOPWORDS: set[str] = set()
-_WORDNET: Optional[WordNetLemmatizer] = None  # type: ignore
+_WORDNET = None  # nltk WordNetLemmatizer, only used without spaCy
 _NLP = None  # spaCy nlp object
+_LOADED = False
+
 
+def _setting(name: str, default):
+    from .model import _setting as read_setting
 
-def _ensure_nltk():
+    return read_setting(name, default)
+
+
+def _ensure_nltk(need_wordnet: bool):
     global _STOPWORDS, _WORDNET
-    if not _NLTK_OK:
-        return
     try:
-        # Ensure resources; download quietly if missing
-        try:
-            nltk.data.find('corpora/stopwords')
-        except LookupError:  # pragma: no cover
-            nltk.download('stopwords', quiet=True)
+        import nltk
+    except Exception:  # pragma: no cover
+        _STOPWORDS = set(_FALLBACK_STOPWORDS)
+        return
+
+    data_path = _setting("NLTK_DATA_PATH", "")
+    if data_path and data_path not in nltk.data.path:
+        nltk.data.path.insert(0, data_path)
+    resources = ['corpora/stopwords'] + (['corpora/wordnet'] if need_wordnet else [])
+    missing = []
+    for resource in resources:
         try:
-            nltk.data.find('corpora/wordnet')
-        except LookupError:  # pragma: no cover
-            nltk.download('wordnet', quiet=True)
-            nltk.download('omw-1.4', quiet=True)
+            nltk.data.find(resource)
+        except LookupError:
+            missing.append(resource.split('/')[-1])
+    if missing:
+        # Never download here: workers may have no network access
+        logger.error(
+            "NLTK resources %s not found in %s; using fallbacks. Vendor them with: "
+            "python -m nltk.downloader -d %s %s",
+            ", ".join(missing), nltk.data.path, data_path or "<NLTK_DATA_PATH>", " ".join(missing),
+        )
+
+    try:
+        from nltk.corpus import stopwords
+
         _STOPWORDS = set(stopwords.words('english'))
-        _WORDNET = WordNetLemmatizer()
     except Exception:  # pragma: no cover
         # Fallback to a tiny stopword set
-        _STOPWORDS = {"the", "a", "an", "and", "or", "is", "are", "to", "in", "of"}
-        _WORDNET = None
+        _STOPWORDS = set(_FALLBACK_STOPWORDS)
+    if need_wordnet and 'wordnet' not in missing:
+        try:
+            from nltk.stem import WordNetLemmatizer
+
+            _WORDNET = WordNetLemmatizer()
+        except Exception:  # pragma: no cover
+            _WORDNET = None
+
+
+def load_spacy(name: Optional[str] = None):
+    """Loads a spaCy pipeline by package name or local path, with SPACY_DISABLED.
+
+    Returns None if spaCy is not installed; raises OSError if the model is.
+    """
+    try:
+        import spacy
+    except Exception:  # pragma: no cover
+        return None
+    return spacy.load(name or _setting("DETECTION_SPACY_MODEL", "en_core_web_sm"), disable=SPACY_DISABLED)
 
 
 def _ensure_spacy():
     global _NLP
-    if not _SPACY_OK:
-        return
     if _NLP is not None:
         return
     try:
-        # Try small English model; fallback to blank English pipeline
-        _NLP = spacy.load('en_core_web_sm', disable=['ner'])
-    except Exception:  # pragma: no cover
+        _NLP = load_spacy()
+    except Exception as exc:  # pragma: no cover
+        # Fallback to a blank English pipeline (tokenizer only, no lemmas)
+        logger.error(
+            "spaCy model %r could not be loaded (%s); falling back to a blank pipeline. "
+            "Install the model package or set DETECTION_SPACY_MODEL to a local model directory.",
+            _setting("DETECTION_SPACY_MODEL", "en_core_web_sm"), exc,
+        )
         try:
+            import spacy
+
             _NLP = spacy.blank('en')
-            # Add simple components if available
-            if 'lemmatizer' not in _NLP.pipe_names:
-                # spaCy v3 lemmatizer may require lookups; ignore if unavailable
-                pass
         except Exception:
             _NLP = None
 
 
+def get_nlp():
+    """The shared spaCy pipeline (loading it if needed), or None without spaCy."""
+    _ensure_resources()
+    return _NLP
+
+
+def _ensure_resources():
+    global _LOADED
+    if _LOADED:
+        return
+    start = time.perf_counter()
+    _ensure_spacy()
+    # WordNet is only the lemmatizer of last resort
+    _ensure_nltk(need_wordnet=_NLP is None)
+    _LOADED = True
+    logger.info("Preprocessing resources loaded in %.2fs", time.perf_counter() - start)
+
+
 class TextPreprocessor:
     URL_RE = re.compile(r"https?://\S+|www\.\S+", flags=re.IGNORECASE)
     HTML_RE = re.compile(r"<[^>]+>")
@@ -91,16 +141,35 @@ class TextPreprocessor:
     EMAIL_RE = re.compile(r"[\w\.-]+@[\w\.-]+\.[A-Za-z]{2,}")
     PUNCT_NUM_RE = re.compile(r"[^A-Za-z\s]")
     MULTISPACE_RE = re.compile(r"\s+")
+    WORD_RE = re.compile(r"[a-z]+")
+
+    def __init__(self, lazy: bool = False, use_lemma_cache: bool = False):
+        # Optional Classifier.lemma_cache.LemmaCache; lemmatises context-free
+        self.lemma_cache = None
+        # Attach the process-wide cache (if DETECTION_LEMMA_CACHE is on) once spaCy is loaded
+        self._use_lemma_cache = use_lemma_cache
+        self._loaded = False
+        # lazy: load spaCy/nltk on the first tokenize/stopword/lemma call
+        # instead of now; basic_clean never needs them
+        if not lazy:
+            self._load()
 
-    def __init__(self):
-        _ensure_nltk()
-        _ensure_spacy()
+    def _load(self) -> None:
+        if self._loaded:
+            return
+        _ensure_resources()
+        if self._use_lemma_cache and _NLP is not None:
+            from .model import get_lemma_cache
+
+            self.lemma_cache = get_lemma_cache(_NLP)
+        self._loaded = True
 
     @staticmethod
     def normalize_unicode(text: str) -> str:
         return unicodedata.normalize('NFKC', text)
 
-    def basic_clean(self, text: str) -> str:
+    def basic_clean_reference(self, text: str) -> str:
+        """Straightforward multi-pass version of `basic_clean`, kept for parity checks."""
         text = self.normalize_unicode(text)
         text = text.lower()
         text = self.URL_RE.sub(" ", text)
@@ -112,7 +181,34 @@ class TextPreprocessor:
         text = self.MULTISPACE_RE.sub(" ", text).strip()
         return text
 
+    def basic_clean(self, text: str) -> str:
+        # NFKC leaves ASCII unchanged
+        if not text.isascii():
+            text = unicodedata.normalize('NFKC', text)
+        text = text.lower()
+
+        # The removal patterns only match when their trigger is present, and
+        # removing a match never creates a new trigger, so absent ones are skipped
+        if "://" in text or "www." in text:
+            text = self.URL_RE.sub(" ", text)
+        if "@" in text:
+            text = self.EMAIL_RE.sub(" ", text)
+            text = self.MENTION_RE.sub(" ", text)
+        if "#" in text:
+            text = self.HASHTAG_RE.sub(" ", text)
+        if "<" in text:
+            text = self.HTML_RE.sub(" ", text)
+
+        # Stripping punctuation/digits and collapsing whitespace leaves exactly
+        # the runs of letters (the text is already lowercase), in one pass
+        return " ".join(self.WORD_RE.findall(text))
+
+    def basic_clean_batch(self, texts: List[str]) -> List[str]:
+        clean = self.basic_clean
+        return [clean(text) for text in texts]
+
     def tokenize(self, text: str) -> List[str]:
+        self._load()
         if _NLP is not None:
             doc = _NLP.make_doc(text)
             return [t.text for t in doc if t.text.strip()]
@@ -120,20 +216,45 @@ class TextPreprocessor:
         return [t for t in text.split() if t]
 
     def remove_stopwords(self, tokens: List[str]) -> List[str]:
+        self._load()
         if _STOPWORDS:
             return [t for t in tokens if t not in _STOPWORDS]
         return tokens
 
+    @staticmethod
+    def _doc_lemmas(doc) -> List[str]:
+        lemmas = [t.lemma_ if t.lemma_ not in ("-PRON-", " ") else t.text for t in doc]
+        return [l for l in lemmas if l]
+
+    def _cached_lemmas(self, tokens: List[str]) -> List[str]:
+        forms = [t.text for t in _NLP.make_doc(" ".join(tokens))]
+        lemmas = [
+            lemma if lemma not in ("-PRON-", " ") else form
+            for form, (lemma, _) in zip(forms, self.lemma_cache.lookup(_NLP, forms))
+        ]
+        return [l for l in lemmas if l]
+
     def lemmatize(self, tokens: List[str]) -> List[str]:
+        self._load()
+        if _NLP is not None and self.lemma_cache is not None:
+            return self._cached_lemmas(tokens)
         if _NLP is not None:
             # Use spaCy lemmatization if possible
-            doc = _NLP(" ".join(tokens))
-            lemmas = [t.lemma_ if t.lemma_ not in ("-PRON-", " ") else t.text for t in doc]
-            return [l for l in lemmas if l]
+            return self._doc_lemmas(_NLP(" ".join(tokens)))
         if _WORDNET is not None:
             return [_WORDNET.lemmatize(t) for t in tokens]
         return tokens
 
+    def lemmatize_batch(self, token_lists: List[List[str]], batch_size: int = 256, n_process: int = 1) -> List[List[str]]:
+        """`lemmatize` for many token lists, batched through spaCy's nlp.pipe."""
+        self._load()
+        if _NLP is not None and self.lemma_cache is not None:
+            return [self._cached_lemmas(tokens) for tokens in token_lists]
+        if _NLP is not None:
+            docs = _NLP.pipe((" ".join(tokens) for tokens in token_lists), batch_size=batch_size, n_process=n_process)
+            return [self._doc_lemmas(doc) for doc in docs]
+        return [self.lemmatize(tokens) for tokens in token_lists]
+
     def preprocess(self, text: str) -> dict:
         cleaned = self.basic_clean(text)
         tokens = self.tokenize(cleaned)
@@ -146,13 +267,34 @@ class TextPreprocessor:
             "lemmas": lemmas,
         }
 
+    def preprocess_batch(self, texts: List[str], batch_size: int = 256, n_process: int = 1) -> List[dict]:
+        """Same output as `preprocess` per text; spaCy lemmatizes the whole batch in one pipe.
+
+        n_process > 1 forks spaCy workers, which is only worth it (and only
+        allowed) in offline jobs running in a non-daemonic process.
+        """
+        return self.preprocess_cleaned_batch(texts, self.basic_clean_batch(texts), batch_size, n_process)
+
+    def preprocess_cleaned_batch(self, texts: List[str], cleaned: List[str], batch_size: int = 256,
+                                 n_process: int = 1) -> List[dict]:
+        """`preprocess_batch` for texts the caller has already run through `basic_clean_batch`."""
+        token_lists = [self.remove_stopwords(self.tokenize(c)) for c in cleaned]
+        lemma_lists = self.lemmatize_batch(token_lists, batch_size, n_process)
+        return [
+            {"original": text, "cleaned": c, "tokens": tokens, "lemmas": lemmas}
+            for text, c, tokens, lemmas in zip(texts, cleaned, token_lists, lemma_lists)
+        ]
+
 
 # Singleton-style helper
 _PREPROCESSOR: Optional[TextPreprocessor] = None
 
 
 def get_preprocessor() -> TextPreprocessor:
+    """The shared preprocessor. With a model server, web workers only need
+    basic_clean for most requests, so spaCy and nltk load on first use."""
     global _PREPROCESSOR
     if _PREPROCESSOR is None:
-        _PREPROCESSOR = TextPreprocessor()
+        lazy = bool(_setting("DETECTION_MODEL_SERVER_SOCKET", ""))
+        _PREPROCESSOR = TextPreprocessor(lazy=lazy, use_lemma_cache=True)
     return _PREPROCESSOR
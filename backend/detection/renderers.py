@@ -0,0 +1,108 @@
+"""Faster response encodings for the API.
+
+`ORJSONRenderer` is a drop-in for DRF's JSONRenderer: same media type and
+output, serialised with orjson (several times faster on the float- and
+list-heavy detect payloads). Types orjson does not know natively go through
+DRF's own encoder. Without orjson installed it behaves exactly like
+JSONRenderer.
+
+`MessagePackRenderer` renders `application/msgpack` for clients that ask for
+it with Accept (floats as float32, enough for confidences). The detect views
+add it, and `parsers.MessagePackParser`, through DETECT_RENDERERS and
+DETECT_PARSERS when the `msgpack` package is installed. Without msgpack,
+those media types get 406/415 as for any other unsupported type.
+"""
+
+from django.http import HttpResponse
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson  # type: ignore
+except ImportError:  # pragma: no cover
+    orjson = None
+
+try:
+    import msgpack  # type: ignore
+except ImportError:  # pragma: no cover
+    msgpack = None
+
+MSGPACK = "application/msgpack"
+
+_DEFAULT = JSONEncoder().default
+# DRF renders UTC datetimes with a 'Z' suffix; numpy arrays/scalars are
+# rendered natively rather than through the encoder
+_OPTIONS = (orjson.OPT_UTC_Z | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS) if orjson else 0
+
+
+def dumps(data, indent=False) -> bytes:
+    """`data` as UTF-8 JSON bytes."""
+    if orjson is None:  # pragma: no cover
+        return JSONRenderer().render(data, renderer_context={"indent": 2 if indent else None})
+    return orjson.dumps(data, default=_DEFAULT, option=_OPTIONS | (orjson.OPT_INDENT_2 if indent else 0))
+
+
+def json_response(data, status=200) -> HttpResponse:
+    """JsonResponse equivalent for the plain Django (async) views."""
+    return HttpResponse(dumps(data), status=status, content_type="application/json")
+
+
+class ORJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None:  # pragma: no cover
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b""
+        # Indent only when the client asks (Accept: application/json; indent=N)
+        # or for the browsable API, like JSONRenderer
+        return dumps(data, indent=bool(self.get_indent(accepted_media_type, renderer_context or {})))
+
+
+def packb(data) -> bytes:
+    """`data` as MessagePack bytes."""
+    return msgpack.packb(data, use_bin_type=True, use_single_float=True, default=_DEFAULT)
+
+
+def prefers_msgpack(accept: str) -> bool:
+    """True if an Accept header ranks MessagePack at least as high as JSON (and msgpack is installed)."""
+    if msgpack is None or not accept:
+        return False
+    ranks = {}
+    for part in accept.split(","):
+        media_type, *params = (piece.strip() for piece in part.split(";"))
+        q = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        ranks[media_type.lower()] = q
+    q_msgpack = ranks.get(MSGPACK, 0.0)
+    return q_msgpack > 0 and q_msgpack >= max(ranks.get("application/json", 0.0), ranks.get("application/x-ndjson", 0.0))
+
+
+def msgpack_response(data, status=200) -> HttpResponse:
+    return HttpResponse(packb(data), status=status, content_type=MSGPACK)
+
+
+class MessagePackRenderer(BaseRenderer):
+    media_type = MSGPACK
+    format = "msgpack"
+    charset = None
+    render_style = "binary"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return packb(data)
+
+
+def columns(items, fields):
+    """Row dicts as {field: [value per row]}; batch results in MessagePack are column-wise."""
+    return {field: [item[field] for item in items] for field in fields}
+
+
+# Renderers for the detect views: the defaults plus MessagePack, if available
+DETECT_RENDERERS = list(api_settings.DEFAULT_RENDERER_CLASSES) + ([MessagePackRenderer] if msgpack else [])
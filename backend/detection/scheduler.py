@@ -0,0 +1,205 @@
+"""Micro-batching inference scheduler with priority lanes.
+
+Texts submitted from request threads are queued per lane and a single
+dispatcher thread groups them into batches for the detector. Lanes are served
+in strict priority order: while the interactive lane has pending work the bulk
+lane is never dispatched, and bulk batches are capped in size so a batch that
+is already running delays interactive traffic by at most one bulk forward pass.
+
+Each lane has its own batching policy (`max_batch_size`, `max_wait_ms`) and its
+own latency metrics.
+
+A lane with `buckets` (upper token-length bounds, e.g. (32, 64, 128)) keeps one
+queue per length bucket and only batches texts from the same bucket, so a
+batch is not padded to one long outlier. The bucket whose oldest text has
+waited longest is served first, and `max_wait_ms` still bounds the wait.
+Lengths are estimated from the word count; the classifier reports the exact
+padding efficiency.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+from bisect import bisect_left
+import time
+from collections import deque
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from .metrics import Counter, LatencyStats
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = "interactive"
+BULK = "bulk"
+# Highest priority first
+LANES = (INTERACTIVE, BULK)
+
+
+class SchedulerClosed(RuntimeError):
+    """Raised by `submit` once `shutdown` has been called."""
+
+
+@dataclass(frozen=True)
+class LaneConfig:
+    max_batch_size: int
+    max_wait_ms: float
+    buckets: Tuple[int, ...] = ()
+
+
+DEFAULT_LANES = {
+    INTERACTIVE: LaneConfig(max_batch_size=8, max_wait_ms=2.0),
+    BULK: LaneConfig(max_batch_size=64, max_wait_ms=50.0),
+}
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough model input length: one token per word plus [CLS] and [SEP]."""
+    return len(text.split()) + 2
+
+
+@dataclass
+class _Item:
+    text: str
+    future: Future
+    enqueued_at: float
+    length: int = 0
+
+
+class _LaneMetrics:
+    def __init__(self):
+        self.latency = LatencyStats()
+        self.queue_wait = LatencyStats()
+        self.batches = Counter()
+        self.items = Counter()
+        # Estimated tokens vs. token slots if each batch is padded to its longest text
+        self.tokens = Counter()
+        self.slots = Counter()
+
+    def snapshot(self) -> dict:
+        batches, slots = self.batches.value, self.slots.value
+        return {
+            "latency": self.latency.snapshot(),
+            "queue_wait": self.queue_wait.snapshot(),
+            "batches": batches,
+            "items": self.items.value,
+            "mean_batch_size": round(self.items.value / batches, 2) if batches else 0.0,
+            "estimated_padding_efficiency": round(self.tokens.value / slots, 4) if slots else 0.0,
+        }
+
+
+class InferenceScheduler:
+    """Queues texts per priority lane and runs them through `predict_batch`.
+
+    `predict_batch` receives a list of texts and the lane they came from, and
+    must return one result per text, in order.
+    """
+
+    def __init__(self, predict_batch: Callable[[List[str], str], Sequence], lanes: Optional[Dict[str, LaneConfig]] = None,
+                 length_fn: Callable[[str], int] = estimate_tokens):
+        self._predict_batch = predict_batch
+        self._lanes = dict(DEFAULT_LANES)
+        self._lanes.update(lanes or {})
+        self._length = length_fn
+        # One queue per length bucket; the last one has no upper bound
+        self._queues: Dict[str, List[deque]] = {
+            lane: [deque() for _ in range(len(self._lanes[lane].buckets) + 1)] for lane in LANES
+        }
+        self._metrics = {lane: _LaneMetrics() for lane in LANES}
+        self._cond = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="inference-scheduler", daemon=True)
+        self._thread.start()
+
+    def submit(self, texts: Sequence[str], lane: str = INTERACTIVE) -> List[Future]:
+        if lane not in self._queues:
+            raise ValueError(f"Unknown priority lane: {lane!r}")
+        now = time.perf_counter()
+        items = [_Item(text, Future(), now, self._length(text)) for text in texts]
+        buckets = self._lanes[lane].buckets
+        with self._cond:
+            if self._closed:
+                raise SchedulerClosed("Inference scheduler is shut down")
+            queues = self._queues[lane]
+            for item in items:
+                queues[bisect_left(buckets, item.length) if buckets else 0].append(item)
+            self._cond.notify()
+        return [item.future for item in items]
+
+    def predict(self, texts: Sequence[str], lane: str = INTERACTIVE, timeout: Optional[float] = None) -> list:
+        return [future.result(timeout) for future in self.submit(texts, lane)]
+
+    def shutdown(self) -> None:
+        """Stops accepting work, finishes everything already queued, then stops."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+
+    def stats(self) -> dict:
+        with self._cond:
+            depths = {lane: sum(len(queue) for queue in queues) for lane, queues in self._queues.items()}
+        return {
+            lane: {
+                "queue_depth": depths[lane],
+                "max_batch_size": self._lanes[lane].max_batch_size,
+                "max_wait_ms": self._lanes[lane].max_wait_ms,
+                "buckets": list(self._lanes[lane].buckets),
+                **self._metrics[lane].snapshot(),
+            }
+            for lane in LANES
+        }
+
+    def _next_batch(self):
+        with self._cond:
+            while True:
+                now = time.perf_counter()
+                timeout = None
+                for lane in LANES:
+                    pending = [queue for queue in self._queues[lane] if queue]
+                    if not pending:
+                        continue
+                    config = self._lanes[lane]
+                    oldest = min(pending, key=lambda queue: queue[0].enqueued_at)
+                    full = [queue for queue in pending if len(queue) >= config.max_batch_size]
+                    deadline = oldest[0].enqueued_at + config.max_wait_ms / 1000.0
+                    # After shutdown, drain without waiting for batches to fill
+                    if self._closed or full or now >= deadline:
+                        queue = oldest if now >= deadline or not full else min(full, key=lambda q: q[0].enqueued_at)
+                        size = min(len(queue), config.max_batch_size)
+                        return lane, [queue.popleft() for _ in range(size)]
+                    # Hold lower lanes back until this one has been dispatched
+                    timeout = deadline - now
+                    break
+                if self._closed:
+                    return None, []
+                self._cond.wait(timeout)
+
+    def _run(self) -> None:
+        while True:
+            lane, batch = self._next_batch()
+            if not batch:
+                return
+            metrics = self._metrics[lane]
+            started = time.perf_counter()
+            for item in batch:
+                metrics.queue_wait.observe((started - item.enqueued_at) * 1000.0)
+            try:
+                results = self._predict_batch([item.text for item in batch], lane)
+                if len(results) != len(batch):
+                    raise RuntimeError(f"Detector returned {len(results)} results for {len(batch)} texts")
+            except Exception as exc:
+                logger.exception("Batched prediction failed on %s lane: %s", lane, exc)
+                for item in batch:
+                    item.future.set_exception(exc)
+                continue
+            finished = time.perf_counter()
+            metrics.batches.inc()
+            metrics.items.inc(len(batch))
+            metrics.tokens.inc(sum(item.length for item in batch))
+            metrics.slots.inc(len(batch) * max(item.length for item in batch))
+            for item, result in zip(batch, results):
+                metrics.latency.observe((finished - item.enqueued_at) * 1000.0)
+                item.future.set_result(result)
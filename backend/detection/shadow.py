@@ -0,0 +1,230 @@
+"""Shadow evaluation of a candidate checkpoint on live traffic.
+
+When `DETECTION_SHADOW_MODEL_PATH` is set, a sample of detect requests
+(`DETECTION_SHADOW_SAMPLE_RATE`) is re-scored by the candidate after the
+response has been produced, on a single low-priority background thread. The
+request path only does a random draw and a non-blocking hand-off; when the
+shadow thread falls behind, samples are dropped rather than queued.
+
+Results are aggregated in memory and flushed to `ShadowStat`, one row per
+candidate/primary version pair and hour:
+
+    samples, agreements, safe_to_toxic, toxic_to_safe   verdict agreement
+    primary_latency_ms, candidate_latency_ms            per-text sums
+    confidence_delta                                    sum of candidate - primary
+
+Primary latency is the request's model stage (including batching wait);
+candidate latency is a direct forward pass on the shadow thread.
+"""
+
+from __future__ import annotations
+
+import atexit
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .metrics import Counter
+
+logger = logging.getLogger(__name__)
+
+_FIELDS = (
+    "samples", "agreements", "safe_to_toxic", "toxic_to_safe",
+    "primary_latency_ms", "candidate_latency_ms", "confidence_delta", "errors",
+)
+
+
+def _lower_priority() -> None:
+    # Linux lets a single thread be reniced through its native id
+    try:
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 19)
+    except (AttributeError, OSError):  # pragma: no cover
+        pass
+
+
+class ShadowEngine:
+    def __init__(self, model_path: str, sample_rate: float, max_pending: int = 64, flush_interval: float = 10.0):
+        self.model_path = model_path
+        self.sample_rate = sample_rate
+        self.max_pending = max_pending
+        self.flush_interval = flush_interval
+        self.version = ""
+        self._detector = None
+        self._load_failed = False
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shadow", initializer=_lower_priority)
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._totals: Dict[Tuple[str, str, object], Dict[str, float]] = {}
+        self._last_flush = time.monotonic()
+        self.sampled = Counter()
+        self.dropped = Counter()
+        self.failed = Counter()
+
+    def observe(self, verdicts: Sequence[dict], primary_model_ms: float) -> None:
+        """Called on the request path after the response is ready; never blocks."""
+        # Texts the cascade decided never reached the primary model
+        verdicts = [v for v in verdicts if v["engine"] == "transformer"]
+        if not verdicts or random.random() >= self.sample_rate:
+            return
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.dropped.inc()
+                return
+            self._pending += 1
+        self.sampled.inc()
+        primary = [(v["cleaned"], v["classification"], v["confidence"], v["model_version"]) for v in verdicts]
+        self._executor.submit(self._score, primary, primary_model_ms)
+
+    def _ensure_loaded(self):
+        if self._detector is None and not self._load_failed:
+            from .model import _build_paths, compute_model_version, load_local_detector
+
+            self._detector = load_local_detector(self.model_path)
+            if self._detector is None:
+                self._load_failed = True
+                logger.error("Shadow candidate %s failed to load; shadowing disabled", self.model_path)
+            else:
+                paths = _build_paths()
+                paths["model_path"] = self.model_path
+                self.version = compute_model_version(paths)
+                logger.info("Shadowing live traffic with candidate %s (%s)", self.version, self.model_path)
+        return self._detector
+
+    def _score(self, primary: List[tuple], primary_model_ms: float) -> None:
+        try:
+            detector = self._ensure_loaded()
+            if detector is None:
+                return
+            bucket = timezone.now().replace(minute=0, second=0, microsecond=0)
+            per_text_primary_ms = primary_model_ms / len(primary)
+            try:
+                started = time.perf_counter()
+                outcomes = detector.predict_batch([cleaned for cleaned, _, _, _ in primary])
+                per_text_candidate_ms = (time.perf_counter() - started) * 1000.0 / len(primary)
+            except Exception as exc:
+                self.failed.inc()
+                logger.warning("Shadow prediction failed: %s", exc)
+                self._add(bucket, primary[0][3], errors=1)
+                return
+            for (_, classification, confidence, primary_version), (label, candidate_confidence, _, _) in zip(primary, outcomes):
+                candidate = "toxic" if label == 1 else "safe"
+                self._add(
+                    bucket, primary_version,
+                    samples=1,
+                    agreements=int(candidate == classification),
+                    safe_to_toxic=int(classification == "safe" and candidate == "toxic"),
+                    toxic_to_safe=int(classification == "toxic" and candidate == "safe"),
+                    primary_latency_ms=per_text_primary_ms,
+                    candidate_latency_ms=per_text_candidate_ms,
+                    confidence_delta=float(candidate_confidence) - float(confidence),
+                )
+            if time.monotonic() - self._last_flush >= self.flush_interval:
+                self.flush()
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def _add(self, bucket, primary_version: str, **values) -> None:
+        with self._lock:
+            totals = self._totals.setdefault((self.version, primary_version, bucket), dict.fromkeys(_FIELDS, 0))
+            for field, value in values.items():
+                totals[field] += value
+
+    def flush(self) -> None:
+        """Adds the in-memory totals to ShadowStat rows."""
+        from .models import ShadowStat
+
+        with self._lock:
+            totals, self._totals = self._totals, {}
+            self._last_flush = time.monotonic()
+        if not totals:
+            return
+        close_old_connections()
+        try:
+            with transaction.atomic():
+                for (candidate_version, primary_version, bucket), values in totals.items():
+                    row, _ = ShadowStat.objects.get_or_create(
+                        candidate_version=candidate_version, primary_version=primary_version, bucket=bucket,
+                    )
+                    ShadowStat.objects.filter(pk=row.pk).update(**{f: F(f) + v for f, v in values.items()})
+        except Exception as exc:  # pragma: no cover
+            logger.warning("Could not store shadow stats: %s", exc)
+        finally:
+            close_old_connections()
+
+    def stats(self) -> dict:
+        return {
+            "candidate_version": self.version,
+            "candidate_path": self.model_path,
+            "sample_rate": self.sample_rate,
+            "sampled": self.sampled.value,
+            "dropped": self.dropped.value,
+            "failed": self.failed.value,
+            "pending": self._pending,
+        }
+
+
+_ENGINE: Optional[ShadowEngine] = None
+_ENGINE_LOCK = threading.Lock()
+
+
+def get_shadow_engine() -> Optional[ShadowEngine]:
+    """The process's shadow engine, or None when no candidate is configured."""
+    global _ENGINE
+    model_path = getattr(settings, "DETECTION_SHADOW_MODEL_PATH", "")
+    if not model_path:
+        return None
+    if _ENGINE is None:
+        with _ENGINE_LOCK:
+            if _ENGINE is None:
+                _ENGINE = ShadowEngine(
+                    model_path,
+                    getattr(settings, "DETECTION_SHADOW_SAMPLE_RATE", 0.05),
+                    getattr(settings, "DETECTION_SHADOW_MAX_PENDING", 64),
+                )
+                atexit.register(_ENGINE.flush)
+    return _ENGINE
+
+
+def observe(verdicts: Sequence[dict], timings: dict) -> None:
+    """Hands a finished detect request to the shadow engine, if one is configured."""
+    engine = get_shadow_engine()
+    if engine is not None:
+        engine.observe(verdicts, timings.get("model", 0.0))
+
+
+def shadow_summary(hours: Optional[int] = None) -> List[dict]:
+    """Agreement and latency per candidate/primary pair, from ShadowStat."""
+    from .models import ShadowStat
+
+    rows = ShadowStat.objects.all()
+    if hours:
+        rows = rows.filter(bucket__gte=timezone.now() - timedelta(hours=hours))
+    summary = []
+    for group in rows.values("candidate_version", "primary_version").annotate(**{f"{f}_sum": Sum(f) for f in _FIELDS}):
+        samples = group["samples_sum"] or 0
+        mean = (lambda field: round(group[f"{field}_sum"] / samples, 3) if samples else 0.0)
+        summary.append({
+            "candidate_version": group["candidate_version"],
+            "primary_version": group["primary_version"],
+            "samples": samples,
+            "agreement_rate": round(group["agreements_sum"] / samples, 4) if samples else 0.0,
+            "safe_to_toxic": group["safe_to_toxic_sum"],
+            "toxic_to_safe": group["toxic_to_safe_sum"],
+            "primary_ms_per_text": mean("primary_latency_ms"),
+            "candidate_ms_per_text": mean("candidate_latency_ms"),
+            "latency_delta_ms": round(mean("candidate_latency_ms") - mean("primary_latency_ms"), 3),
+            "mean_confidence_delta": mean("confidence_delta"),
+            "errors": group["errors_sum"],
+        })
+    return summary
@@ -0,0 +1,430 @@
+"""Streaming moderation: NDJSON messages in, NDJSON verdicts out.
+
+A client keeps one long-lived POST open and writes one JSON message per line,
+either a bare string or an object such as {"id": "m1", "text": "..."}. Each
+message is submitted to the inference scheduler as soon as its line arrives,
+so messages that arrive close together are batched, and one verdict line is
+written back per message in the order the messages were received.
+
+With `Content-Type: application/msgpack` the messages are instead
+concatenated MessagePack objects of the same shape. Verdicts are written as
+MessagePack when Accept prefers it, or when there is no Accept and the input
+is MessagePack (see `stream_formats`).
+
+Messages go through the same cascade and near-duplicate stages as
+`pipeline.detect_texts`, so verdicts report the engine that decided them.
+Verdicts carry no tokens or lemmas, so the spaCy stage is skipped.
+
+The API key is checked once, when the stream opens. Under ASGI the endpoint
+bypasses Django's middleware, so `stream_detect` answers CORS preflights and
+adds CORS headers itself, from the django-cors-headers settings.
+
+`stream_detect` is a raw ASGI application (see `hate_speech_api/asgi.py`):
+Django's ASGI handler buffers the whole request body before calling a view,
+which would defeat streaming. `iter_stream_verdicts` is the synchronous
+equivalent used by the WSGI view.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import re
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+from .executor import run_in_model_executor
+from .model import get_detector, get_registry
+from .models import DetectionResult
+from .pipeline import decide_without_model, remember_verdict
+from .preprocess import get_preprocessor
+from .renderers import MSGPACK, msgpack, packb, prefers_msgpack
+from .scheduler import BULK
+
+logger = logging.getLogger(__name__)
+
+NDJSON = "application/x-ndjson"
+
+
+def _max_in_flight() -> int:
+    return getattr(settings, "DETECTION_STREAM_MAX_IN_FLIGHT", 256)
+
+
+def _resolve_lane(requested: str, api_key_obj) -> str:
+    requested = (requested or "").strip().lower()
+    return BULK if requested == BULK else api_key_obj.priority
+
+
+class _Message:
+    __slots__ = ("id", "text", "cleaned", "future", "model_version", "shortcut", "signature", "error", "received_at")
+
+    def __init__(self, message_id=None, text="", error=None):
+        self.id = message_id
+        self.received_at = time.perf_counter()
+        self.text = text
+        self.cleaned = ""
+        self.future: Optional[Future] = None
+        self.model_version = ""
+        # Set when the cascade or near-duplicate stage decided the message
+        self.shortcut: Optional[tuple] = None
+        self.signature = None
+        self.error = error
+
+    def ready(self) -> bool:
+        return self.future is None or self.future.done()
+
+
+def _parse_line(line: bytes) -> Optional[_Message]:
+    line = line.strip()
+    if not line:
+        return None
+    try:
+        payload = json.loads(line)
+    except ValueError:
+        return _Message(error="Invalid JSON")
+    return _message_from(payload)
+
+
+def _message_from(payload) -> _Message:
+    if isinstance(payload, str):
+        return _Message(text=payload)
+    if isinstance(payload, dict):
+        text = payload.get("text")
+        if isinstance(text, str) and text:
+            return _Message(payload.get("id"), text)
+        return _Message(payload.get("id"), error="text is required")
+    return _Message(error="Expected a string or an object with a text field")
+
+
+class _NDJSONReader:
+    """Splits body chunks into NDJSON messages."""
+
+    def __init__(self):
+        self._buffer = b""
+
+    def feed(self, chunk: bytes) -> List[_Message]:
+        self._buffer += chunk
+        *lines, self._buffer = self._buffer.split(b"\n")
+        return [message for message in map(_parse_line, lines) if message is not None]
+
+    def close(self) -> List[_Message]:
+        message = _parse_line(self._buffer)
+        self._buffer = b""
+        return [message] if message is not None else []
+
+
+class _MessagePackReader:
+    """Splits body chunks into concatenated MessagePack messages."""
+
+    def __init__(self):
+        self._unpacker = msgpack.Unpacker(raw=False)
+        self._broken = False
+
+    def feed(self, chunk: bytes) -> List[_Message]:
+        if self._broken:
+            return []
+        messages = []
+        try:
+            self._unpacker.feed(chunk)
+            for payload in self._unpacker:
+                messages.append(_message_from(payload))
+        except Exception:
+            # Unlike NDJSON there is no line to resynchronise on
+            self._broken = True
+            messages.append(_Message(error="Invalid MessagePack"))
+        return messages
+
+    def close(self) -> List[_Message]:
+        return []
+
+
+def stream_formats(content_type: str, accept: str) -> Tuple[str, str]:
+    """(input, output) media types for a stream.
+
+    Raises ValueError if the body is MessagePack and msgpack is not installed.
+    """
+    input_type = MSGPACK if (content_type or "").split(";")[0].strip().lower() == MSGPACK else NDJSON
+    if input_type == MSGPACK and msgpack is None:
+        raise ValueError("MessagePack streams need the msgpack package on the server")
+    if accept and accept.strip() != "*/*":
+        return input_type, MSGPACK if prefers_msgpack(accept) else NDJSON
+    return input_type, input_type
+
+
+def _reader(input_type: str):
+    return _MessagePackReader() if input_type == MSGPACK else _NDJSONReader()
+
+
+def _submit(message: _Message, lane: str) -> _Message:
+    if message.error:
+        return message
+    message.cleaned = get_preprocessor().basic_clean(message.text)
+    shortcuts, signatures = decide_without_model([message.cleaned])
+    if shortcuts[0] is not None:
+        message.shortcut = shortcuts[0]
+        return message
+    message.signature = signatures.get(0)
+    # Each message records the model version it was submitted to, so a
+    # stream that spans a model reload reports versions accurately
+    futures, message.model_version = get_registry().submit([message.cleaned], lane)
+    if futures is None:
+        message.error = "Model prediction failed"
+    else:
+        message.future = futures[0]
+    return message
+
+
+def _verdict(message: _Message) -> Tuple[dict, Optional[DetectionResult]]:
+    """Renders a finished message; also returns the row to persist, if any."""
+    if message.error:
+        return {"id": message.id, "error": message.error}, None
+    if message.shortcut is not None:
+        hate_label, confidence, sentiment, _, engine, model_version = message.shortcut
+    else:
+        try:
+            outcome = message.future.result()
+        except Exception:
+            return {"id": message.id, "error": "Model prediction failed"}, None
+        hate_label, confidence, sentiment, _ = outcome
+        engine, model_version = "transformer", message.model_version
+        remember_verdict(message.signature, outcome, model_version)
+    classification = "toxic" if hate_label == 1 else "safe"
+    verdict = {
+        "id": message.id,
+        "classification": classification,
+        "confidence": float(confidence),
+        "sentiment": sentiment,
+        "engine": engine,
+        "model_version": model_version,
+    }
+    row = DetectionResult(
+        text=message.text,
+        classification=classification,
+        confidence=float(confidence),
+        engine=engine,
+        # From the message arriving to its verdict being ready
+        latency_ms=round((time.perf_counter() - message.received_at) * 1000.0, 2),
+        preprocessed_text=message.cleaned,
+        model_version=model_version,
+    )
+    return verdict, row
+
+
+def _encode(verdict: dict, output_type: str = NDJSON) -> bytes:
+    if output_type == MSGPACK:
+        return packb(verdict)
+    return (json.dumps(verdict) + "\n").encode("utf-8")
+
+
+def _save_rows(user, rows: List[DetectionResult]) -> None:
+    if not rows or not getattr(settings, "DETECTION_STREAM_PERSIST", True):
+        return
+    for row in rows:
+        row.user = user
+    DetectionResult.objects.bulk_create(rows)
+
+
+def iter_stream_verdicts(chunks: Iterable[bytes], api_key_obj, lane: str,
+                         input_type: str = NDJSON, output_type: str = NDJSON) -> Iterator[bytes]:
+    """Synchronous stream loop: yields one encoded verdict per input message."""
+    reader = _reader(input_type)
+    pending: deque = deque()
+    rows: List[DetectionResult] = []
+
+    def flush_ready(force: bool):
+        while pending and (force or len(pending) >= _max_in_flight() or pending[0].error or pending[0].ready()):
+            verdict, row = _verdict(pending.popleft())
+            if row is not None:
+                rows.append(row)
+            yield _encode(verdict, output_type)
+        if rows and (force or len(rows) >= 100):
+            _save_rows(api_key_obj.user, rows)
+            rows.clear()
+
+    for chunk in chunks:
+        for message in reader.feed(chunk):
+            pending.append(_submit(message, lane))
+            yield from flush_ready(force=False)
+    for message in reader.close():
+        pending.append(_submit(message, lane))
+    yield from flush_ready(force=True)
+
+
+# --- ASGI ---------------------------------------------------------------------
+
+def _authenticate_sync(api_key: str):
+    close_old_connections()
+    from users.models import APIKey
+
+    try:
+        return APIKey.objects.select_related("user").get(key=api_key)
+    except APIKey.DoesNotExist:
+        return None
+    finally:
+        close_old_connections()
+
+
+def _save_rows_sync(user, rows):
+    close_old_connections()
+    try:
+        _save_rows(user, rows)
+    finally:
+        close_old_connections()
+
+
+def _cors_headers(headers: dict, preflight: bool = False) -> List[Tuple[bytes, bytes]]:
+    """What corsheaders.middleware.CorsMiddleware would add to this response."""
+    from corsheaders.conf import conf
+
+    origin = headers.get("origin")
+    if not origin:
+        return []
+    allowed = (conf.CORS_ALLOW_ALL_ORIGINS or origin in conf.CORS_ALLOWED_ORIGINS
+               or any(re.match(pattern, origin) for pattern in conf.CORS_ALLOWED_ORIGIN_REGEXES))
+    if not allowed:
+        return []
+    wildcard = conf.CORS_ALLOW_ALL_ORIGINS and not conf.CORS_ALLOW_CREDENTIALS
+    cors = [(b"access-control-allow-origin", b"*" if wildcard else origin.encode("latin-1")), (b"vary", b"origin")]
+    if conf.CORS_ALLOW_CREDENTIALS:
+        cors.append((b"access-control-allow-credentials", b"true"))
+    if preflight:
+        cors.append((b"access-control-allow-headers", ", ".join(conf.CORS_ALLOW_HEADERS).encode("latin-1")))
+        cors.append((b"access-control-allow-methods", ", ".join(conf.CORS_ALLOW_METHODS).encode("latin-1")))
+        if conf.CORS_PREFLIGHT_MAX_AGE:
+            cors.append((b"access-control-max-age", str(conf.CORS_PREFLIGHT_MAX_AGE).encode("latin-1")))
+    elif conf.CORS_EXPOSE_HEADERS:
+        cors.append((b"access-control-expose-headers", ", ".join(conf.CORS_EXPOSE_HEADERS).encode("latin-1")))
+    return cors
+
+
+async def _send_json(send, status: int, payload: dict, cors=()) -> None:
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), *cors],
+    })
+    await send({"type": "http.response.body", "body": json.dumps(payload).encode("utf-8")})
+
+
+async def _iter_request_body(receive):
+    while True:
+        event = await receive()
+        if event["type"] == "http.disconnect":
+            return
+        yield event.get("body", b"")
+        if not event.get("more_body", False):
+            return
+
+
+async def stream_detect(scope, receive, send) -> None:
+    """ASGI endpoint for POST /api/detect/stream/."""
+    headers = {name.decode("latin-1").lower(): value.decode("latin-1") for name, value in scope["headers"]}
+    if scope["method"] == "OPTIONS" and "access-control-request-method" in headers:
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-length", b"0"), *_cors_headers(headers, preflight=True)]})
+        await send({"type": "http.response.body", "body": b""})
+        return
+    cors = _cors_headers(headers)
+    if scope["method"] != "POST":
+        await _send_json(send, 405, {"error": "Method not allowed"}, cors)
+        return
+
+    api_key = headers.get("x-api-key")
+    if not api_key:
+        await _send_json(send, 401, {
+            "error": "API key required in 'X-API-KEY' header.",
+            "message": "To get an API key, register at our website and create one in your dashboard.",
+        }, cors)
+        return
+    api_key_obj = await sync_to_async(_authenticate_sync)(api_key)
+    if api_key_obj is None:
+        await _send_json(send, 403, {
+            "error": "Invalid API key.",
+            "message": "Please check your API key or create a new one in your dashboard.",
+        }, cors)
+        return
+    if await sync_to_async(get_detector, thread_sensitive=False)() is None:
+        await _send_json(send, 500, {"error": "Model prediction failed"}, cors)
+        return
+
+    try:
+        input_type, output_type = stream_formats(headers.get("content-type"), headers.get("accept"))
+    except ValueError as exc:
+        await _send_json(send, 415, {"error": str(exc)}, cors)
+        return
+
+    lane = _resolve_lane(headers.get("x-priority"), api_key_obj)
+    await send({
+        "type": "http.response.start",
+        "status": 200,
+        "headers": [(b"content-type", output_type.encode("latin-1")), (b"cache-control", b"no-cache"), *cors],
+    })
+
+    # Bounded so a fast producer cannot queue unbounded work on the model
+    pending: asyncio.Queue = asyncio.Queue(maxsize=_max_in_flight())
+
+    async def write_verdicts():
+        rows: List[DetectionResult] = []
+        while True:
+            message = await pending.get()
+            if message is None:
+                break
+            if message.future is not None:
+                try:
+                    await asyncio.wrap_future(message.future)
+                except Exception:
+                    pass  # _verdict renders a failed batch as an error line
+            verdict, row = _verdict(message)
+            await send({"type": "http.response.body", "body": _encode(verdict, output_type), "more_body": True})
+            if row is not None:
+                rows.append(row)
+            if len(rows) >= 100 or (rows and pending.empty()):
+                await sync_to_async(_save_rows_sync)(api_key_obj.user, rows)
+                rows = []
+        await sync_to_async(_save_rows_sync)(api_key_obj.user, rows)
+
+    writer = asyncio.create_task(write_verdicts())
+
+    async def enqueue(message) -> bool:
+        """Queues a message for the writer; False if the writer has stopped."""
+        if writer.done():
+            return False
+        if not pending.full():
+            pending.put_nowait(message)
+            return True
+        put = asyncio.ensure_future(pending.put(message))
+        await asyncio.wait([put, writer], return_when=asyncio.FIRST_COMPLETED)
+        if not put.done():
+            put.cancel()
+            return False
+        return True
+
+    async def read_messages() -> None:
+        reader = _reader(input_type)
+        async for chunk in _iter_request_body(receive):
+            for message in reader.feed(chunk):
+                # Cleaning, the cascade and scheduling stay off the event loop
+                if not await enqueue(await run_in_model_executor(_submit, message, lane)):
+                    return
+        for message in reader.close():
+            if not await enqueue(await run_in_model_executor(_submit, message, lane)):
+                return
+        await enqueue(None)
+
+    try:
+        await read_messages()
+        # The 200 is already sent, so a failed writer can only be logged
+        await asyncio.wait([writer])
+        if writer.exception() is not None:
+            logger.error("Stream writer failed", exc_info=writer.exception())
+    finally:
+        if not writer.done():
+            writer.cancel()
+    await send({"type": "http.response.body", "body": b"", "more_body": False})
@@ -0,0 +1,110 @@
+"""Per-process torch thread configuration.
+
+Every web worker and model-server process runs its own torch. By default,
+each of them starts one intra-op thread per core. With N workers on C cores
+that makes N x C threads competing for C cores, and tail latency suffers.
+`configure_torch_threads` runs before the model loads and gives each process
+its share instead:
+
+    intra-op threads   DETECTION_TORCH_THREADS, else usable cores // workers
+    inter-op threads   DETECTION_TORCH_INTEROP_THREADS, else 1 (the encoder
+                       has no parallel branches to overlap)
+
+Usable cores follow the process's CPU affinity (taskset, cpusets). The worker
+count is DETECTION_WEB_WORKERS, else WEB_CONCURRENCY (read by both gunicorn
+and uvicorn, and set in each worker by gunicorn.conf.py), else 1. A worker
+pinned to its own cores with `pin_worker` counts as the only worker on them.
+
+`benchmarks/thread_sweep.py` measures workers x threads on a machine.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+from typing import List, Optional, Tuple
+
+from .model import _setting
+
+logger = logging.getLogger(__name__)
+
+_APPLIED: Optional[dict] = None
+_PINNED = False
+
+
+def available_cores() -> int:
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def worker_count() -> int:
+    configured = _setting("DETECTION_WEB_WORKERS", 0)
+    if configured:
+        return configured
+    try:
+        return max(1, int(os.environ.get("WEB_CONCURRENCY", "1")))
+    except ValueError:
+        return 1
+
+
+def cores_per_worker(workers: Optional[int] = None) -> int:
+    """This process's share of the usable cores."""
+    if _PINNED:
+        return available_cores()
+    return max(1, available_cores() // (workers or worker_count()))
+
+
+def plan_threads(workers: Optional[int] = None) -> Tuple[int, int]:
+    """(intra-op, inter-op) threads for this process."""
+    intra = _setting("DETECTION_TORCH_THREADS", 0) or cores_per_worker(workers)
+    inter = _setting("DETECTION_TORCH_INTEROP_THREADS", 0) or 1
+    return intra, inter
+
+
+def configure_torch_threads(workers: Optional[int] = None, threads: Optional[int] = None) -> dict:
+    """Applies `plan_threads` once per process; later calls return what was applied.
+
+    An explicit `threads` (e.g. score_corpus --threads-per-worker) replaces
+    the planned intra-op count.
+    """
+    global _APPLIED
+    if _APPLIED is not None:
+        return _APPLIED
+    import torch  # type: ignore
+
+    intra, inter = plan_threads(workers)
+    intra = threads or intra
+    torch.set_num_threads(intra)
+    try:
+        torch.set_num_interop_threads(inter)
+    except RuntimeError:
+        # Only possible before torch's first parallel work
+        logger.warning("Torch inter-op pool already started; keeping %d threads", torch.get_num_interop_threads())
+    _APPLIED = {
+        "workers": workers or worker_count(),
+        "cores": available_cores(),
+        "pinned": _PINNED,
+        "intra_op": torch.get_num_threads(),
+        "inter_op": torch.get_num_interop_threads(),
+    }
+    logger.info("Torch threads: %(intra_op)d intra-op, %(inter_op)d inter-op on %(cores)d cores", _APPLIED)
+    return _APPLIED
+
+
+def thread_config() -> Optional[dict]:
+    return _APPLIED
+
+
+def pin_worker(slot: int, workers: int) -> Optional[List[int]]:
+    """Restricts this process to slot's share of the usable cores (Linux only)."""
+    global _PINNED
+    if not hasattr(os, "sched_setaffinity"):
+        return None
+    cores = sorted(os.sched_getaffinity(0))
+    share = max(1, len(cores) // workers)
+    start = (slot * share) % len(cores)
+    mine = cores[start:start + share]
+    os.sched_setaffinity(0, mine)
+    _PINNED = True
+    return mine
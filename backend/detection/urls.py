@@ -1,14 +1,41 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
+if settings.DETECTION_ASYNC_VIEWS:
+    from . import async_views
+    detect_view, history_view = async_views.detect_hate_speech, async_views.get_history
+else:
+    detect_view, history_view = views.detect_hate_speech, views.get_history
+
 urlpatterns = [
     # Allow with and without trailing slash to avoid redirects on POST
-    path('detect/', views.detect_hate_speech, name='detect_hate_speech'),
-    path('detect', views.detect_hate_speech),
+    path('detect/', detect_view, name='detect_hate_speech'),
+    path('detect', detect_view),
+
+    # Batch detection (POST)
+    path('detect/batch/', views.detect_hate_speech_batch, name='detect_hate_speech_batch'),
+    path('detect/batch', views.detect_hate_speech_batch),
+
+    # Streaming NDJSON detection (served by detection.streaming under ASGI)
+    path('detect/stream/', views.detect_stream, name='detect_stream'),
+    path('detect/stream', views.detect_stream),
+
+    # Asynchronous detection jobs
+    path('detect/jobs/', views.create_detection_job, name='create_detection_job'),
+    path('detect/jobs', views.create_detection_job),
+    path('detect/jobs/<uuid:job_id>/', views.detection_job_status, name='detection_job_status'),
+    path('detect/jobs/<uuid:job_id>', views.detection_job_status),
+    path('detect/jobs/<uuid:job_id>/results/', views.detection_job_results, name='detection_job_results'),
+    path('detect/jobs/<uuid:job_id>/results', views.detection_job_results),
+
+    # Per-worker inference metrics (staff only)
+    path('detect/metrics/', views.detection_metrics, name='detection_metrics'),
+    path('detect/metrics', views.detection_metrics),
 
     # History endpoint (GET)
-    path('detect/history/', views.get_history, name='get_history'),
-    path('detect/history', views.get_history),
+    path('detect/history/', history_view, name='get_history'),
+    path('detect/history', history_view),
     
     # Public API documentation
     path('docs/', views.api_documentation, name='api_documentation'),
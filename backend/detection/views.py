@@ -1,46 +1,51 @@
-from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.decorators import api_view, parser_classes, permission_classes, renderer_classes
+from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
 from rest_framework.response import Response
+from django.conf import settings
+from django.http import StreamingHttpResponse
 from django.shortcuts import render
-from .preprocess import get_preprocessor
-from .model import predict_with_model
-from .models import DetectionResult
+from .corpus import JSONL, CorpusError, detect_format
+from .jobs import get_job_runner, iter_job_results, jobs_dir
+from .metrics import server_timing
+from .model import get_detector, get_registry, lemma_cache_stats, scheduler_stats
+from .models import DetectionJob, DetectionResult
+from .neardup import get_near_duplicate_index
+from .parsers import DETECT_PARSERS
+from .pipeline import detect_texts
+from .renderers import DETECT_RENDERERS, MessagePackRenderer, columns
+from .scheduler import BULK, INTERACTIVE
+from .shadow import get_shadow_engine, observe as shadow_observe
+from .streaming import iter_stream_verdicts, stream_formats
+from .torch_threads import thread_config
 from users.models import APIKey
+import json
 import time
+import uuid
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_history(request):
-    history = DetectionResult.objects.filter(user=request.user).order_by('-created_at')
-    return Response([{
+    return Response([history_item(item) for item in history_queryset(request.user)])
+
+
+def history_queryset(user):
+    # Rows written by detection jobs belong to the job (its results endpoint),
+    # not to the interactive history, which would grow by a whole corpus
+    return DetectionResult.objects.filter(user=user, job__isnull=True).order_by('-created_at')
+
+
+def history_item(item):
+    return {
         'id': item.id,
         'text': item.text,
         'classification': item.classification,
         'confidence': item.confidence,
         'created_at': item.created_at,
-    } for item in history])
-
-@api_view(['POST'])
-def detect_hate_speech(request):
-    """
-    Detect hate speech in text.
-    
-    Authentication: Requires valid API key in X-API-KEY header
-    
-    Request body:
-    {
-        "text": "Text to analyze"
     }
-    
-    Response:
-    {
-        "classification": "safe" | "toxic",
-        "confidence": 0.95,
-        "sentiment": "negative" | "positive" | "neutral",
-        "engine": "transformer",
-        "latency_ms": 150.2
-    }
-    """
+
+
+def _authenticate_api_key(request):
+    """Returns (api_key_obj, None) or (None, error_response) for the X-API-KEY header."""
     print(f"Detection request from IP: {request.META.get('REMOTE_ADDR')}")
     print(f"Request headers: {dict(request.headers)}")
     
@@ -50,7 +55,7 @@ def detect_hate_speech(request):
     
     if not api_key:
         print("No API key provided")
-        return Response({
+        return None, Response({
             "error": "API key required in 'X-API-KEY' header.",
             "message": "To get an API key, register at our website and create one in your dashboard."
         }, status=401)
@@ -58,59 +63,394 @@ def detect_hate_speech(request):
     # Find the API key and associated user
     try:
         api_key_obj = APIKey.objects.select_related('user').get(key=api_key)
-        user = api_key_obj.user
-        print(f"API key belongs to user: {user.email}")
+        print(f"API key belongs to user: {api_key_obj.user.email}")
     except APIKey.DoesNotExist:
         print("Invalid API key")
-        return Response({
+        return None, Response({
             "error": "Invalid API key.",
             "message": "Please check your API key or create a new one in your dashboard."
         }, status=403)
+    return api_key_obj, None
+
+
+def _resolve_priority(request, api_key_obj, default=None):
+    """
+    Pick the inference lane for a request.
+
+    Callers may always downgrade themselves to the bulk lane with
+    `X-Priority: bulk`; the interactive lane is only available to keys that
+    are configured for it.
+    """
+    requested = (request.headers.get('X-Priority') or '').strip().lower()
+    if requested == BULK:
+        return BULK
+    if requested == INTERACTIVE or default is None:
+        return api_key_obj.priority
+    return default
+
+
+# Top-level fields a detect result can carry; select them with `fields=`
+DETECT_FIELDS = ("id", "classification", "confidence", "sentiment", "engine", "model_version",
+                 "latency_ms", "text", "preprocessed", "probabilities")
+DETECT_DEFAULT_FIELDS = ("id", "classification", "confidence", "sentiment", "engine", "model_version", "latency_ms")
+# `verbose`: also echo the text and its preprocessing
+DETECT_VERBOSE_FIELDS = DETECT_DEFAULT_FIELDS + ("text", "preprocessed")
+BATCH_DEFAULT_FIELDS = ("id", "classification", "confidence", "sentiment", "engine")
+
+
+def _flag(value):
+    return value is True or str(value).lower() in ("1", "true")
+
+
+def _response_fields(data, query, default):
+    """
+    Fields to render, from `fields` / `verbose` / `include_probabilities` in
+    the request body or query string. Raises ValueError for unknown fields.
+    """
+    def param(name):
+        value = data.get(name) if hasattr(data, "get") else None
+        return value if value is not None else query.get(name)
+
+    requested = param("fields")
+    if requested:
+        names = requested if isinstance(requested, list) else str(requested).split(",")
+        fields = tuple(dict.fromkeys(str(name).strip() for name in names if str(name).strip()))
+        unknown = [field for field in fields if field not in DETECT_FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}; expected any of {', '.join(DETECT_FIELDS)}")
+    elif _flag(param("verbose")) or getattr(settings, 'DETECTION_VERBOSE_RESPONSES', False):
+        fields = DETECT_VERBOSE_FIELDS
+    else:
+        fields = default
+    if _flag(param("include_probabilities")) and "probabilities" not in fields:
+        fields += ("probabilities",)
+    return fields
+
+
+@api_view(['POST'])
+@renderer_classes(DETECT_RENDERERS)
+@parser_classes(DETECT_PARSERS)
+def detect_hate_speech(request):
+    """
+    Detect hate speech in text.
+    
+    Authentication: Requires valid API key in X-API-KEY header
+    Optional header: X-Priority: interactive | bulk
+    Bodies and responses may be application/msgpack (Content-Type / Accept)
+    
+    Request body (`fields` and `verbose` may also be query parameters):
+    {
+        "text": "Text to analyze",
+        "fields": "classification,confidence",  (optional, see DETECT_FIELDS)
+        "verbose": false,                        (optional, adds text and preprocessed)
+        "include_probabilities": false
+    }
+    
+    Response (default fields):
+    {
+        "id": 1,
+        "classification": "safe" | "toxic",
+        "confidence": 0.95,
+        "sentiment": "negative" | "positive" | "neutral",
+        "engine": "transformer",
+        "model_version": "3f2a9c1b0d4e",
+        "latency_ms": 150.2
+    }
+    """
+    api_key_obj, error = _authenticate_api_key(request)
+    if error is not None:
+        return error
+    user = api_key_obj.user
 
     text = request.data.get("text", "")
     if not text:
         return Response({"error": "Text is required"}, status=400)
+    try:
+        fields = _response_fields(request.data, request.query_params, DETECT_DEFAULT_FIELDS)
+    except ValueError as exc:
+        return Response({"error": str(exc)}, status=400)
 
     start = time.perf_counter()
-    pre = get_preprocessor().preprocess(text)
-
-    # Get prediction from the transformer model
-    model_outcome = predict_with_model(pre["cleaned"])  # pass cleaned text
-    if model_outcome is None:
+    timings = {}
+    verdicts = detect_texts([text], _resolve_priority(request, api_key_obj), timings, "preprocessed" in fields)
+    if verdicts is None:
         return Response({
             "error": "Model prediction failed"
         }, status=500)
-
-    hate_label, confidence, sentiment = model_outcome
-    classification = "toxic" if hate_label == 1 else "safe"
-    engine = "transformer"
+    verdict = verdicts[0]
     
     latency_ms = (time.perf_counter() - start) * 1000.0
     
     # Save the detection result
+    db_start = time.perf_counter()
     result = DetectionResult.objects.create(
         user=user,  # Use user from API key
         text=text,
-        classification=classification,
-        confidence=float(confidence),
-        engine=engine,
+        classification=verdict["classification"],
+        confidence=verdict["confidence"],
+        engine=verdict["engine"],
         latency_ms=round(latency_ms, 2),
-        preprocessed_text=pre["cleaned"]
+        preprocessed_text=verdict["cleaned"],
+        model_version=verdict["model_version"],
     )
     
+    timings["db"] = (time.perf_counter() - db_start) * 1000.0
+    shadow_observe(verdicts, timings)
+    
+    return Response(detect_payload(result, verdict, text, latency_ms, fields),
+                    headers={"Server-Timing": server_timing(timings)})
+
+
+def detect_payload(result, verdict, text, latency_ms, fields=DETECT_VERBOSE_FIELDS):
+    payload = {}
+    for field in fields:
+        if field == "id":
+            payload["id"] = result.id
+        elif field == "latency_ms":
+            payload["latency_ms"] = round(latency_ms, 2)
+        elif field == "text":
+            payload["text"] = text
+        elif field == "preprocessed":
+            payload["preprocessed"] = {
+                "cleaned": verdict["cleaned"],
+                "tokens": verdict["tokens"],
+                "lemmas": verdict["lemmas"],
+            }
+        else:
+            payload[field] = verdict[field]
+    return payload
+
+
+@api_view(['POST'])
+@renderer_classes(DETECT_RENDERERS)
+@parser_classes(DETECT_PARSERS)
+def detect_hate_speech_batch(request):
+    """
+    Detect hate speech in a list of texts with one request.
+
+    Batches are scheduled on the bulk lane unless the API key is interactive
+    and the caller asks for `X-Priority: interactive`.
+
+    Request body (`fields`, `verbose` and `include_probabilities` work as
+    for the single-text endpoint; results default to BATCH_DEFAULT_FIELDS):
+    {
+        "texts": ["first text", "second text"]
+    }
+
+    Large responses are compressed when the client sends Accept-Encoding
+    (see middleware.CompressionMiddleware). With `Accept: application/msgpack`
+    results are column-wise, one array per field:
+    {"count": 2, "latency_ms": 12.5, "results": {"classification": [...], "confidence": [...], ...}}
+    """
+    api_key_obj, error = _authenticate_api_key(request)
+    if error is not None:
+        return error
+
+    texts = request.data.get("texts")
+    if not isinstance(texts, list) or not texts:
+        return Response({"error": "texts must be a non-empty list"}, status=400)
+    if not all(isinstance(t, str) and t for t in texts):
+        return Response({"error": "Every item in texts must be a non-empty string"}, status=400)
+    max_items = getattr(settings, 'DETECTION_BATCH_MAX_ITEMS', 1000)
+    if len(texts) > max_items:
+        return Response({"error": f"At most {max_items} texts per batch"}, status=400)
+    try:
+        fields = _response_fields(request.data, request.query_params, BATCH_DEFAULT_FIELDS)
+    except ValueError as exc:
+        return Response({"error": str(exc)}, status=400)
+
+    start = time.perf_counter()
+    timings = {}
+    verdicts = detect_texts(texts, _resolve_priority(request, api_key_obj, default=BULK), timings,
+                            "preprocessed" in fields)
+    if verdicts is None:
+        return Response({
+            "error": "Model prediction failed"
+        }, status=500)
+    latency_ms = round((time.perf_counter() - start) * 1000.0, 2)
+
+    db_start = time.perf_counter()
+    results = DetectionResult.objects.bulk_create([
+        DetectionResult(
+            user=api_key_obj.user,
+            text=text,
+            classification=verdict["classification"],
+            confidence=verdict["confidence"],
+            engine=verdict["engine"],
+            latency_ms=latency_ms,
+            preprocessed_text=verdict["cleaned"],
+            model_version=verdict["model_version"],
+        )
+        for text, verdict in zip(texts, verdicts)
+    ])
+
+    timings["db"] = (time.perf_counter() - db_start) * 1000.0
+    shadow_observe(verdicts, timings)
+
+    items = [
+        detect_payload(result, verdict, text, latency_ms, fields)
+        for result, verdict, text in zip(results, verdicts, texts)
+    ]
+    if isinstance(request.accepted_renderer, MessagePackRenderer):
+        items = columns(items, fields)
     return Response({
-        "id": result.id,
-        "classification": classification,
-        "confidence": float(confidence),
-        "sentiment": sentiment,
-        "engine": engine,
-        "latency_ms": round(latency_ms, 2),
-        "text": text,
-        "preprocessed": {
-            "cleaned": pre["cleaned"],
-            "tokens": pre["tokens"],
-            "lemmas": pre["lemmas"],
-        }
+        "count": len(results),
+        "latency_ms": latency_ms,
+        "results": items,
+    }, headers={"Server-Timing": server_timing(timings)})
+
+
+@api_view(['POST'])
+@renderer_classes(DETECT_RENDERERS)
+def detect_stream(request):
+    """
+    Streaming detection: NDJSON (or MessagePack) messages in, verdicts out, in order.
+
+    Under ASGI this path is served by `detection.streaming.stream_detect`,
+    which reads the body as it arrives. This WSGI fallback needs the full
+    body up front but still streams verdicts back.
+    """
+    api_key_obj, error = _authenticate_api_key(request)
+    if error is not None:
+        return error
+    try:
+        input_type, output_type = stream_formats(request.content_type, request.headers.get("Accept", ""))
+    except ValueError as exc:
+        return Response({"error": str(exc)}, status=415)
+    if get_detector() is None:
+        return Response({"error": "Model prediction failed"}, status=500)
+    lane = _resolve_priority(request, api_key_obj)
+    chunks = iter(request._request.readline, b"")
+    return StreamingHttpResponse(
+        iter_stream_verdicts(chunks, api_key_obj, lane, input_type, output_type),
+        content_type=output_type,
+    )
+
+
+def _job_payload(job):
+    return {
+        "id": str(job.id),
+        "status": job.status,
+        "output": job.output,
+        "total": job.total,
+        "processed": job.processed,
+        "progress": round(job.processed / job.total, 4) if job.total else None,
+        "throughput_per_sec": round(job.throughput, 2),
+        "eta_seconds": round(job.eta_seconds, 1) if job.eta_seconds is not None else None,
+        "error": job.error or None,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+        "status_url": f"/api/detect/jobs/{job.id}/",
+        "results_url": f"/api/detect/jobs/{job.id}/results/",
+    }
+
+
+@api_view(['POST'])
+def create_detection_job(request):
+    """
+    Start an asynchronous detection job over a large corpus.
+
+    Either upload a JSONL/CSV file as multipart field `file` (optionally with
+    `text_field`, default "text"), or send JSON {"texts": [...]}.
+    Optional `output`: "db" (default, DetectionResult rows) or "file".
+    """
+    api_key_obj, error = _authenticate_api_key(request)
+    if error is not None:
+        return error
+
+    output = request.data.get("output", DetectionJob.OUTPUT_DB)
+    if output not in (DetectionJob.OUTPUT_DB, DetectionJob.OUTPUT_FILE):
+        return Response({"error": "output must be 'db' or 'file'"}, status=400)
+    text_field = request.data.get("text_field") or "text"
+
+    job_id = uuid.uuid4()
+    job_dir = jobs_dir() / str(job_id)
+
+    upload = request.FILES.get("file")
+    if upload is not None:
+        try:
+            fmt = detect_format(upload.name, request.data.get("format"))
+        except CorpusError as exc:
+            return Response({"error": str(exc)}, status=400)
+        job_dir.mkdir(parents=True)
+        input_path = job_dir / f"input.{fmt}"
+        with open(input_path, "wb") as f:
+            for chunk in upload.chunks():
+                f.write(chunk)
+    else:
+        texts = request.data.get("texts")
+        if not isinstance(texts, list) or not texts or not all(isinstance(t, str) for t in texts):
+            return Response({"error": "Upload a file or send texts as a non-empty list of strings"}, status=400)
+        fmt = JSONL
+        job_dir.mkdir(parents=True)
+        input_path = job_dir / "input.jsonl"
+        with open(input_path, "w", encoding="utf-8") as f:
+            for text in texts:
+                f.write(json.dumps(text) + "\n")
+
+    job = DetectionJob.objects.create(
+        id=job_id,
+        user=api_key_obj.user,
+        output=output,
+        input_path=str(input_path),
+        input_format=fmt,
+        text_field=text_field,
+        results_path=str(job_dir / "results.jsonl") if output == DetectionJob.OUTPUT_FILE else "",
+    )
+    if getattr(settings, 'DETECTION_JOBS_INLINE', True):
+        get_job_runner().submit(job.id)
+    return Response(_job_payload(job), status=202)
+
+
+def _get_user_job(request, job_id):
+    api_key_obj, error = _authenticate_api_key(request)
+    if error is not None:
+        return None, error
+    try:
+        return DetectionJob.objects.get(pk=job_id, user=api_key_obj.user), None
+    except DetectionJob.DoesNotExist:
+        return None, Response({"error": "Job not found"}, status=404)
+
+
+@api_view(['GET'])
+def detection_job_status(request, job_id):
+    """
+    Progress, throughput and ETA of a detection job.
+    """
+    job, error = _get_user_job(request, job_id)
+    if error is not None:
+        return error
+    return Response(_job_payload(job))
+
+
+@api_view(['GET'])
+def detection_job_results(request, job_id):
+    """
+    Stream the job's results as NDJSON, in input order.
+    """
+    job, error = _get_user_job(request, job_id)
+    if error is not None:
+        return error
+    response = StreamingHttpResponse(iter_job_results(job), content_type="application/x-ndjson")
+    response["Content-Disposition"] = f'attachment; filename="{job.id}.jsonl"'
+    response["X-Job-Status"] = job.status
+    return response
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def detection_metrics(request):
+    """
+    In-process inference metrics for this worker (staff only).
+    """
+    return Response({
+        "model": get_registry().stats(),
+        "scheduler": scheduler_stats(),
+        "lemma_cache": lemma_cache_stats(),
+        "torch_threads": thread_config(),
+        "near_duplicates": index.stats() if (index := get_near_duplicate_index()) is not None else None,
+        "shadow": engine.stats() if (engine := get_shadow_engine()) is not None else None,
     })
 
 
@@ -135,30 +475,93 @@ def api_documentation(request):
                 "method": "POST",
                 "description": "Detect hate speech in text",
                 "headers": {
-                    "Content-Type": "application/json",
+                    "Content-Type": "application/json or application/msgpack",
+                    "Accept": "optional - application/msgpack for a MessagePack response",
                     "X-API-KEY": "your-api-key-here"
                 },
                 "request_body": {
-                    "text": "string (required) - Text to analyze"
+                    "text": "string (required) - Text to analyze",
+                    "fields": "string or array (optional) - Response fields to return, any of: " + ", ".join(DETECT_FIELDS),
+                    "verbose": "boolean (optional) - Also echo text and preprocessed (cleaned, tokens, lemmas)",
+                    "include_probabilities": "boolean (optional) - Also return per-class probabilities"
                 },
+                "query_parameters": "fields, verbose and include_probabilities may also be sent in the query string",
                 "response": {
+                    "id": "number - Stored result ID",
                     "classification": "string - 'safe' or 'toxic'",
                     "confidence": "number - Confidence score (0-1)",
                     "sentiment": "string - 'positive', 'negative', or 'neutral'",
-                    "engine": "string - AI model used",
-                    "latency_ms": "number - Processing time in milliseconds"
+                    "engine": "string - stage that decided: transformer, lexicon (cascade) or near_duplicate (reused verdict)",
+                    "model_version": "string - Version of the model or lexicon that decided",
+                    "latency_ms": "number - Processing time in milliseconds",
+                    "probabilities": "array of 5 numbers - Model probability per class, classes 0-1 being hate "
+                                     "(only with include_probabilities; null when the lexicon decided)"
                 },
                 "example_request": {
                     "text": "Hello, how are you today?"
                 },
                 "example_response": {
+                    "id": 42,
                     "classification": "safe",
                     "confidence": 0.95,
                     "sentiment": "positive",
                     "engine": "transformer",
+                    "model_version": "3f2a9c1b0d4e",
                     "latency_ms": 145.2
                 }
             },
+            "/detect/batch/": {
+                "method": "POST",
+                "description": "Detect hate speech in up to 1000 texts at once",
+                "headers": {
+                    "Content-Type": "application/json",
+                    "X-API-KEY": "your-api-key-here",
+                    "X-Priority": "optional - 'bulk' (default for batches) or 'interactive'",
+                    "Accept-Encoding": "optional - 'br' or 'gzip'; large responses are compressed",
+                    "Accept": "optional - application/msgpack for MessagePack with column-wise results "
+                              "({field: [value per text]})"
+                },
+                "request_body": {
+                    "texts": "array of strings (required) - Texts to analyze",
+                    "fields": "string or array (optional) - Fields per result, as for /detect/ "
+                              "(default: id, classification, confidence, sentiment, engine)",
+                    "verbose": "boolean (optional) - Also echo each text and its preprocessing",
+                    "include_probabilities": "boolean (optional) - Add per-class probabilities to each result"
+                },
+                "response": {
+                    "count": "number - Number of results",
+                    "latency_ms": "number - Processing time in milliseconds",
+                    "results": "array - One result per text, in request order"
+                }
+            },
+            "/detect/stream/": {
+                "method": "POST",
+                "description": "Long-lived stream: one JSON message per line in, one verdict per line out, in order",
+                "headers": {
+                    "Content-Type": "application/x-ndjson, or application/msgpack for concatenated MessagePack messages",
+                    "Accept": "optional - application/msgpack for MessagePack verdicts",
+                    "X-API-KEY": "your-api-key-here"
+                },
+                "request_body": "NDJSON lines: \"text\" or {\"id\": \"m1\", \"text\": \"...\"}",
+                "response": "NDJSON lines: {\"id\", \"classification\", \"confidence\", \"sentiment\", \"engine\"}"
+            },
+            "/detect/jobs/": {
+                "method": "POST",
+                "description": "Start an asynchronous job over a large JSONL/CSV corpus",
+                "headers": {
+                    "X-API-KEY": "your-api-key-here"
+                },
+                "request_body": {
+                    "file": "multipart file (JSONL or CSV) - or send JSON {\"texts\": [...]}",
+                    "text_field": "string (optional) - Field/column holding the text, default 'text'",
+                    "output": "string (optional) - 'db' (default) or 'file'"
+                },
+                "response": {
+                    "id": "string - Job ID",
+                    "status_url": "string - Poll for progress, throughput and ETA",
+                    "results_url": "string - Download results as NDJSON"
+                }
+            },
             "/docs/": {
                 "method": "GET",
                 "description": "This documentation endpoint"
@@ -0,0 +1,26 @@
+"""Gunicorn settings (gunicorn reads ./gunicorn.conf.py when started from backend/).
+
+Each worker learns the worker count so that torch splits the cores between
+workers instead of every worker using all of them (see
+detection/torch_threads.py). With DETECTION_PIN_WORKERS=True each worker is
+also pinned to its own slice of the cores.
+"""
+
+import os
+
+from decouple import config
+
+
+def pre_fork(server, worker):
+    # Runs in the arbiter, so live workers keep distinct CPU slots across restarts
+    used = {getattr(w, "cpu_slot", None) for w in server.WORKERS.values()}
+    worker.cpu_slot = next(slot for slot in range(len(used) + 1) if slot not in used)
+
+
+def post_fork(server, worker):
+    os.environ["WEB_CONCURRENCY"] = str(server.num_workers)
+    if config("DETECTION_PIN_WORKERS", default=False, cast=bool):
+        from detection.torch_threads import pin_worker
+
+        cores = pin_worker(worker.cpu_slot, server.num_workers)
+        server.log.info("Worker %s pinned to cores %s", worker.pid, cores)
@@ -0,0 +1,21 @@
+import os
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'hate_speech_api.settings')
+# Use the async detect/history views unless explicitly disabled
+os.environ.setdefault('DETECTION_ASYNC_VIEWS', 'True')
+
+django_application = get_asgi_application()
+
+# Imported after Django is set up
+from detection.streaming import stream_detect  # noqa: E402
+
+# Served outside Django's handler, which would buffer the whole request body
+STREAMING_PATHS = {'/api/detect/stream/', '/api/detect/stream'}
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'http' and scope['path'] in STREAMING_PATHS:
+        await stream_detect(scope, receive, send)
+        return
+    await django_application(scope, receive, send)
@@ -1,5 +1,5 @@
 from pathlib import Path
-from decouple import config
+from decouple import Csv, config
 import os
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -25,6 +25,8 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'corsheaders.middleware.CorsMiddleware',
+    # Brotli/gzip for large JSON responses; near the top so it sees the final body
+    'detection.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -52,11 +54,13 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'hate_speech_api.wsgi.application'
+ASGI_APPLICATION = 'hate_speech_api.asgi.application'
 
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        # Overridable so load tests can run against a throwaway database
+        'NAME': config('SQLITE_PATH', default=str(BASE_DIR / 'db.sqlite3')),
     }
 }
 
@@ -65,6 +69,11 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework_simplejwt.authentication.JWTAuthentication',
     ),
+    # orjson-backed, same output as DRF's JSONRenderer (falls back to it without orjson)
+    'DEFAULT_RENDERER_CLASSES': (
+        'detection.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
 }
 
 # JWT settings
@@ -86,6 +95,135 @@ SIMPLE_JWT = {
     'USER_ID_CLAIM': 'user_id',
 }
 
+# Inference scheduling: detect requests are micro-batched per priority lane.
+# The interactive lane is always dispatched first; the bulk lane uses larger
+# batches and waits longer for them to fill. `buckets` are upper token-length
+# bounds; texts are only batched with others of similar length (worth it with
+# DETECTION_PADDING=dynamic, where a batch is padded to its longest text).
+DETECTION_SCHEDULER = {
+    'interactive': {
+        'max_batch_size': config('DETECTION_INTERACTIVE_MAX_BATCH', default=8, cast=int),
+        'max_wait_ms': config('DETECTION_INTERACTIVE_MAX_WAIT_MS', default=2.0, cast=float),
+        'buckets': config('DETECTION_INTERACTIVE_BUCKETS', default='', cast=Csv(int)),
+    },
+    'bulk': {
+        'max_batch_size': config('DETECTION_BULK_MAX_BATCH', default=64, cast=int),
+        'max_wait_ms': config('DETECTION_BULK_MAX_WAIT_MS', default=50.0, cast=float),
+        'buckets': config('DETECTION_BULK_BUCKETS', default='', cast=Csv(int)),
+    },
+}
+# Batch layout for the transformer: 'fixed' pads every text to 256 tokens as
+# in training; 'dynamic' pads to the longest text in the batch and 'packed'
+# concatenates texts with block-diagonal attention, so a batch costs about its
+# real tokens. Both mask padding the checkpoint attended to during training,
+# so confidences can shift slightly; early exit needs 'fixed'.
+DETECTION_PADDING = config('DETECTION_PADDING', default='fixed')
+# Numeric precision: 'fp32', 'bf16' (bf16 weights) or 'autocast' (fp32
+# weights, bf16 matmuls). Either bf16 mode is only used on hardware with
+# native bf16, and only if logits on a built-in probe set stay within
+# DETECTION_PRECISION_TOLERANCE of fp32; otherwise fp32 is kept.
+DETECTION_PRECISION = config('DETECTION_PRECISION', default='fp32')
+DETECTION_PRECISION_TOLERANCE = config('DETECTION_PRECISION_TOLERANCE', default=0.1, cast=float)
+DETECTION_BATCH_MAX_ITEMS = config('DETECTION_BATCH_MAX_ITEMS', default=1000, cast=int)
+# Detect responses carry id, classification, confidence, sentiment, engine,
+# model_version and latency_ms unless the client asks for more (fields=,
+# verbose=true). True restores the old default of echoing text and preprocessing.
+DETECTION_VERBOSE_RESPONSES = config('DETECTION_VERBOSE_RESPONSES', default=False, cast=bool)
+# JSON responses at least this large are brotli/gzip-compressed for clients
+# that accept it (see detection/middleware.py)
+DETECTION_COMPRESS_MIN_BYTES = config('DETECTION_COMPRESS_MIN_BYTES', default=1024, cast=int)
+# Texts per spaCy nlp.pipe batch when preprocessing many texts at once
+DETECTION_SPACY_BATCH_SIZE = config('DETECTION_SPACY_BATCH_SIZE', default=256, cast=int)
+# Preprocessing resources are never downloaded at runtime. spaCy model by
+# package name or local directory; NLTK data (stopwords, wordnet) vendored with
+#   python -m nltk.downloader -d <NLTK_DATA_PATH> stopwords wordnet omw-1.4
+DETECTION_SPACY_MODEL = config('DETECTION_SPACY_MODEL', default='en_core_web_sm')
+NLTK_DATA_PATH = config('NLTK_DATA_PATH', default=str(BASE_DIR / 'nltk_data'))
+# Memoise (lemma, is_stop) per token form. Off by default: cached lemmas are
+# context-free and can differ from full-pipeline lemmas for ambiguous words
+DETECTION_LEMMA_CACHE = config('DETECTION_LEMMA_CACHE', default=False, cast=bool)
+DETECTION_LEMMA_CACHE_SIZE = config('DETECTION_LEMMA_CACHE_SIZE', default=50000, cast=int)
+# Warm-start files are read from / written to this directory ('' disables)
+DETECTION_LEMMA_CACHE_DIR = config('DETECTION_LEMMA_CACHE_DIR', default=str(BASE_DIR / 'var' / 'lemma_cache'))
+# Hot reload: every worker polls the model files and the reload trigger file
+# (touched by manage.py reload_model) and swaps in the new version in the
+# background; 0 disables. The old version keeps draining for the grace period.
+DETECTION_MODEL_WATCH_INTERVAL = config('DETECTION_MODEL_WATCH_INTERVAL', default=5.0, cast=float)
+DETECTION_MODEL_RELOAD_FILE = config('DETECTION_MODEL_RELOAD_FILE', default=str(BASE_DIR / 'var' / 'model.reload'))
+DETECTION_MODEL_DRAIN_GRACE_S = config('DETECTION_MODEL_DRAIN_GRACE_S', default=2.0, cast=float)
+# Pre-built tokenizer/lexicon/lemma bundle (manage.py build_artifacts); the
+# source files are used when it is missing or fails its hash check
+DETECTION_ARTIFACTS_PATH = config('DETECTION_ARTIFACTS_PATH', default=str(BASE_DIR / 'Classifier' / 'artifacts.bin'))
+# Checkpoint to load instead of Classifier/transformer_classifier_checkpoint_best_best.pth
+DETECTION_MODEL_PATH = config('DETECTION_MODEL_PATH', default='')
+# Stored with every DetectionResult; empty means "hash of checkpoint + tokenizer + lexicon"
+DETECTION_MODEL_VERSION = config('DETECTION_MODEL_VERSION', default='')
+
+# Early exit: classify from an intermediate encoder layer once the hate
+# margin |P(hate) - P(non-hate)| reaches this threshold (0 disables). Heads come
+# from `manage.py train_exit_heads`; without them the final classifier is
+# reused. Compare thresholds with `manage.py early_exit_report`.
+DETECTION_EARLY_EXIT_THRESHOLD = config('DETECTION_EARLY_EXIT_THRESHOLD', default=0.0, cast=float)
+DETECTION_EXIT_HEADS_PATH = config('DETECTION_EXIT_HEADS_PATH', default=str(BASE_DIR / 'Classifier' / 'exit_heads.pth'))
+
+# Cascade: decide clear-cut texts with the hate-word lexicon (engine "lexicon")
+# and only send the rest through spaCy and the transformer. Thresholds come from
+# `manage.py calibrate_cascade --write`; restart workers after recalibrating.
+DETECTION_CASCADE = config('DETECTION_CASCADE', default=False, cast=bool)
+DETECTION_CASCADE_CONFIG = config('DETECTION_CASCADE_CONFIG', default=str(BASE_DIR / 'var' / 'cascade.json'))
+
+# Near-duplicate reuse: a text whose cleaned form is within this Jaccard
+# similarity (character 4-grams, MinHash/LSH) of a recently scored one reuses
+# its verdict (engine "near_duplicate"). Entries expire after TTL_S seconds and
+# the oldest are evicted beyond MAX_ENTRIES (about 1 KB each).
+DETECTION_NEAR_DUP = config('DETECTION_NEAR_DUP', default=False, cast=bool)
+DETECTION_NEAR_DUP_THRESHOLD = config('DETECTION_NEAR_DUP_THRESHOLD', default=0.8, cast=float)
+DETECTION_NEAR_DUP_NUM_PERM = config('DETECTION_NEAR_DUP_NUM_PERM', default=64, cast=int)
+DETECTION_NEAR_DUP_MAX_ENTRIES = config('DETECTION_NEAR_DUP_MAX_ENTRIES', default=50000, cast=int)
+DETECTION_NEAR_DUP_TTL_S = config('DETECTION_NEAR_DUP_TTL_S', default=600.0, cast=float)
+
+# Shadow evaluation: re-score a sample of detect requests with this candidate
+# checkpoint on a low-priority background thread ('' disables). Samples are
+# dropped when DETECTION_SHADOW_MAX_PENDING requests are already waiting.
+# Results: manage.py shadow_report
+DETECTION_SHADOW_MODEL_PATH = config('DETECTION_SHADOW_MODEL_PATH', default='')
+DETECTION_SHADOW_SAMPLE_RATE = config('DETECTION_SHADOW_SAMPLE_RATE', default=0.05, cast=float)
+DETECTION_SHADOW_MAX_PENDING = config('DETECTION_SHADOW_MAX_PENDING', default=64, cast=int)
+
+# Out-of-process model server (`manage.py run_model_server`). When set, web
+# workers send batches to this Unix socket instead of loading the model, and
+# load spaCy/nltk only if a request asks for the `preprocessed` field.
+DETECTION_MODEL_SERVER_SOCKET = config('DETECTION_MODEL_SERVER_SOCKET', default='')
+
+# Serve detect/history with async views (asgi.py turns this on by default).
+# Blocking model work runs on a pool of DETECTION_ASYNC_THREADS threads, which
+# mostly wait on the scheduler; 0 = twice the interactive max_batch_size, so
+# concurrent requests can be batched together. Independent of torch threads.
+DETECTION_ASYNC_VIEWS = config('DETECTION_ASYNC_VIEWS', default=False, cast=bool)
+DETECTION_ASYNC_THREADS = config('DETECTION_ASYNC_THREADS', default=0, cast=int)
+
+# Torch threads per process, applied before the model loads (see
+# detection/torch_threads.py). 0 = automatic: usable cores (CPU affinity)
+# divided by the worker count, which is DETECTION_WEB_WORKERS or else
+# WEB_CONCURRENCY (gunicorn.conf.py sets it in each worker, and can pin workers
+# to their own cores with DETECTION_PIN_WORKERS=True). Measure with
+# benchmarks/thread_sweep.py.
+DETECTION_WEB_WORKERS = config('DETECTION_WEB_WORKERS', default=0, cast=int)
+DETECTION_TORCH_THREADS = config('DETECTION_TORCH_THREADS', default=0, cast=int)
+DETECTION_TORCH_INTEROP_THREADS = config('DETECTION_TORCH_INTEROP_THREADS', default=0, cast=int)
+
+# Streaming detection: max messages awaiting a verdict per stream (backpressure)
+DETECTION_STREAM_MAX_IN_FLIGHT = config('DETECTION_STREAM_MAX_IN_FLIGHT', default=256, cast=int)
+DETECTION_STREAM_PERSIST = config('DETECTION_STREAM_PERSIST', default=True, cast=bool)
+
+# Asynchronous detection jobs. With DETECTION_JOBS_INLINE the web process runs
+# jobs on a local thread pool; otherwise run `manage.py run_detection_jobs`.
+DETECTION_JOBS_DIR = Path(config('DETECTION_JOBS_DIR', default=str(BASE_DIR / 'var' / 'jobs')))
+DETECTION_JOBS_INLINE = config('DETECTION_JOBS_INLINE', default=True, cast=bool)
+DETECTION_JOB_WORKERS = config('DETECTION_JOB_WORKERS', default=2, cast=int)
+DETECTION_JOB_BATCH_SIZE = config('DETECTION_JOB_BATCH_SIZE', default=256, cast=int)
+DATA_UPLOAD_MAX_MEMORY_SIZE = config('DATA_UPLOAD_MAX_MEMORY_SIZE', default=50 * 1024 * 1024, cast=int)
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -142,5 +280,6 @@ CORS_ALLOW_HEADERS = list(
         'x-csrftoken',
         'x-requested-with',
         'x-api-key',
+        'x-priority',
     ])
 )
@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+"""
+Check that concurrent async detect requests reach the inference scheduler
+together and are batched, i.e. that the model executor has enough threads
+for a full interactive batch to be waiting on the scheduler at once.
+"""
+
+import asyncio
+import os
+import sys
+import threading
+
+# Add the current directory to the Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'hate_speech_api.settings')
+
+import django
+
+django.setup()
+
+from detection.executor import executor_size, run_in_model_executor
+from detection.scheduler import INTERACTIVE, InferenceScheduler, LaneConfig
+
+
+def test_concurrent_requests_share_a_batch():
+    print("Checking that concurrent async requests are batched together...")
+    requests = 8
+    assert executor_size() >= requests, f"executor has {executor_size()} threads, fewer than {requests}"
+
+    batches = []
+    lock = threading.Lock()
+
+    def predict_batch(texts, lane):
+        with lock:
+            batches.append(len(texts))
+        return [("non-hate", 0.9, "neutral", None) for _ in texts]
+
+    # Long enough a wait that a batch only goes out early if it is full
+    lanes = {INTERACTIVE: LaneConfig(max_batch_size=requests, max_wait_ms=2000.0)}
+    scheduler = InferenceScheduler(predict_batch, lanes)
+
+    async def fire():
+        return await asyncio.gather(*(
+            run_in_model_executor(scheduler.predict, [f"text {i}"], INTERACTIVE) for i in range(requests)
+        ))
+
+    try:
+        results = asyncio.run(fire())
+    finally:
+        scheduler.shutdown()
+    assert len(results) == requests
+    assert batches == [requests], f"expected one batch of {requests}, got batch sizes {batches}"
+    print(f"✓ {requests} concurrent requests ran as a single batch")
+
+
+if __name__ == "__main__":
+    test_concurrent_requests_share_a_batch()
+    print("\n🎉 Async requests are micro-batched")
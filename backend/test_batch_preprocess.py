@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+"""
+Check that the batched preprocessing APIs (spaCy nlp.pipe) return exactly
+what the per-text APIs return:
+
+    TextPreprocessor.preprocess_batch      vs  TextPreprocessor.preprocess
+    HateSpeechDetector.preprocess_texts    vs  HateSpeechDetector.preprocess_text
+
+The detector check needs spaCy and the Classifier artifacts and is skipped
+when they are unavailable.
+"""
+
+import os
+import sys
+
+# Add the current directory to the Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmarks'))
+
+import corpora
+from detection.preprocess import TextPreprocessor
+
+TEXTS = [t for name in corpora.LENGTHS for t in corpora.synthetic(name, 40, seed=1)]
+TEXTS += [t for texts in corpora.fixture().values() for t in texts] + ["", "   "]
+
+
+def test_text_preprocessor():
+    print("Checking TextPreprocessor.preprocess_batch...")
+    preprocessor = TextPreprocessor()
+    expected = [preprocessor.preprocess(text) for text in TEXTS]
+    for batch_size in (1, 7, 256):
+        actual = preprocessor.preprocess_batch(TEXTS, batch_size=batch_size)
+        assert actual == expected, f"preprocess_batch(batch_size={batch_size}) differs from preprocess"
+    print(f"✓ {len(TEXTS)} texts match at batch sizes 1, 7 and 256")
+
+
+def test_detector():
+    print("Checking HateSpeechDetector.preprocess_texts...")
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'hate_speech_api.settings')
+    try:
+        import django
+        django.setup()
+        from detection.model import get_detector
+        detector = get_detector()
+    except Exception as e:
+        detector = None
+        print(f"  ({e})")
+    if detector is None or not hasattr(detector, 'preprocess_texts'):
+        print("- skipped: detector not available")
+        return
+    cleaned = TextPreprocessor().basic_clean_batch(TEXTS)
+    expected = [detector.preprocess_text(text) for text in cleaned]
+    for batch_size in (1, 7, 256):
+        actual = detector.preprocess_texts(cleaned, batch_size=batch_size)
+        assert actual == expected, f"preprocess_texts(batch_size={batch_size}) differs from preprocess_text"
+    print(f"✓ {len(TEXTS)} texts match at batch sizes 1, 7 and 256")
+
+
+if __name__ == "__main__":
+    test_text_preprocessor()
+    test_detector()
+    print("\n🎉 Batched preprocessing matches per-text preprocessing")
@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+"""
+Check that `manage.py set_key_priority` moves API keys between priority lanes,
+by key and by user, and rejects unknown keys. Uses the configured database and
+removes the user it creates.
+"""
+
+import io
+import os
+import sys
+import uuid
+
+# Add the current directory to the Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'hate_speech_api.settings')
+
+import django
+
+django.setup()
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+from users.models import APIKey, User
+
+
+def test_set_key_priority():
+    print("Checking set_key_priority...")
+    user = User.objects.create_user(email=f"priority-{uuid.uuid4().hex[:8]}@example.com", password="x")
+    try:
+        first, second = APIKey.objects.create(user=user), APIKey.objects.create(user=user)
+        assert first.priority == APIKey.PRIORITY_INTERACTIVE
+
+        call_command('set_key_priority', 'bulk', str(first.key), stdout=io.StringIO())
+        first.refresh_from_db()
+        second.refresh_from_db()
+        assert (first.priority, second.priority) == (APIKey.PRIORITY_BULK, APIKey.PRIORITY_INTERACTIVE)
+        print("✓ by key")
+
+        call_command('set_key_priority', 'bulk', user=user.email, stdout=io.StringIO())
+        assert set(user.api_keys.values_list('priority', flat=True)) == {APIKey.PRIORITY_BULK}
+        print("✓ by user")
+
+        try:
+            call_command('set_key_priority', 'interactive', 'no-such-key', stdout=io.StringIO())
+        except CommandError:
+            pass
+        else:
+            raise AssertionError("unknown key was accepted")
+        assert set(user.api_keys.values_list('priority', flat=True)) == {APIKey.PRIORITY_BULK}
+        print("✓ unknown keys are rejected")
+    finally:
+        user.delete()
+
+
+if __name__ == "__main__":
+    test_set_key_priority()
+    print("\n🎉 API key priority can be set")
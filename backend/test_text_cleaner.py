@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+"""
+Parity check: TextPreprocessor.basic_clean (fast path) must return exactly what
+the multi-pass basic_clean_reference returns.
+
+Uses hypothesis when it is installed, otherwise a seeded random fuzzer over the
+same alphabet. Does not need Django or a database.
+"""
+
+import os
+import random
+import sys
+
+# Add the current directory to the Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from detection.preprocess import TextPreprocessor
+
+# Characters that exercise every pattern and the Unicode corner cases:
+# fullwidth forms, ligatures, the Kelvin sign, dotted capital I, odd spaces
+ALPHABET = (
+    "abcxyzABCXYZ0189 \t\n_-.:/@#<>!?'\"&;=%"
+    "ＡＢｃ＠＃＜／："
+    "ﬁﬂKİßéÉ  ​　"
+    "😂🔥"
+)
+FRAGMENTS = [
+    "http://", "https://", "www.", "HTTP://", "WWW.", ".com", ".org", "user@", "@user_1",
+    "#tag", "<b>", "</b>", "<a href='x'>", "mail@example.com", "user@http://x.com", "#www.x",
+]
+
+CASES = [
+    "",
+    "   ",
+    "Hello World",
+    "You are an IDIOT!!! 123",
+    "user@http://x.com rest",
+    "visit www.Example.com/path?x=1 now",
+    "mail me: john.doe@example.co.uk #bye @you",
+    "<p>Hi&nbsp;there</p>",
+    "ＦＵＬＬＷＩＤＴＨ ＠ｍｅ ＃ｔａｇ",
+    "Kelvin İstanbul straße café",
+    "ﬁne ﬂow",
+    "tab\tnew\nline nbsp　ideographic",
+]
+
+
+def check(cleaner, text):
+    expected = cleaner.basic_clean_reference(text)
+    actual = cleaner.basic_clean(text)
+    if actual != expected:
+        raise AssertionError(f"Mismatch for {text!r}:\n  fast:      {actual!r}\n  reference: {expected!r}")
+
+
+def random_text(rng):
+    parts = []
+    for _ in range(rng.randint(0, 12)):
+        if rng.random() < 0.3:
+            parts.append(rng.choice(FRAGMENTS))
+        else:
+            parts.append("".join(rng.choice(ALPHABET) for _ in range(rng.randint(0, 10))))
+    return "".join(parts)
+
+
+def test_examples():
+    print("Checking fixed examples...")
+    cleaner = TextPreprocessor()
+    for text in CASES:
+        check(cleaner, text)
+    assert cleaner.basic_clean_batch(CASES) == [cleaner.basic_clean_reference(t) for t in CASES]
+    print(f"✓ {len(CASES)} examples match (single and batch)")
+
+
+def test_property(examples=5000):
+    cleaner = TextPreprocessor()
+    try:
+        from hypothesis import given, settings, strategies as st
+    except ImportError:
+        print(f"hypothesis not installed; fuzzing {examples} random texts instead...")
+        rng = random.Random(0)
+        for _ in range(examples):
+            check(cleaner, random_text(rng))
+        print(f"✓ {examples} random texts match")
+        return
+
+    print(f"Checking {examples} hypothesis examples...")
+    text_strategy = st.one_of(
+        st.text(),
+        st.lists(st.one_of(st.sampled_from(FRAGMENTS), st.text(alphabet=ALPHABET, max_size=10)), max_size=12).map("".join),
+    )
+
+    @settings(max_examples=examples, deadline=None)
+    @given(text_strategy)
+    def parity(text):
+        check(cleaner, text)
+
+    parity()
+    print("✓ hypothesis found no mismatch")
+
+
+if __name__ == "__main__":
+    test_examples()
+    test_property()
+    print("\n🎉 basic_clean matches the reference implementation")
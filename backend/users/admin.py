@@ -0,0 +1,14 @@
+from django.contrib import admin
+
+from .models import APIKey
+
+
+@admin.register(APIKey)
+class APIKeyAdmin(admin.ModelAdmin):
+    # Priority is an operator decision; users cannot change it through the API
+    list_display = ('key', 'user', 'priority', 'created_at')
+    list_editable = ('priority',)
+    list_filter = ('priority',)
+    search_fields = ('key', 'user__email')
+    readonly_fields = ('key', 'created_at')
+    raw_id_fields = ('user',)
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from users.models import APIKey
+
+
+class Command(BaseCommand):
+    help = (
+        "Set the inference priority lane of API keys: the given keys, or every key of a user "
+        "with --user. Requests made with a bulk key are scheduled behind interactive traffic."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('priority', choices=[value for value, _ in APIKey.PRIORITY_CHOICES])
+        parser.add_argument('keys', nargs='*', help='API keys to update.')
+        parser.add_argument('--user', help='Update every key of the user with this email instead.')
+
+    def handle(self, *args, **options):
+        keys, email = options['keys'], options['user']
+        if bool(keys) == bool(email):
+            raise CommandError('Give either API keys or --user')
+        if email:
+            queryset = APIKey.objects.filter(user__email__iexact=email)
+            if not queryset.exists():
+                raise CommandError(f'No API keys for user {email}')
+        else:
+            queryset = APIKey.objects.filter(key__in=keys)
+            missing = set(keys) - set(queryset.values_list('key', flat=True))
+            if missing:
+                raise CommandError(f"Unknown API key(s): {', '.join(sorted(missing))}")
+        updated = queryset.update(priority=options['priority'])
+        self.stdout.write(self.style.SUCCESS(f"Set {updated} API key(s) to {options['priority']} priority"))
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.16 on 2026-10-19 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_apikey'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='apikey',
+            name='priority',
+            field=models.CharField(choices=[('interactive', 'Interactive'), ('bulk', 'Bulk')], default='interactive', max_length=16),
+        ),
+    ]
@@ -34,9 +34,18 @@ class User(AbstractUser):
 # API Key model
 import uuid
 class APIKey(models.Model):
+    # Inference priority lane for requests made with this key
+    PRIORITY_INTERACTIVE = 'interactive'
+    PRIORITY_BULK = 'bulk'
+    PRIORITY_CHOICES = [
+        (PRIORITY_INTERACTIVE, 'Interactive'),
+        (PRIORITY_BULK, 'Bulk'),
+    ]
+
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='api_keys')
     key = models.CharField(max_length=64, unique=True, default=uuid.uuid4)
     created_at = models.DateTimeField(auto_now_add=True)
+    priority = models.CharField(max_length=16, choices=PRIORITY_CHOICES, default=PRIORITY_INTERACTIVE)
 
     def __str__(self):
         return f"{self.user.email} - {self.key}"
@@ -61,4 +61,5 @@ class ProfileSerializer(serializers.ModelSerializer):
 class APIKeySerializer(serializers.ModelSerializer):
     class Meta:
         model = APIKey
-        fields = ['id', 'key', 'created_at']
+        fields = ['id', 'key', 'created_at', 'priority']
+        read_only_fields = ['priority']